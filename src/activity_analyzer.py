@@ -1,133 +1,145 @@
+import logging
 import random
 
+import numpy as np
+
+from peak_selection import (
+    DAYS_OF_WEEK, HOURS, build_day_hour_matrix, rank_hours, select_spaced_hours, selection_to_schedule
+)
+
+
+logger = logging.getLogger(__name__)
+
 
 class ActivityAnalyzer:
-    def __init__(self, df):
+    def __init__(self, df, quiet=False, weekly_activity=None, slot_activity=None):
         self.df = df
+        # Готовые суммы по дню, часу (6-23) и ISO-неделе (DataProcessor.aggregate_activity):
+        # с ними почасовой анализ и стабильность считаются без исходной таблицы (df=None)
+        self.weekly_activity = weekly_activity
+        # Готовые матрицы день x слот (activity, present) для слотов внутри часа при df=None
+        self.slot_activity = slot_activity
+        # В тихом режиме отладочный вывод и расчеты только для него пропускаются
+        self.quiet = quiet
 
     def analyze_hourly_activity(self):
         # Анализ активности пользователей по часам (только дневное время 6-23)
+        if self.df is None:
+            return self.weekly_activity.groupby(level=['day_name', 'hour'], observed=True).sum().reset_index()
+
         filtered_data = self.df[self.df['hour'].between(6, 23)]
 
         # Группируем данные по дням недели и часам, суммируем экранное время
-        activity_by_hour = filtered_data.groupby(['day_name', 'hour'])['screen_time'].sum().reset_index()
+        activity_by_hour = filtered_data.groupby(['day_name', 'hour'], observed=True)['screen_time'].sum().reset_index()
         return activity_by_hour
 
     def find_peak_hours_per_day(self, hourly_activity, num_peaks=3):
         # Поиск лучшего времени для уведомлений по дням недели
-        days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        best_times = {}
-
-        for day in days_of_week:
-            # Берем данные для текущего дня
-            day_data = hourly_activity[hourly_activity['day_name'] == day].copy()
-
-            # Если данных нет - используем время по умолчанию
-            if len(day_data) == 0:
-                best_times[day.lower()] = [9, 14, 19]
-                continue
-
-            # Находим самые активные часы
-            top_hours = day_data.nlargest(6, 'screen_time')
-            selected_hours = []
-            top_hours = top_hours.sort_values('screen_time', ascending=False)
-
-            # Отбираем часы с интервалом не менее 3 часов
-            for _, row in top_hours.iterrows():
-                current_hour = row['hour']
-
-                # Проверяем что текущий час не слишком близко к уже выбранным
-                is_good_interval = True
-                for chosen_hour in selected_hours:
-                    time_difference = abs(current_hour - chosen_hour)
-                    if time_difference < 3:
-                        is_good_interval = False
-                        break
-
-                # Если интервал подходит - добавляем час в расписание
-                if is_good_interval:
-                    selected_hours.append(current_hour)
-
-                    # Если набрали нужное количество часов - выходим из цикла
-                    if len(selected_hours) >= num_peaks:
-                        break
-
-            # Если не набрали нужное количество - добавляем из оставшихся
-            if len(selected_hours) < num_peaks:
-                remaining = top_hours[~top_hours['hour'].isin(selected_hours)]
-                for _, row in remaining.iterrows():
-                    if len(selected_hours) < num_peaks:
-                        selected_hours.append(row['hour'])
-
-            # Если все еще не хватает - добавляем время по умолчанию
-            while len(selected_hours) < num_peaks:
-                default_times = [9, 14, 19]
-                for default_hour in default_times:
-                    if default_hour not in selected_hours and len(selected_hours) < num_peaks:
-                        selected_hours.append(default_hour)
-                        break
-
-            best_times[day.lower()] = sorted(selected_hours[:num_peaks])
-
-            # Выводим информацию о выборе времени для каждого дня
-            print(f"{day}:")
-            print(f"   Самые активные часы: {top_hours['hour'].tolist()}")
-            print(f"   После фильтрации интервалов: {best_times[day.lower()]}")
+        # Строим матрицу день x час и выбираем часы с интервалами сразу для всех дней
+        activity_matrix, present = build_day_hour_matrix(hourly_activity)
+        selected, top_hours = select_spaced_hours(activity_matrix, present, num_peaks, top_n=6)
+        best_times = selection_to_schedule(selected, present)
+
+        # Выводим информацию о выборе времени для каждого дня
+        if self._debug_enabled():
+            for day_index, day in enumerate(DAYS_OF_WEEK):
+                if not present[day_index].any():
+                    continue
+                logger.debug(f"{day}:")
+                logger.debug(f"   Самые активные часы: {[int(h) for h in top_hours[day_index] if h >= 0]}")
+                logger.debug(f"   После фильтрации интервалов: {best_times[day.lower()]}")
 
         return best_times
 
-    def calculate_coverage(self, hourly_activity, peak_hours):
-        # Расчет процента активности который покрывают выбранные часы
-        total_covered = 0
-        coverage_by_day = {}
-
-        days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-
-        for day in days_of_week:
-            day_data = hourly_activity[hourly_activity['day_name'] == day]
-            total_day_activity = day_data['screen_time'].sum()
-
-            # Считаем активность в выбранные часы
-            chosen_hours = peak_hours[day.lower()]
-            covered_activity = day_data[day_data['hour'].isin(chosen_hours)]['screen_time'].sum()
+    def find_peak_slots_per_day(self, bin_minutes=15, window_minutes=60, num_peaks=3,
+                                min_gap_minutes=180, solver='greedy'):
+        # Время уведомлений с точностью до слота bin_minutes (минуты от полуночи)
+        # Каждый слот оценивается по активности в окне window_minutes после него
+        from slot_selection import format_minutes, minutes_to_schedule, select_peak_slots
+
+        activity_matrix, present = self._slot_matrix(bin_minutes)
+        times = select_peak_slots(
+            activity_matrix, present, bin_minutes, num_peaks, window_minutes, min_gap_minutes, solver
+        )
+        peak_minutes = minutes_to_schedule(times)
+
+        if self._debug_enabled():
+            for day, minutes in peak_minutes.items():
+                logger.debug(f"{day}: {[format_minutes(minute) for minute in minutes]}")
+
+        return peak_minutes
+
+    def calculate_slot_coverage(self, peak_minutes, bin_minutes=15, window_minutes=60):
+        # Процент активности в окнах window_minutes после выбранного времени
+        from slot_selection import slot_coverage
+
+        activity_matrix, _ = self._slot_matrix(bin_minutes)
+        times = [peak_minutes.get(day.lower(), []) for day in DAYS_OF_WEEK]
+        width = max(1, max(len(minutes) for minutes in times))
+        times = np.array([minutes + [-1] * (width - len(minutes)) for minutes in times])
+        return slot_coverage(activity_matrix, times, bin_minutes, window_minutes)
+
+    def _slot_matrix(self, bin_minutes):
+        # Матрицы день x слот по исходной таблице или готовые (потоковый режим)
+        from slot_selection import build_day_slot_matrix, slot_starts
+
+        if self.df is not None:
+            return build_day_slot_matrix(self.df, bin_minutes)
+        activity_matrix, present = self.slot_activity
+        if activity_matrix.shape[-1] != len(slot_starts(bin_minutes)):
+            raise ValueError(f'Готовые слоты не совпадают с шириной {bin_minutes} мин')
+        return activity_matrix, present
+
+    def find_optimal_peak_hours(self, hourly_activity, num_peaks=3, min_gap=3):
+        # Точный выбор часов с максимальным покрытием при интервале не менее min_gap
+        # Для дней без данных используется то же время по умолчанию, что в жадном алгоритме
+        from optimal_selection import compare_with_greedy, select_optimal_hours
+
+        activity_matrix, present = build_day_hour_matrix(hourly_activity)
+        selected = select_optimal_hours(activity_matrix, num_peaks, min_gap)
+        best_times = selection_to_schedule(selected, present)
+
+        if self._debug_enabled():
+            comparison = compare_with_greedy(activity_matrix, present, num_peaks, min_gap)
+            logger.debug(f"Точный алгоритм: {comparison['optimal_coverage']:.1f}%, "
+                         f"жадный: {comparison['greedy_coverage']:.1f}%")
 
-            # Расчет процента покрытия
-            if total_day_activity > 0:
-                day_coverage_percent = (covered_activity / total_day_activity) * 100
-            else:
-                day_coverage_percent = 0
+        return best_times
 
-            coverage_by_day[day] = day_coverage_percent
-            total_covered += covered_activity
+    def calculate_coverage(self, hourly_activity, peak_hours):
+        # Расчет процента активности который покрывают выбранные часы
+        from coverage import CoverageEvaluator
 
-        # Общий процент покрытия по всем дням
-        total_activity = hourly_activity['screen_time'].sum()
-        if total_activity > 0:
-            overall_coverage = (total_covered / total_activity) * 100
-        else:
-            overall_coverage = 0
+        return CoverageEvaluator(hourly_activity).evaluate_schedule(peak_hours)
 
-        return {
-            'overall_coverage': overall_coverage,
-            'daily_coverage': coverage_by_day,
-            'total_activity': total_activity,
-            'covered_activity': total_covered
-        }
-
-    def compare_with_other_algorithms(self, hourly_activity, our_peak_hours):
+    def compare_with_other_algorithms(self, hourly_activity, our_peak_hours, random_trials=None, random_seed=None,
+                                      num_peaks=3):
         # Сравнение нашего алгоритма с CV алгоритмом и случайным выбором
-
-        # Наш алгоритм
-        our_coverage = self.calculate_coverage(hourly_activity, our_peak_hours)
+        # При заданном random_trials случайный алгоритм оценивается по random_trials расписаниям
+        # Другие алгоритмы выбирают столько же часов в день (num_peaks), сколько наш
+        from coverage import CoverageEvaluator, schedule_to_array
 
         # CV алгоритм (стабильность)
-        cv_peak_hours = self._cv_algorithm(hourly_activity)
-        cv_coverage = self.calculate_coverage(hourly_activity, cv_peak_hours)
+        cv_peak_hours = self._cv_algorithm(hourly_activity, num_peaks)
+
+        # Покрытие нашего и CV алгоритма считаем одной пачкой
+        evaluator = CoverageEvaluator(hourly_activity)
+        width = max(len(hours) for schedule in (our_peak_hours, cv_peak_hours) for hours in schedule.values())
+        result = evaluator.evaluate(np.stack([
+            schedule_to_array(our_peak_hours, width), schedule_to_array(cv_peak_hours, width)
+        ]))
+        our_coverage = evaluator.coverage_dict(result, 0)
+        cv_coverage = evaluator.coverage_dict(result, 1)
 
         # Случайный алгоритм
-        random_coverage = self._random_algorithm(hourly_activity)
+        random_stats = None
+        if random_trials is not None:
+            random_stats = self.random_baseline(hourly_activity, random_trials, num_peaks, seed=random_seed)
+            random_coverage = random_stats['mean']
+        else:
+            random_coverage = self._random_algorithm(hourly_activity, num_peaks)
 
-        return {
+        comparison = {
             'our_algorithm': {
                 'coverage': our_coverage['overall_coverage'],
                 'daily_coverage': our_coverage['daily_coverage']
@@ -140,64 +152,49 @@ class ActivityAnalyzer:
             'improvement_over_cv': our_coverage['overall_coverage'] - cv_coverage['overall_coverage'],
             'improvement_over_random': our_coverage['overall_coverage'] - random_coverage
         }
+        if random_stats:
+            comparison['random_baseline'] = random_stats
+        return comparison
+
+    def random_baseline(self, hourly_activity, trials=100_000, num_peaks=3, min_gap=None, seed=None):
+        # Оценка покрытия случайного расписания методом Монте-Карло
+        # min_gap=3 ограничивает случайные расписания тем же интервалом, что у нашего алгоритма
+        from random_baseline import monte_carlo_baseline
+
+        activity_matrix, _ = build_day_hour_matrix(hourly_activity)
+        return monte_carlo_baseline(activity_matrix, trials, num_peaks, min_gap, seed)
 
     def _cv_algorithm(self, hourly_activity, num_peaks=3):
         # CV алгоритм - выбирает часы на основе стабильности активности
-        days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        peak_hours = {}
+        activity_matrix, present = build_day_hour_matrix(hourly_activity)
 
         # Рассчитываем стабильность активности
         stability_scores = self._calculate_activity_stability(hourly_activity)
-
-        for day in days_of_week:
-            day_data = hourly_activity[hourly_activity['day_name'] == day].copy()
-
-            if len(day_data) == 0:
-                peak_hours[day.lower()] = [9, 14, 19]
-                continue
-
-            # Добавляем стабильность к данным
-            day_data['stability'] = day_data['hour'].apply(
-                lambda h: stability_scores.get((day, h), 0.5)
-            )
-
-            # Комбинированный балл: активность × стабильность
-            day_data['score'] = day_data['screen_time'] * day_data['stability']
-
-            # Берем топ часов по комбинированному баллу
-            top_hours = day_data.nlargest(num_peaks * 2, 'score')
-
-            # Фильтруем интервалы
-            filtered_hours = []
-            top_hours = top_hours.sort_values('score', ascending=False)
-
-            # Отбираем часы с интервалом не менее 3 часов
-            for _, row in top_hours.iterrows():
-                hour = row['hour']
-
-                # Проверяем что текущий час не слишком близко к уже выбранным
-                is_good_interval = True
-                for existing_hour in filtered_hours:
-                    time_difference = abs(hour - existing_hour)
-                    if time_difference < 3:
-                        is_good_interval = False
-                        break
-
-                # Если интервал подходит - добавляем час в расписание
-                if is_good_interval:
-                    filtered_hours.append(hour)
-
-                    # Если набрали нужное количество часов - выходим из цикла
-                    if len(filtered_hours) >= num_peaks:
-                        break
-
-            peak_hours[day.lower()] = sorted(filtered_hours[:num_peaks])
-
-            # Выводим отладочную информацию для CV алгоритма
-            print(f"{day} (CV алгоритм):")
-            print(f"   Лучшие по стабильности: {day_data.nlargest(3, 'stability')['hour'].tolist()}")
-            print(f"   Лучшие по комбинированному баллу: {top_hours['hour'].tolist()}")
-            print(f"   Итоговый выбор: {peak_hours[day.lower()]}")
+        stability_matrix = np.array([
+            [stability_scores.get((day, hour), 0.5) for hour in HOURS]
+            for day in DAYS_OF_WEEK
+        ])
+
+        # Комбинированный балл: активность × стабильность
+        score_matrix = activity_matrix * stability_matrix
+
+        # Берем топ часов по комбинированному баллу и фильтруем интервалы
+        selected, top_hours = select_spaced_hours(
+            score_matrix, present, num_peaks, top_n=num_peaks * 2,
+            fill_from_top=False, default_hours=()
+        )
+        peak_hours = selection_to_schedule(selected, present)
+
+        # Выводим отладочную информацию для CV алгоритма
+        if self._debug_enabled():
+            most_stable = rank_hours(stability_matrix, present, top_n=3)
+            for day_index, day in enumerate(DAYS_OF_WEEK):
+                if not present[day_index].any():
+                    continue
+                logger.debug(f"{day} (CV алгоритм):")
+                logger.debug(f"   Лучшие по стабильности: {[int(h) for h in most_stable[day_index] if h >= 0]}")
+                logger.debug(f"   Лучшие по комбинированному баллу: {[int(h) for h in top_hours[day_index] if h >= 0]}")
+                logger.debug(f"   Итоговый выбор: {peak_hours[day.lower()]}")
 
         return peak_hours
 
@@ -205,49 +202,51 @@ class ActivityAnalyzer:
         # Расчет стабильности активности (коэффициент вариации)
         stability_scores = {}
 
-        # Группируем по неделям для расчета стабильности
-        self.df['week'] = self.df['date'].dt.isocalendar().week
-        self.df['year'] = self.df['date'].dt.isocalendar().year
+        # Одна группировка по дню, часу и ISO-неделе без изменения исходных данных
+        weekly_activity = self.weekly_activity
+        if weekly_activity is None:
+            from data_processor import weekly_screen_time
+
+            weekly_activity = weekly_screen_time(self.df)
+
+        # Статистика по неделям для каждой пары (день, час)
+        weekly_stats = weekly_activity.groupby(level=[0, 1], sort=False).agg(['size', 'mean', 'std'])
+
+        # Коэффициент вариации = std / mean
+        # Преобразуем в стабильность (чем меньше CV -> тем больше стабильность)
+        enough_data = (weekly_stats['size'] > 1) & (weekly_stats['mean'] > 0)
+        cv = weekly_stats['std'] / weekly_stats['mean'].where(enough_data)
+        stability = (1 - cv.clip(upper=1.0)).clip(lower=0)
+
+        # Средняя стабильность при недостатке данных
+        stability = stability.where(enough_data, 0.5).to_dict()
 
         for day in hourly_activity['day_name'].unique():
             for hour in range(6, 24):
-                hour_data = self.df[
-                    (self.df['day_name'] == day) &
-                    (self.df['hour'] == hour)
-                    ]
-
-                if len(hour_data) > 0:
-                    # Группируем по неделям чтобы увидеть стабильность
-                    weekly_activity = hour_data.groupby(['year', 'week'])['screen_time'].sum()
-
-                    if len(weekly_activity) > 1 and weekly_activity.mean() > 0:
-                        # Коэффициент вариации = std / mean
-                        cv = weekly_activity.std() / weekly_activity.mean()
-                        # Преобразуем в стабильность (чем меньше CV -> тем больше стабильность)
-                        stability = max(0, 1 - min(cv, 1.0))
-                    else:
-                        stability = 0.5  # средняя стабильность при недостатке данных
-                else:
-                    stability = 0.0  # нет данных
-
-                stability_scores[(day, hour)] = stability
+                # Для часов без данных стабильность нулевая
+                stability_scores[(day, hour)] = float(stability.get((day, hour), 0.0))
 
         return stability_scores
 
-    def _random_algorithm(self, hourly_activity):
+    def _random_algorithm(self, hourly_activity, num_peaks=3):
         # Случайный алгоритм - генерирует случайное расписание
         random_schedule = {}
 
         for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-            random_hours = random.sample(range(6, 24), 3)
+            random_hours = random.sample(range(6, 24), num_peaks)
             random_schedule[day] = random_hours
 
         coverage = self.calculate_coverage(hourly_activity, random_schedule)
 
         # Выводим random расписание
-        print(f"RANDOM РАСПИСАНИЕ:")
-        print(f"   Покрытие: {coverage['overall_coverage']:.1f}%")
-        for day, hours in random_schedule.items():
-            print(f"      {day}: {hours}")
+        if self._debug_enabled():
+            logger.debug("RANDOM РАСПИСАНИЕ:")
+            logger.debug(f"   Покрытие: {coverage['overall_coverage']:.1f}%")
+            for day, hours in random_schedule.items():
+                logger.debug(f"      {day}: {hours}")
+
+        return coverage['overall_coverage']
 
-        return coverage['overall_coverage']
\ No newline at end of file
+    def _debug_enabled(self):
+        # Отладочный вывод нужен только если он включен в логгере и не выбран тихий режим
+        return not self.quiet and logger.isEnabledFor(logging.DEBUG)
\ No newline at end of file
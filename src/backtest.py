@@ -0,0 +1,332 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from coverage import CoverageEvaluator
+from data_processor import CHUNK_SIZE, DataProcessor
+from optimal_selection import select_optimal_hours
+from peak_selection import (
+    DAYS_OF_WEEK, DEFAULT_HOURS, FIRST_HOUR, HOURS, LAST_HOUR, fill_default_days, select_spaced_hours
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Понедельник, с которого отсчитываются номера ISO-недель
+EPOCH_MONDAY = np.datetime64('1970-01-05', 'D')
+
+# Зарегистрированные алгоритмы выбора часов: имя -> функция
+ALGORITHMS = {}
+
+
+def register_algorithm(name):
+    # Декоратор регистрации алгоритма
+    # Алгоритм вызывается как algorithm(window, num_peaks, rng) и возвращает массив (7, k)
+    # часов с пустыми местами = -1, window - результат WeeklyActivity.window
+    def decorator(algorithm):
+        ALGORITHMS[name] = algorithm
+        return algorithm
+    return decorator
+
+
+def get_algorithm(name):
+    if name not in ALGORITHMS:
+        raise ValueError(f'Неизвестный алгоритм: {name}, доступны: {", ".join(sorted(ALGORITHMS))}')
+    return ALGORITHMS[name]
+
+
+class WeeklyActivity:
+    # Активность по ISO-неделям: суммы экранного времени (n_weeks, 7, 18) и число событий
+    # Накопленные суммы позволяют получить итоги любого окна недель за O(1)
+
+    def __init__(self, first_week, activity, event_counts):
+        self.first_week = first_week
+        self.activity = activity
+        self.event_counts = event_counts
+
+        # Нулевая строка в начале соответствует пустому окну
+        self._cumulative_activity = _cumulative(activity)
+        self._cumulative_squares = _cumulative(activity ** 2)
+        self._cumulative_weeks = _cumulative((event_counts > 0).astype(np.int64))
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls.from_chunks([df])
+
+    @classmethod
+    def from_csv(cls, file_path, chunk_size=CHUNK_SIZE):
+        # Сбор недельных итогов потоково, без загрузки всего файла
+        return cls.from_chunks(DataProcessor(chunk_size=chunk_size).iter_chunks(file_path))
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        # Каждый блок дает итоги по своему диапазону недель, затем диапазоны складываются
+        parts = [part for part in (_week_arrays(chunk) for chunk in chunks) if part is not None]
+        if not parts:
+            empty = np.zeros((0, len(DAYS_OF_WEEK), len(HOURS)))
+            return cls(0, empty, empty.astype(np.int64))
+
+        first_week = min(part[0] for part in parts)
+        last_week = max(part[0] + len(part[1]) for part in parts)
+        activity = np.zeros((last_week - first_week, len(DAYS_OF_WEEK), len(HOURS)))
+        event_counts = np.zeros(activity.shape, dtype=np.int64)
+        for part_first_week, part_activity, part_counts in parts:
+            offset = part_first_week - first_week
+            activity[offset:offset + len(part_activity)] += part_activity
+            event_counts[offset:offset + len(part_counts)] += part_counts
+
+        return cls(first_week, activity, event_counts)
+
+    def __len__(self):
+        return len(self.activity)
+
+    def week_start(self, week):
+        # Дата понедельника недели с номером week (от начала данных)
+        return str(EPOCH_MONDAY + np.timedelta64(7 * (self.first_week + week), 'D'))
+
+    def window(self, start, stop):
+        # Итоги по неделям [start, stop): activity и present как у build_day_hour_matrix,
+        # squares и weeks_with_data - для оценки стабильности по неделям
+        weeks_with_data = self._cumulative_weeks[stop] - self._cumulative_weeks[start]
+        present = weeks_with_data > 0
+
+        # Разность накопленных сумм может дать погрешность порядка 1e-12 вместо нуля
+        activity = np.where(present, self._cumulative_activity[stop] - self._cumulative_activity[start], 0.0)
+        squares = np.where(present, self._cumulative_squares[stop] - self._cumulative_squares[start], 0.0)
+
+        return {
+            'activity': np.maximum(activity, 0.0),
+            'present': present,
+            'squares': np.maximum(squares, 0.0),
+            'weeks_with_data': weeks_with_data,
+        }
+
+
+def window_stability(window):
+    # Стабильность (1 - коэффициент вариации по неделям) как в
+    # ActivityAnalyzer._calculate_activity_stability: 0.5 при недостатке данных, 0 для часов без данных
+    weeks = window['weeks_with_data']
+    enough_data = (weeks > 1) & (window['activity'] > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = window['activity'] / weeks
+        variance = (window['squares'] - window['activity'] * mean) / (weeks - 1)
+        cv = np.sqrt(np.maximum(variance, 0.0)) / mean
+
+    stability = np.clip(1 - np.minimum(cv, 1.0), 0.0, None)
+    stability = np.where(enough_data, stability, 0.5)
+    return np.where(window['present'], stability, 0.0)
+
+
+@register_algorithm('greedy')
+def greedy_algorithm(window, num_peaks, rng):
+    # Наш алгоритм (find_peak_hours_per_day)
+    selected, _ = select_spaced_hours(window['activity'], window['present'], num_peaks, top_n=6)
+    return fill_default_days(selected, window['present'])
+
+
+@register_algorithm('optimal')
+def optimal_algorithm(window, num_peaks, rng):
+    # Точный выбор часов с интервалом 3 часа
+    selected = select_optimal_hours(window['activity'], num_peaks)
+    return fill_default_days(selected, window['present'])
+
+
+@register_algorithm('cv')
+def cv_algorithm(window, num_peaks, rng):
+    # CV алгоритм: активность x стабильность
+    score_matrix = window['activity'] * window_stability(window)
+    selected, _ = select_spaced_hours(
+        score_matrix, window['present'], num_peaks, top_n=num_peaks * 2,
+        fill_from_top=False, default_hours=()
+    )
+    return fill_default_days(selected, window['present'])
+
+
+@register_algorithm('random')
+def random_algorithm(window, num_peaks, rng):
+    # Случайные num_peaks часов 6-23 для каждого дня
+    hours = rng.permuted(np.tile(HOURS, (len(DAYS_OF_WEEK), 1)), axis=1)[:, :num_peaks]
+    return np.sort(hours, axis=1)
+
+
+@register_algorithm('default')
+def default_algorithm(window, num_peaks, rng):
+    # Одно и то же время по умолчанию для всех дней: первые num_peaks часов из DEFAULT_HOURS,
+    # при num_peaks больше их числа остальные места пустые (-1)
+    hours = np.full(num_peaks, -1)
+    default_hours = DEFAULT_HOURS[:num_peaks]
+    hours[:len(default_hours)] = default_hours
+    return np.tile(hours, (len(DAYS_OF_WEEK), 1))
+
+
+def make_folds(weekly, train_weeks=4, test_weeks=1, step=1):
+    # Скользящие окна: обучение на train_weeks неделях, проверка на следующих test_weeks
+    # Окна без активности в проверочных неделях пропускаются
+    folds = []
+    for start in range(0, len(weekly) - train_weeks - test_weeks + 1, step):
+        test_start = start + train_weeks
+        test_stop = test_start + test_weeks
+        if weekly.window(test_start, test_stop)['activity'].sum() > 0:
+            folds.append((start, test_start, test_stop))
+    return folds
+
+
+def run_backtest(weekly, algorithms=None, train_weeks=4, test_weeks=1, step=1,
+                 num_peaks=3, workers=None, seed=None):
+    # Проверка алгоритмов на скользящих окнах недель
+    # Пары (алгоритм, часть окон) обрабатываются параллельно в отдельных процессах
+    algorithms = algorithms or sorted(ALGORITHMS)
+    folds = make_folds(weekly, train_weeks, test_weeks, step)
+    workers = workers or os.cpu_count() or 1
+
+    # Окна делятся на части так, чтобы задач было не меньше, чем процессов
+    parts_per_algorithm = max(1, min(len(folds), -(-workers // len(algorithms))))
+    fold_parts = [part for part in np.array_split(np.arange(len(folds)), parts_per_algorithm) if len(part)]
+    tasks = [
+        (name, get_algorithm(name), weekly, [(int(index), folds[index]) for index in part], num_peaks, seed)
+        for name in algorithms
+        for part in fold_parts
+    ]
+
+    if workers == 1 or len(tasks) <= 1:
+        task_results = [_run_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            task_results = list(executor.map(_run_task, *zip(*tasks)))
+
+    fold_results = sorted(
+        (record for records in task_results for record in records),
+        key=lambda record: (record['fold'], algorithms.index(record['algorithm']))
+    )
+    return {
+        'train_weeks': train_weeks,
+        'test_weeks': test_weeks,
+        'folds': fold_results,
+        'summary': _summarize(fold_results, algorithms),
+    }
+
+
+def _run_task(name, algorithm, weekly, folds, num_peaks, seed):
+    # Один алгоритм на нескольких окнах
+    records = []
+    for fold, (start, test_start, test_stop) in folds:
+        rng = np.random.default_rng(None if seed is None else [seed, fold])
+        schedule = algorithm(weekly.window(start, test_start), num_peaks, rng)
+
+        evaluator = CoverageEvaluator.from_matrix(weekly.window(test_start, test_stop)['activity'])
+        result = evaluator.evaluate(np.asarray(schedule)[None])
+        records.append({
+            'algorithm': name,
+            'fold': fold,
+            'train_start': weekly.week_start(start),
+            'test_start': weekly.week_start(test_start),
+            'coverage': float(result['overall'][0]),
+            'daily_coverage': {
+                day: float(result['daily'][0, day_index]) for day_index, day in enumerate(DAYS_OF_WEEK)
+            },
+        })
+    return records
+
+
+def log_summary(weekly, result):
+    # Краткий итог проверки в лог: среднее покрытие и число побед каждого алгоритма
+    logger.info(f"Недель: {len(weekly)}, окон: {len(result['folds']) // max(1, len(result['summary']))}")
+    for name, stats in result['summary'].items():
+        logger.info(f"   {name}: {stats['mean_coverage']:.1f}% ± {stats['std_coverage']:.1f}, "
+                    f"лучший в {stats['wins']} из {stats['folds']}")
+
+
+def _summarize(fold_results, algorithms):
+    # Среднее покрытие по окнам и число окон, где алгоритм оказался лучшим
+    table = pd.DataFrame(
+        [(record['fold'], record['algorithm'], record['coverage']) for record in fold_results],
+        columns=['fold', 'algorithm', 'coverage']
+    )
+    if table.empty:
+        return {}
+
+    best = table.groupby('fold')['coverage'].transform('max')
+    table['win'] = table['coverage'] >= best - 1e-9
+    stats = table.groupby('algorithm')[['coverage', 'win']].agg(
+        folds=('coverage', 'size'), mean_coverage=('coverage', 'mean'), std_coverage=('coverage', 'std'),
+        min_coverage=('coverage', 'min'), max_coverage=('coverage', 'max'), wins=('win', 'sum')
+    )
+
+    summary = {}
+    for name in algorithms:
+        row = stats.loc[name]
+        summary[name] = {
+            'folds': int(row['folds']),
+            'mean_coverage': float(row['mean_coverage']),
+            'std_coverage': float(row['std_coverage']) if row['folds'] > 1 else 0.0,
+            'min_coverage': float(row['min_coverage']),
+            'max_coverage': float(row['max_coverage']),
+            'wins': int(row['wins']),
+        }
+    return summary
+
+
+def _cumulative(values):
+    cumulative = np.zeros((len(values) + 1,) + values.shape[1:], dtype=values.dtype)
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    return cumulative
+
+
+def _week_arrays(chunk):
+    # Итоги одного блока: (номер первой недели, activity[n_weeks, 7, 18], event_counts)
+    chunk = chunk[chunk['hour'].between(FIRST_HOUR, LAST_HOUR)]
+    if chunk.empty:
+        return None
+
+    days = chunk['date'].to_numpy().astype('datetime64[D]')
+    weeks = (days - EPOCH_MONDAY).astype(np.int64) // 7
+    first_week = int(weeks.min())
+    week_count = int(weeks.max()) - first_week + 1
+
+    day_index = pd.Categorical(chunk['day_name'], categories=DAYS_OF_WEEK).codes
+    hour_index = chunk['hour'].to_numpy() - FIRST_HOUR
+    flat_index = ((weeks - first_week) * len(DAYS_OF_WEEK) + day_index) * len(HOURS) + hour_index
+    size = week_count * len(DAYS_OF_WEEK) * len(HOURS)
+    shape = (week_count, len(DAYS_OF_WEEK), len(HOURS))
+
+    activity = np.bincount(flat_index, weights=chunk['screen_time'].to_numpy(dtype=float), minlength=size)
+    event_counts = np.bincount(flat_index, minlength=size)
+    return first_week, activity.reshape(shape), event_counts.reshape(shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка алгоритмов выбора часов на скользящих окнах недель')
+    parser.add_argument('--data', default='../data/processed_screen_time_data.csv', help='CSV с данными')
+    parser.add_argument('--algorithms', nargs='+', default=None, help='алгоритмы (по умолчанию все)')
+    parser.add_argument('--train-weeks', type=int, default=4, help='недель в обучающем окне')
+    parser.add_argument('--test-weeks', type=int, default=1, help='недель в проверочном окне')
+    parser.add_argument('--step', type=int, default=1, help='сдвиг окна в неделях')
+    parser.add_argument('--num-peaks', type=int, default=3, help='уведомлений в день')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов')
+    parser.add_argument('--seed', type=int, default=None, help='seed для случайного алгоритма')
+    parser.add_argument('--output', default=None, help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    weekly = WeeklyActivity.from_csv(args.data)
+    result = run_backtest(
+        weekly, args.algorithms, args.train_weeks, args.test_weeks, args.step,
+        args.num_peaks, args.workers, args.seed
+    )
+
+    log_summary(weekly, result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
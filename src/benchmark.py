@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use('Agg')
+
+from activity_analyzer import ActivityAnalyzer  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+from schedule_generator import ScheduleGenerator  # noqa: E402
+from synthetic_data import generate_screen_time_csv  # noqa: E402
+from visualizer import Visualizer  # noqa: E402
+
+
+# Корень проекта: пути по умолчанию не зависят от текущей папки
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Файл с эталонными результатами и папка для синтетических данных
+BASELINE_FILE = os.path.join(PROJECT_DIR, 'benchmarks', 'baseline.json')
+DATA_DIR = os.path.join(PROJECT_DIR, 'data', 'synthetic')
+
+# Допустимое ухудшение относительно эталона (доля) и минимальные абсолютные пороги
+# Время эталона зависит от машины, на которой он снят: перед сравнением оно масштабируется
+# отношением калибровочных замеров (calibrate) этой машины и машины эталона
+DEFAULT_THRESHOLD = 0.25
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 5.0
+
+# Размер калибровочной нагрузки (строк)
+CALIBRATION_ROWS = 500_000
+
+
+def _stage_load(state):
+    state['processor'] = DataProcessor()
+    state['processor'].load_data(state['data_file'])
+    return len(state['processor'].df)
+
+
+def _stage_preprocess(state):
+    state['df'] = state['processor'].preprocess_data()
+    return len(state['df'])
+
+
+def _stage_hourly_activity(state):
+    state['analyzer'] = ActivityAnalyzer(state['df'])
+    state['activity'] = state['analyzer'].analyze_hourly_activity()
+    return len(state['df'])
+
+
+def _stage_peak_hours(state):
+    state['best_times'] = state['analyzer'].find_peak_hours_per_day(state['activity'])
+    return len(state['activity'])
+
+
+def _stage_coverage(state):
+    state['coverage'] = state['analyzer'].calculate_coverage(state['activity'], state['best_times'])
+    return len(state['activity'])
+
+
+def _stage_compare(state):
+    state['analyzer'].compare_with_other_algorithms(state['activity'], state['best_times'])
+    return len(state['df'])
+
+
+def _stage_schedule(state):
+    generator = ScheduleGenerator()
+    schedule = generator.generate_schedule(state['best_times'], state['df'])
+    generator.save_schedule(schedule, os.path.join(state['work_dir'], 'notification_schedule.json'))
+    return len(state['df'])
+
+
+def _stage_plot(state):
+    Visualizer().create_simple_analysis_plot(
+        state['activity'], state['best_times'], os.path.join(state['work_dir'], 'main_analysis.png')
+    )
+    return len(state['activity'])
+
+
+# Этапы в том же порядке, что в NotificationScheduler.run_full_analysis
+STAGES = [
+    ('load_data', _stage_load),
+    ('preprocess_data', _stage_preprocess),
+    ('analyze_hourly_activity', _stage_hourly_activity),
+    ('find_peak_hours_per_day', _stage_peak_hours),
+    ('calculate_coverage', _stage_coverage),
+    ('compare_with_other_algorithms', _stage_compare),
+    ('generate_schedule', _stage_schedule),
+    ('create_plot', _stage_plot),
+]
+
+
+def run_pipeline(data_file, repeat=1, measure_memory=True):
+    # Замер времени каждого этапа (лучший из repeat запусков) и пиковой памяти
+    # Память меряется отдельным запуском, чтобы tracemalloc не искажал время
+    stages = {name: {'seconds': None, 'rows': 0, 'peak_mb': None} for name, _ in STAGES}
+    best_times = None
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(repeat):
+            state = {'data_file': data_file, 'work_dir': work_dir}
+            for name, stage in STAGES:
+                started = time.perf_counter()
+                rows = stage(state)
+                elapsed = time.perf_counter() - started
+
+                result = stages[name]
+                result['rows'] = rows
+                if result['seconds'] is None or elapsed < result['seconds']:
+                    result['seconds'] = elapsed
+            best_times = state['best_times']
+
+        if measure_memory:
+            state = {'data_file': data_file, 'work_dir': work_dir}
+            tracemalloc.start()
+            try:
+                for name, stage in STAGES:
+                    # Пик считаем относительно памяти, занятой к началу этапа
+                    tracemalloc.reset_peak()
+                    memory_before = tracemalloc.get_traced_memory()[0]
+                    stage(state)
+                    peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+                    stages[name]['peak_mb'] = peak_memory / 2 ** 20
+            finally:
+                tracemalloc.stop()
+
+    return {'stages': stages, 'peak_hours': best_times}
+
+
+def calibrate(repeat=5):
+    # Время эталонной нагрузки (группировка и сортировка, как в этапах анализа) на этой машине
+    # Лучший из repeat запусков, чтобы отсечь случайные задержки
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'key': rng.integers(0, 1000, CALIBRATION_ROWS),
+        'value': rng.random(CALIBRATION_ROWS),
+    })
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df.groupby('key')['value'].sum()
+        np.sort(df['value'].to_numpy())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_with_baseline(result, baseline, threshold=DEFAULT_THRESHOLD):
+    # Список регрессий по времени, памяти и изменению итогового расписания
+    # Время эталона приводится к скорости текущей машины, если у обоих есть калибровка
+    regressions = []
+    scale = 1.0
+    if result.get('calibration_seconds') and baseline.get('calibration_seconds'):
+        scale = result['calibration_seconds'] / baseline['calibration_seconds']
+
+    for name, stage in result['stages'].items():
+        reference = baseline['stages'].get(name)
+        if not reference:
+            continue
+
+        reference_seconds = reference['seconds'] * scale
+        seconds_limit = max(reference_seconds * (1 + threshold), reference_seconds + MIN_SECONDS_DELTA)
+        if stage['seconds'] > seconds_limit:
+            regressions.append(
+                f"{name}: время {stage['seconds']:.3f} с, эталон {reference_seconds:.3f} с"
+            )
+
+        if stage['peak_mb'] is not None and reference.get('peak_mb') is not None:
+            memory_limit = max(reference['peak_mb'] * (1 + threshold), reference['peak_mb'] + MIN_MEMORY_DELTA_MB)
+            if stage['peak_mb'] > memory_limit:
+                regressions.append(
+                    f"{name}: память {stage['peak_mb']:.1f} МБ, эталон {reference['peak_mb']:.1f} МБ"
+                )
+
+    if baseline.get('peak_hours') and result['peak_hours'] != baseline['peak_hours']:
+        regressions.append('Итоговое расписание отличается от эталонного')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк этапов анализа на синтетических данных')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--no-memory', action='store_true', help='Не измерять пиковую память')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--update-baseline', action='store_true', help='Сохранить результаты как эталон')
+    parser.add_argument('--output', help='Файл для сохранения результатов в JSON')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as file:
+            baselines = json.load(file)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    regressions = []
+    calibration_seconds = calibrate()
+    print(f"Калибровка: {calibration_seconds:.3f} с")
+
+    for rows in args.rows:
+        label = f'rows={rows},users={args.users},categories={args.categories},seed={args.seed}'
+
+        # Синтетические данные генерируются один раз и переиспользуются
+        data_file = os.path.join(
+            args.data_dir, f'screen_time_{rows}_{args.users}_{args.categories}_{args.seed}.csv'
+        )
+        if not os.path.exists(data_file):
+            generate_screen_time_csv(data_file, rows, args.users, args.categories, seed=args.seed)
+
+        result = run_pipeline(data_file, args.repeat, measure_memory=not args.no_memory)
+        result['calibration_seconds'] = calibration_seconds
+        results[label] = result
+
+        print(f"{label}:")
+        for name, stage in result['stages'].items():
+            memory = f"{stage['peak_mb']:.1f} МБ" if stage['peak_mb'] is not None else '-'
+            print(f"   {name}: {stage['seconds']:.3f} с, {stage['rows']} строк, {memory}")
+
+        if label in baselines:
+            for regression in compare_with_baseline(result, baselines[label], args.threshold):
+                regressions.append(f"{label}: {regression}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, ensure_ascii=False, indent=2)
+        print(f"Эталон сохранен: {args.baseline}")
+
+    if regressions:
+        print("РЕГРЕССИИ:")
+        for regression in regressions:
+            print(f"   {regression}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+
+from data_processor import CHUNK_SIZE, DataProcessor
+from models import CategorySchedules, NotificationSchedule
+from optimal_selection import select_schedule_hours
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, HOURS, LAST_HOUR
+from schedule_writer import ScheduleWriter
+
+
+# Ключ группы: user_id * CATEGORY_LIMIT + номер категории
+CATEGORY_LIMIT = 1 << 16
+
+# Ячеек день x час в одной группе
+CELLS_PER_GROUP = len(DAYS_OF_WEEK) * len(HOURS)
+
+# Сколько групп переводится в плотные матрицы за один раз
+GROUP_BATCH_SIZE = 100_000
+
+# Через сколько блоков частичные итоги объединяются, чтобы их число не росло с размером файла
+REDUCE_EVERY = 8
+
+
+class CategoryActivityCube:
+    # Разреженный куб активности категория x день x час (или пользователь x категория x день x час)
+    # Хранятся только непустые ячейки, все категории собираются за один проход по данным
+
+    def __init__(self, by_user=False):
+        self.by_user = by_user
+        self.categories = []
+        self._category_codes = {}
+        self._cell_parts = []
+        self._stats_parts = []
+        self._user_parts = []
+        self._cells = None
+
+    @classmethod
+    def from_frame(cls, df, by_user=False):
+        cube = cls(by_user)
+        cube.add_chunk(df)
+        cube.reduce()
+        return cube
+
+    @classmethod
+    def from_csv(cls, file_path, by_user=False, chunk_size=CHUNK_SIZE):
+        # Потоковая сборка куба без загрузки всего файла
+        cube = cls(by_user)
+        for chunk in DataProcessor(chunk_size=chunk_size).iter_chunks(file_path):
+            cube.add_chunk(chunk)
+        cube.reduce()
+        return cube
+
+    def add_chunk(self, chunk):
+        # Добавление блока данных: суммы по непустым ячейкам и итоги по группам
+        codes = self._encode_categories(chunk['category'])
+        valid = codes >= 0
+        user_ids = chunk['user_id'].to_numpy(dtype=np.int64)
+        group_keys = user_ids * CATEGORY_LIMIT + codes if self.by_user else codes.copy()
+
+        # Количество записей и период данных по группам (все часы, как в AnalysisMetadata)
+        self._stats_parts.append(
+            pd.DataFrame({'group': group_keys[valid], 'date': chunk['date'].to_numpy()[valid]})
+            .groupby('group')['date'].agg(['size', 'min', 'max'])
+        )
+        if not self.by_user:
+            self._user_parts.append(np.unique(codes[valid] << 32 | user_ids[valid]))
+
+        # Активность только для дневных часов 6-23
+        day_index = pd.Categorical(chunk['day_name'], categories=DAYS_OF_WEEK).codes
+        hours = chunk['hour'].to_numpy()
+        in_cube = valid & (day_index >= 0) & (hours >= FIRST_HOUR) & (hours <= LAST_HOUR)
+
+        cell_keys = (group_keys[in_cube] * len(DAYS_OF_WEEK) + day_index[in_cube]) * len(HOURS)
+        cell_keys += hours[in_cube] - FIRST_HOUR
+        self._cell_parts.append(
+            _sum_cells(cell_keys, chunk['screen_time'].to_numpy(dtype=float)[in_cube], np.ones(len(cell_keys), int))
+        )
+        self._cells = None
+        if len(self._cell_parts) >= REDUCE_EVERY:
+            self.reduce()
+
+    def reduce(self):
+        # Объединение частичных итогов блоков: ячейки, итоги групп и пары категория-пользователь
+        self._reduced_cells()
+        self._group_stats()
+        if len(self._user_parts) > 1:
+            self._user_parts = [np.unique(np.concatenate(self._user_parts))]
+
+    def group_count(self):
+        return len(self._group_stats())
+
+    def iter_group_batches(self, batch_size=GROUP_BATCH_SIZE):
+        # Плотные матрицы для пачек групп: (category_codes, user_ids, activity, present)
+        # user_ids равен None, если куб собран без разбиения по пользователям
+        keys, values, counts = self._reduced_cells()
+        cell_groups = keys // CELLS_PER_GROUP
+        groups, group_starts = np.unique(cell_groups, return_index=True)
+        group_starts = np.append(group_starts, len(keys))
+
+        for start in range(0, len(groups), batch_size):
+            batch_groups = groups[start:start + batch_size]
+            cells = slice(group_starts[start], group_starts[start + len(batch_groups)])
+
+            local_index = np.searchsorted(batch_groups, cell_groups[cells]) * CELLS_PER_GROUP
+            local_index += keys[cells] % CELLS_PER_GROUP
+            shape = (len(batch_groups), len(DAYS_OF_WEEK), len(HOURS))
+            activity = np.zeros(len(batch_groups) * CELLS_PER_GROUP)
+            present = np.zeros(activity.shape, dtype=bool)
+            activity[local_index] = values[cells]
+            present[local_index] = counts[cells] > 0
+
+            user_ids = batch_groups // CATEGORY_LIMIT if self.by_user else None
+            yield batch_groups % CATEGORY_LIMIT, user_ids, activity.reshape(shape), present.reshape(shape)
+
+    def category_summary(self):
+        # Итоги по категориям для AnalysisMetadata: пользователи, записи, период в днях
+        stats = self._group_stats()
+        codes = stats.index.to_numpy() % CATEGORY_LIMIT
+        by_category = stats.groupby(codes).agg({'size': 'sum', 'min': 'min', 'max': 'max'})
+
+        if self.by_user:
+            users = pd.Series(stats.index.to_numpy() // CATEGORY_LIMIT).groupby(codes).nunique()
+        else:
+            self.reduce()
+            pairs = self._user_parts[0] if self._user_parts else np.zeros(0, dtype=np.int64)
+            users = pd.Series(np.bincount(pairs >> 32, minlength=len(self.categories)))
+
+        return {
+            self.categories[code]: {
+                'users': int(users[code]),
+                'records': int(row['size']),
+                'period_days': (row['max'] - row['min']).days,
+            }
+            for code, row in by_category.iterrows()
+        }
+
+    def _encode_categories(self, categories):
+        # Номера категорий общие для всех блоков (в блоках набор категорий может отличаться)
+        categories = pd.Categorical(categories)
+        for name in categories.categories:
+            if name not in self._category_codes:
+                self._category_codes[name] = len(self.categories)
+                self.categories.append(name)
+
+        if len(self.categories) > CATEGORY_LIMIT:
+            raise ValueError(f'Слишком много категорий: {len(self.categories)}')
+
+        mapping = np.array([self._category_codes[name] for name in categories.categories] + [-1], dtype=np.int64)
+        return mapping[categories.codes]
+
+    def _reduced_cells(self):
+        # Объединение ячеек всех блоков (результат кэшируется до следующего add_chunk)
+        if self._cells is None:
+            if not self._cell_parts:
+                self._cells = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=int))
+            else:
+                self._cells = _sum_cells(*(np.concatenate(part) for part in zip(*self._cell_parts)))
+                self._cell_parts = [self._cells]
+        return self._cells
+
+    def _group_stats(self):
+        if len(self._stats_parts) > 1:
+            self._stats_parts = [
+                pd.concat(self._stats_parts).groupby(level=0).agg({'size': 'sum', 'min': 'min', 'max': 'max'})
+            ]
+        if not self._stats_parts:
+            return pd.DataFrame({'size': [], 'min': [], 'max': []})
+        return self._stats_parts[0]
+
+
+def category_peak_hours(cube, num_peaks=3, solver='greedy'):
+    # Пиковые часы для каждой категории: {'Social': {'monday': [...], ...}, ...}
+    if cube.by_user:
+        raise ValueError('Для расписаний по категориям нужен куб без разбиения по пользователям')
+
+    peak_hours = {}
+    for codes, _, activity, present in cube.iter_group_batches():
+        times = select_schedule_hours(activity, present, num_peaks, solver)
+        for code, category_times in zip(codes.tolist(), times):
+            peak_hours[cube.categories[code]] = _times_to_schedule(category_times)
+    return peak_hours
+
+
+def build_category_schedules(cube, num_peaks=3, solver='greedy'):
+    # Расписание NotificationSchedule для каждой категории
+    summary = cube.category_summary()
+    schedules = {}
+    for category, peak_hours in category_peak_hours(cube, num_peaks, solver).items():
+        schedules[category] = NotificationSchedule.create_from_summary(
+            peak_hours,
+            total_users=summary[category]['users'],
+            # AnalysisMetadata требует период не меньше одного дня
+            period_days=max(1, summary[category]['period_days']),
+            total_records=summary[category]['records']
+        )
+    return CategorySchedules(categories=schedules)
+
+
+def write_user_category_schedules(cube, output_path, num_peaks=3, solver='greedy'):
+    # Персональные расписания пользователь x категория в JSON Lines (UserCategorySchedule)
+    if not cube.by_user:
+        raise ValueError('Для персональных расписаний нужен куб с разбиением по пользователям')
+
+    category_names = np.array(cube.categories, dtype=object)
+    with ScheduleWriter(output_path) as writer:
+        for codes, user_ids, activity, present in cube.iter_group_batches():
+            times = select_schedule_hours(activity, present, num_peaks, solver)
+            writer.write_arrays(user_ids, times, trusted=True, categories=category_names[codes])
+        return writer.written
+
+
+def _sum_cells(keys, values, counts):
+    # Суммы значений и количества событий по одинаковым ключам ячеек (ключи по возрастанию)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return (
+        unique_keys,
+        np.bincount(inverse, weights=values, minlength=len(unique_keys)),
+        np.bincount(inverse, weights=counts, minlength=len(unique_keys)).astype(int),
+    )
+
+
+def _times_to_schedule(times):
+    # Массив (7, k) с пустыми местами = -1 в словарь {'monday': [...], ...}
+    return {
+        day.lower(): [int(hour) for hour in times[day_index] if hour >= 0]
+        for day_index, day in enumerate(DAYS_OF_WEEK)
+    }
@@ -0,0 +1,427 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+# Тяжелые модули (pandas, matplotlib, pydantic) загружаются внутри команд,
+# чтобы быстрые команды вроде query запускались без них
+
+
+logger = logging.getLogger(__name__)
+
+# Корень проекта: пути по умолчанию не зависят от текущей папки
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Значения по умолчанию; их переопределяет файл настроек (--config), а его - флаги
+DEFAULTS = {
+    'data': os.path.join(PROJECT_DIR, 'data', 'processed_screen_time_data.csv'),
+    'output_dir': os.path.join(PROJECT_DIR, 'output'),
+    'reports_dir': os.path.join(PROJECT_DIR, 'reports'),
+    'cache_dir': None,
+    'solver': 'greedy',
+    'workers': None,
+    'num_peaks': 3,
+    'streaming': False,
+    'verbose': False,
+}
+
+SCHEDULE_FILE_NAME = 'notification_schedule.json'
+USER_SCHEDULES_DIR = 'user_schedules'
+
+
+def build_parser():
+    # Общие флаги доступны во всех командах
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', help='JSON файл с настройками (ключи как у флагов: data, output_dir, ...)')
+    common.add_argument('--data', help='CSV с данными экранного времени')
+    common.add_argument('--output-dir', help='папка для расписаний')
+    common.add_argument('--reports-dir', help='папка для графиков')
+    common.add_argument('--cache-dir', help='папка колоночного кэша данных')
+    common.add_argument('--workers', type=int, help='число процессов')
+    common.add_argument('--streaming', action='store_true', default=None, help='потоковое чтение CSV')
+    common.add_argument('-v', '--verbose', action='store_true', default=None, help='подробный вывод')
+
+    # Флаги выбора часов - только у команд, которые выбирают часы
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument('--solver', choices=['greedy', 'optimal'], help='алгоритм выбора часов')
+    selection.add_argument('--num-peaks', type=int, choices=range(1, 5), help='уведомлений в день (1-4)')
+
+    parser = argparse.ArgumentParser(description='Анализ активности и расписание уведомлений')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', parents=[common], help='загрузка данных в кэш и состояние агрегатора')
+    ingest.add_argument('--state', help='файл состояния инкрементального агрегатора (.npz), '
+                                        'уже добавленные файлы пропускаются')
+    ingest.add_argument('--half-life-weeks', type=float, help='затухание активности для нового состояния')
+    ingest.add_argument('--sketch', help='файл наброска для приближенного анализа (.npz), '
+                                         'уже добавленные файлы пропускаются')
+    ingest.add_argument('--sample-size', type=int, help='записей в выборке каждого часа для нового наброска')
+    ingest.set_defaults(handler=cmd_ingest)
+
+    analyze = commands.add_parser('analyze', parents=[common, selection], help='выбор часов и покрытие активности')
+    analyze.add_argument('--random-trials', type=int, help='испытаний для оценки случайного алгоритма')
+    analyze.add_argument('--seed', type=int, help='seed случайного алгоритма')
+    analyze.add_argument('--bin-minutes', type=int, help='ширина слота в минутах (вместо целых часов)')
+    analyze.add_argument('--window-minutes', type=int, default=60, help='окно оценки слота')
+    analyze.add_argument('--min-gap-minutes', type=int, default=180, help='интервал между слотами')
+    analyze.add_argument('--approximate', action='store_true', help='приближенный анализ по наброску с границами ошибки')
+    analyze.add_argument('--sample-size', type=int, help='записей в выборке каждого часа (--approximate)')
+    analyze.add_argument('--sketch', help='готовый набросок из ingest --sketch (--approximate)')
+    analyze.add_argument('--metrics-file', help='файл для метрик этапов (JSON)')
+    analyze.add_argument('--output', help='файл для результата (JSON), по умолчанию stdout')
+    analyze.set_defaults(handler=cmd_analyze)
+
+    schedule = commands.add_parser('schedule', parents=[common, selection], help='построение и сохранение расписаний')
+    target = schedule.add_mutually_exclusive_group()
+    target.add_argument('--per-user', action='store_true', help='персональные расписания и индекс')
+    target.add_argument('--by-category', action='store_true', help='расписание для каждой категории')
+    target.add_argument('--by-user-category', action='store_true', help='расписания пользователь x категория')
+    target.add_argument('--bin-minutes', type=int, help='расписание по слотам внутри часа')
+    target.add_argument('--approximate', action='store_true', help='расписание по наброску с границами ошибки')
+    schedule.add_argument('--sample-size', type=int, help='записей в выборке каждого часа (--approximate)')
+    schedule.add_argument('--sketch', help='готовый набросок из ingest --sketch (--approximate)')
+    schedule.add_argument('--shards', type=int, help='число файлов персональных расписаний')
+    schedule.add_argument('--compress', action='store_true', help='сжимать персональные расписания gzip')
+    schedule.set_defaults(handler=cmd_schedule)
+
+    plot = commands.add_parser('plot', parents=[common, selection], help='графики активности')
+    plot.add_argument('--by-category', action='store_true', help='отдельный график для каждой категории')
+    plot.add_argument('--dpi', type=int, help='разрешение (300 для основного графика, 100 для пакета)')
+    plot.add_argument('--format', dest='fmt', default='png', help='формат файла: png, svg, pdf ...')
+    plot.set_defaults(handler=cmd_plot)
+
+    backtest = commands.add_parser('backtest', parents=[common],
+                                   help='проверка алгоритмов выбора часов на скользящих окнах недель')
+    backtest.add_argument('--algorithms', nargs='+', help='алгоритмы (по умолчанию все)')
+    backtest.add_argument('--num-peaks', type=int, choices=range(1, 5), help='уведомлений в день (1-4)')
+    backtest.add_argument('--train-weeks', type=int, default=4, help='недель в обучающем окне')
+    backtest.add_argument('--test-weeks', type=int, default=1, help='недель в проверочном окне')
+    backtest.add_argument('--step', type=int, default=1, help='сдвиг окна в неделях')
+    backtest.add_argument('--seed', type=int, help='seed случайного алгоритма')
+    backtest.add_argument('--output', help='файл для результата (JSON), по умолчанию stdout')
+    backtest.set_defaults(handler=cmd_backtest)
+
+    serve = commands.add_parser('serve', parents=[common], help='HTTP сервер получателей по слоту')
+    serve.add_argument('--index', help='файл индекса (по умолчанию из папки персональных расписаний)')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.set_defaults(handler=cmd_serve)
+
+    query = commands.add_parser('query', parents=[common], help='запрос к готовому расписанию')
+    query.add_argument('--day', help='день недели (monday ... или 0-6)')
+    query.add_argument('--hour', type=int, help='час: получатели из индекса персональных расписаний')
+    query.add_argument('--index', help='файл индекса (по умолчанию из папки персональных расписаний)')
+    query.add_argument('--schedule', help='файл общего расписания (по умолчанию из папки расписаний)')
+    query.add_argument('--count', action='store_true', help='вывести только количество получателей')
+    query.set_defaults(handler=cmd_query)
+
+    return parser
+
+
+def parse_args(argv=None):
+    # Флаги важнее файла настроек, файл настроек важнее значений по умолчанию
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.config) if args.config else {}
+    except (OSError, ValueError) as e:
+        parser.error(f'Ошибка файла настроек: {e}')
+    if getattr(args, 'random_trials', None) is not None and args.random_trials < 1:
+        parser.error(f'--random-trials должно быть не меньше 1, получено {args.random_trials}')
+    for name, default in DEFAULTS.items():
+        if getattr(args, name, None) is None:
+            setattr(args, name, config.get(name, default))
+    return args
+
+
+def load_config(file_path):
+    with open(file_path, encoding='utf-8') as file:
+        config = json.load(file)
+    if not isinstance(config, dict):
+        raise ValueError(f'Файл настроек должен содержать JSON объект: {file_path}')
+
+    config = {key.replace('-', '_'): value for key, value in config.items()}
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f'Неизвестные настройки: {", ".join(sorted(unknown))}')
+    if 'num_peaks' in config and config['num_peaks'] not in range(1, 5):
+        raise ValueError(f"num_peaks должно быть от 1 до 4, получено {config['num_peaks']}")
+
+    # Относительные пути считаются от папки файла настроек
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    for key in ('data', 'output_dir', 'reports_dir', 'cache_dir'):
+        if config.get(key):
+            config[key] = os.path.join(base_dir, config[key])
+    return config
+
+
+def cmd_ingest(args):
+    # Разбор CSV в колоночный кэш и/или добавление событий в состояние агрегатора
+    # С --sketch файл только читается потоково в набросок, кэш строится лишь вместе с --state
+    if args.sketch:
+        status = _ingest_sketch(args)
+        if status or not args.state:
+            return status
+
+    from data_processor import DataProcessor
+
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.data)), '.cache')
+    processor = DataProcessor(cache_dir=cache_dir)
+    if not processor.load_data(args.data):
+        return 1
+    logger.info(f"Данные в кэше: {len(processor.df)} строк ({'из кэша' if processor.cache_hit else 'новый'}), "
+                f"{cache_dir}")
+
+    if args.state:
+        from data_cache import source_fingerprint
+        from incremental_aggregator import IncrementalActivityAggregator
+
+        if os.path.exists(args.state):
+            aggregator = IncrementalActivityAggregator.load_state(args.state)
+        else:
+            aggregator = IncrementalActivityAggregator(half_life_weeks=args.half_life_weeks)
+
+        # Файл с тем же содержимым уже добавлен: повторная загрузка удвоила бы события
+        source = source_fingerprint(args.data)['content_hash']
+        if aggregator.has_source(source):
+            logger.warning(f"Файл {args.data} уже добавлен в состояние {args.state}, пропускаем")
+            return 0
+        aggregator.add_events(processor.df, source=source)
+        aggregator.save_state(args.state)
+        logger.info(f"Состояние обновлено: {aggregator.events_seen} событий, {args.state}")
+    return 0
+
+
+def cmd_analyze(args):
+    scheduler = _make_scheduler(args, random_trials=args.random_trials, random_seed=args.seed,
+                                metrics_file=args.metrics_file)
+    if args.approximate:
+        estimate = scheduler.run_approximate_analysis(**_sketch_options(args), seed=args.seed, save=False)
+        _write_json({
+            'peak_hours': estimate['peak_hours'],
+            'users': estimate['users'],
+            'coverage': estimate['coverage'],
+            'confidence': estimate['confidence'],
+            'days': estimate['days'],
+        }, args.output)
+        return 0
+
+    if not scheduler.load_data(args.bin_minutes):
+        return 1
+
+    if args.bin_minutes:
+        analyzer = scheduler.make_analyzer()
+        peak_minutes = analyzer.find_peak_slots_per_day(
+            args.bin_minutes, args.window_minutes, args.num_peaks, args.min_gap_minutes, args.solver
+        )
+        coverage = analyzer.calculate_slot_coverage(peak_minutes, args.bin_minutes, args.window_minutes)
+        result = {
+            'bin_minutes': args.bin_minutes,
+            'window_minutes': args.window_minutes,
+            'peak_minutes': peak_minutes,
+            'coverage': coverage,
+        }
+    else:
+        analysis = scheduler.analyze()
+        comparison = analysis['comparison']
+        result = {
+            'peak_hours': analysis['best_times'],
+            'coverage': analysis['coverage'],
+            'comparison': {
+                'cv_algorithm': comparison['cv_algorithm']['coverage'],
+                'random_algorithm': comparison['random_algorithm'],
+                'improvement_over_cv': comparison['improvement_over_cv'],
+                'improvement_over_random': comparison['improvement_over_random'],
+            },
+        }
+        if 'random_baseline' in comparison:
+            result['comparison']['random_baseline'] = comparison['random_baseline']
+
+    if args.metrics_file:
+        scheduler.metrics.save_json(args.metrics_file)
+    _write_json(result, args.output)
+    return 0
+
+
+def cmd_schedule(args):
+    scheduler = _make_scheduler(args)
+
+    if args.per_user:
+        from user_schedules import generate_user_schedules
+
+        output_dir = os.path.join(args.output_dir, USER_SCHEDULES_DIR)
+        summary = generate_user_schedules(
+            args.data, output_dir, workers=args.workers, shard_count=args.shards, num_peaks=args.num_peaks,
+            cache_dir=args.cache_dir, compress=args.compress, solver=args.solver
+        )
+        logger.info(f"Персональные расписания: {summary['users']} пользователей, {len(summary['files'])} файлов")
+        logger.info(f"Индекс: {summary['index']}")
+    elif args.by_category or args.by_user_category:
+        scheduler.run_category_schedules(by_user=args.by_user_category)
+    elif args.approximate:
+        scheduler.run_approximate_analysis(**_sketch_options(args))
+    elif args.bin_minutes:
+        if scheduler.run_slot_analysis(args.bin_minutes) is None:
+            return 1
+    else:
+        if not scheduler.load_data():
+            return 1
+        analysis = scheduler.analyze(compare=False)
+        scheduler.save_schedule(analysis['best_times'])
+    return 0
+
+
+def cmd_plot(args):
+    scheduler = _make_scheduler(args)
+
+    if args.by_category:
+        scheduler.run_category_reports(dpi=args.dpi or 100, fmt=args.fmt, workers=args.workers)
+        return 0
+
+    if not scheduler.load_data():
+        return 1
+    analysis = scheduler.analyze(compare=False)
+    scheduler.create_plot(analysis['activity_data'], analysis['best_times'], dpi=args.dpi or 300, fmt=args.fmt)
+    return 0
+
+
+def cmd_backtest(args):
+    from backtest import WeeklyActivity, get_algorithm, log_summary, run_backtest
+
+    try:
+        for name in args.algorithms or []:
+            get_algorithm(name)
+    except ValueError as e:
+        logger.error(e)
+        return 2
+
+    weekly = WeeklyActivity.from_csv(args.data)
+    result = run_backtest(
+        weekly, args.algorithms, args.train_weeks, args.test_weeks, args.step,
+        args.num_peaks, args.workers, args.seed
+    )
+    log_summary(weekly, result)
+    _write_json(result, args.output)
+    return 0
+
+
+def cmd_serve(args):
+    import asyncio
+    from schedule_index import serve
+
+    asyncio.run(serve(_index_path(args), args.host, args.port))
+    return 0
+
+
+def cmd_query(args):
+    # Без --hour - время уведомлений из общего расписания (только json),
+    # с --hour - получатели слота из индекса персональных расписаний (только numpy)
+    if args.hour is None:
+        schedule_path = args.schedule or os.path.join(args.output_dir, SCHEDULE_FILE_NAME)
+        try:
+            with open(schedule_path, encoding='utf-8') as file:
+                global_schedule = json.load(file)['global_schedule']
+        except FileNotFoundError:
+            logger.error(f"Расписание не найдено: {schedule_path}")
+            return 1
+
+        days = [_day_name(args.day)] if args.day is not None else list(global_schedule)
+        _write_json({day: global_schedule[day]['times'] for day in days})
+        return 0
+
+    if args.day is None:
+        logger.error("Для запроса получателей нужен --day")
+        return 2
+
+    from schedule_index import ScheduleIndex
+
+    day = int(args.day) if args.day.isdigit() else args.day
+    index_path = _index_path(args)
+    try:
+        index = ScheduleIndex(index_path)
+    except FileNotFoundError:
+        logger.error(f"Индекс не найден: {index_path} (соберите его командой schedule --per-user)")
+        return 1
+    user_ids = index.recipients(day, args.hour)
+    if args.count:
+        print(len(user_ids))
+    else:
+        sys.stdout.write(''.join(f'{user_id}\n' for user_id in user_ids.tolist()))
+    return 0
+
+
+def _ingest_sketch(args):
+    from data_cache import source_fingerprint
+    from sketches import SAMPLE_SIZE, ActivitySketch
+
+    # Файл с тем же содержимым уже учтен: повторное добавление удвоило бы выборки и счетчики
+    existing = ActivitySketch.load_state(args.sketch) if os.path.exists(args.sketch) else None
+    source = source_fingerprint(args.data)['content_hash']
+    if existing and existing.has_source(source):
+        logger.warning(f"Файл {args.data} уже добавлен в набросок {args.sketch}, пропускаем")
+        return 0
+
+    # Новый файл собирается с тем же размером выборки, что и сохраненный набросок
+    sample_size = args.sample_size or (existing.sample_size if existing else SAMPLE_SIZE)
+    sketch = ActivitySketch.from_csv(args.data, sample_size, source=source)
+    if existing:
+        try:
+            sketch = existing.merge(sketch)
+        except ValueError as e:
+            logger.error(f"Набросок не обновлен: {e}")
+            return 1
+    sketch.save_state(args.sketch)
+    logger.info(f"Набросок обновлен: {sketch.records} строк, около {sketch.users.count():.0f} пользователей, "
+                f"{args.sketch}")
+    return 0
+
+
+def _make_scheduler(args, **options):
+    from notification_scheduler import NotificationScheduler
+
+    return NotificationScheduler(
+        streaming=args.streaming, cache_dir=args.cache_dir, quiet=not args.verbose, solver=args.solver,
+        data_file=args.data, output_dir=args.output_dir, reports_dir=args.reports_dir, num_peaks=args.num_peaks,
+        **options
+    )
+
+
+def _sketch_options(args):
+    from sketches import SAMPLE_SIZE
+
+    return {'sample_size': args.sample_size or SAMPLE_SIZE, 'sketch_file': args.sketch, 'workers': args.workers}
+
+
+def _index_path(args):
+    from schedule_index import INDEX_FILE_NAME
+
+    return args.index or os.path.join(args.output_dir, USER_SCHEDULES_DIR, INDEX_FILE_NAME)
+
+
+def _day_name(day):
+    names = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    return names[int(day)] if day.isdigit() else day.lower()
+
+
+def _write_json(data, file_path=None):
+    text = json.dumps(data, ensure_ascii=False, indent=2, default=float)
+    if file_path:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Сообщения - в stderr, чтобы JSON результата в stdout можно было передать дальше
+    from main import setup_logging
+    setup_logging(quiet=not args.verbose, stream=sys.stderr, stages=args.verbose)
+
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import numpy as np
+
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, LAST_HOUR, build_day_hour_matrix
+
+
+# Сколько расписаний оценивается за один раз
+EVALUATE_BATCH_SIZE = 200_000
+
+
+def schedule_to_array(peak_hours, width=None):
+    # Словарь {'monday': [...], ...} -> массив (7, k) с пустыми местами = -1
+    hours_by_day = [list(peak_hours.get(day.lower(), [])) for day in DAYS_OF_WEEK]
+    width = width or max(1, max(len(hours) for hours in hours_by_day))
+    schedule = np.full((len(DAYS_OF_WEEK), width), -1)
+    for day_index, hours in enumerate(hours_by_day):
+        schedule[day_index, :len(hours)] = hours
+    return schedule
+
+
+class CoverageEvaluator:
+    # Оценка покрытия активности сразу для пачки расписаний
+    # Суммы по дням и часам считаются один раз при создании, результаты совпадают
+    # с ActivityAnalyzer.calculate_coverage до последнего знака
+
+    def __init__(self, hourly_activity=None, activity_matrix=None):
+        # activity_matrix - готовая матрица 7x18 вместо таблицы hourly_activity
+        if activity_matrix is not None:
+            self.activity_matrix = np.asarray(activity_matrix, dtype=float)
+            self.day_totals = self.activity_matrix.sum(axis=1)
+            self.total_activity = self.activity_matrix.sum()
+            return
+
+        self.activity_matrix, _ = build_day_hour_matrix(hourly_activity)
+
+        # Итоги по дням и общий итог считаются так же, как в calculate_coverage
+        self.day_totals = np.array([
+            hourly_activity[hourly_activity['day_name'] == day]['screen_time'].sum()
+            for day in DAYS_OF_WEEK
+        ], dtype=float)
+        self.total_activity = hourly_activity['screen_time'].sum()
+
+    @classmethod
+    def from_matrix(cls, activity_matrix):
+        # Оценщик для готовой матрицы 7x18 (например активности за одну неделю)
+        return cls(activity_matrix=activity_matrix)
+
+    def evaluate(self, schedules):
+        # schedules - массив (n, 7, k) часов с пустыми местами = -1
+        # Возвращает словарь массивов: overall (n,), daily (n, 7), covered (n,)
+        schedules = np.asarray(schedules)
+        overall = np.empty(len(schedules))
+        daily = np.empty((len(schedules), len(DAYS_OF_WEEK)))
+        covered = np.empty(len(schedules))
+
+        for start in range(0, len(schedules), EVALUATE_BATCH_SIZE):
+            batch = slice(start, start + EVALUATE_BATCH_SIZE)
+            overall[batch], daily[batch], covered[batch] = self._evaluate_batch(schedules[batch])
+
+        return {'overall': overall, 'daily': daily, 'covered': covered}
+
+    def evaluate_schedule(self, peak_hours):
+        # Покрытие одного расписания в формате ActivityAnalyzer.calculate_coverage
+        result = self.evaluate(schedule_to_array(peak_hours)[None])
+        return self.coverage_dict(result, 0)
+
+    def coverage_dict(self, result, position):
+        # Результат для одного расписания из пачки в формате calculate_coverage
+        return {
+            'overall_coverage': result['overall'][position],
+            'daily_coverage': {
+                day: result['daily'][position, day_index] for day_index, day in enumerate(DAYS_OF_WEEK)
+            },
+            'total_activity': self.total_activity,
+            'covered_activity': result['covered'][position]
+        }
+
+    def _evaluate_batch(self, schedules):
+        # Часы каждого дня сортируем и убираем повторы (как isin в calculate_coverage)
+        hours = np.sort(schedules, axis=-1)
+        repeated = np.zeros(hours.shape, dtype=bool)
+        repeated[..., 1:] = hours[..., 1:] == hours[..., :-1]
+        valid = ~repeated & (hours >= FIRST_HOUR) & (hours <= LAST_HOUR)
+
+        day_index = np.arange(len(DAYS_OF_WEEK))[None, :, None]
+        hour_values = np.where(valid, self.activity_matrix[day_index, hours.clip(FIRST_HOUR, LAST_HOUR) - FIRST_HOUR], 0.0)
+
+        # Суммируем по порядку часов, чтобы повторить порядок сложения pandas
+        day_covered = np.zeros(hours.shape[:2])
+        for position in range(hours.shape[-1]):
+            day_covered += hour_values[..., position]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily = np.where(self.day_totals > 0, day_covered / self.day_totals * 100, 0)
+
+        total_covered = np.zeros(len(schedules))
+        for day_position in range(len(DAYS_OF_WEEK)):
+            total_covered += day_covered[:, day_position]
+
+        if self.total_activity > 0:
+            overall = total_covered / self.total_activity * 100
+        else:
+            overall = np.zeros(len(schedules))
+
+        return overall, daily, total_covered
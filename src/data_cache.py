@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Версия формата кэша - при изменении старые записи считаются устаревшими
+CACHE_FORMAT_VERSION = 1
+
+# Размер блока при вычислении хэша исходного файла
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class DataCache:
+    # Дисковый колоночный кэш обработанных данных
+    # Каждая колонка хранится в отдельном .npy файле и открывается через memory map:
+    # таблица строится прямо поверх отображенных файлов без копирования колонок
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def load(self, source_path, fingerprint=None):
+        # Загрузка обработанных данных из кэша, None если запись отсутствует или устарела
+        # fingerprint - уже посчитанный source_fingerprint, чтобы не читать файл повторно
+        entry_dir = self._entry_dir(source_path)
+        meta_path = os.path.join(entry_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+
+            if meta['source'] != (fingerprint or source_fingerprint(source_path)):
+                self._remove(entry_dir)
+                return None
+
+            columns = {}
+            for column in meta['columns']:
+                # Обычный массив поверх отображения (copy-on-write: изменения не попадают в файл)
+                values = np.load(os.path.join(entry_dir, f"{column['name']}.npy"), mmap_mode='c').view(np.ndarray)
+                if len(values) != meta['rows']:
+                    raise ValueError(f"Неверная длина колонки {column['name']}")
+
+                if 'categories' in column:
+                    # Коды проверяем сами: проверка from_codes копирует массив
+                    if len(values) and (values.min() < -1 or values.max() >= len(column['categories'])):
+                        raise ValueError(f"Неверные коды категорий в колонке {column['name']}")
+                    values = pd.Categorical.from_codes(values, categories=column['categories'], validate=False)
+                columns[column['name']] = values
+
+            return pd.DataFrame(columns, copy=False)
+        except Exception as e:
+            # Поврежденную запись удаляем, данные будут прочитаны заново
+            logger.warning(f"Кэш поврежден и будет пересоздан: {e}")
+            self._remove(entry_dir)
+            return None
+
+    def store(self, source_path, df, fingerprint=None):
+        # Сохранение обработанных данных в кэш
+        # Запись сначала создается во временной папке и затем атомарно переименовывается
+        # fingerprint нужно снять до разбора файла: если файл изменится во время разбора,
+        # запись окажется устаревшей и будет пересоздана при следующей загрузке
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = self._entry_dir(source_path)
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+
+        try:
+            columns = []
+            for name in df.columns:
+                column = {'name': name}
+                values = df[name]
+
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    column['categories'] = values.cat.categories.tolist()
+                    values = values.cat.codes
+
+                np.save(os.path.join(temp_dir, f'{name}.npy'), values.to_numpy())
+                columns.append(column)
+
+            meta = {
+                'source': fingerprint or source_fingerprint(source_path),
+                'rows': len(df),
+                'columns': columns,
+            }
+            with open(os.path.join(temp_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+                json.dump(meta, file, ensure_ascii=False, indent=2)
+
+            self._remove(entry_dir)
+            os.replace(temp_dir, entry_dir)
+        except Exception:
+            self._remove(temp_dir)
+            raise
+
+    def _entry_dir(self, source_path):
+        # Папка записи определяется абсолютным путем к исходному файлу
+        source_path = os.path.abspath(source_path)
+        path_digest = hashlib.sha1(source_path.encode('utf-8')).hexdigest()[:16]
+        file_name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f'{file_name}-{path_digest}')
+
+    @staticmethod
+    def _remove(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def source_fingerprint(source_path):
+    # Ключ кэша: путь, размер, время изменения и хэш содержимого файла
+    stat = os.stat(source_path)
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(source_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            content_hash.update(block)
+
+    return {
+        'version': CACHE_FORMAT_VERSION,
+        'path': os.path.abspath(source_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'content_hash': content_hash.hexdigest(),
+    }
@@ -1,36 +1,266 @@
+import io
+import logging
+import os
+
+import numpy as np
 import pandas as pd
 
+from data_cache import DataCache, source_fingerprint
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, LAST_HOUR
+
+
+logger = logging.getLogger(__name__)
+
+# Размер блока строк при потоковом чтении CSV
+CHUNK_SIZE = 500_000
+
+# Формат даты в исходном файле
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+# Компактные типы колонок для потокового чтения
+CSV_DTYPES = {
+    'user_id': 'int32',
+    'category': 'category',
+    'screen_time': 'float64',
+    'day_of_week': 'int8',
+    'day_name': pd.CategoricalDtype(DAYS_OF_WEEK),
+}
+
+# Колонки исходного файла в порядке следования
+CSV_COLUMNS = ['user_id', 'date', 'category', 'screen_time', 'day_of_week', 'day_name']
+
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, chunk_size=CHUNK_SIZE, cache_dir=None):
         self.df = None
+        # Итоги потокового подсчета (aggregate_activity), если исходная таблица не загружается
+        self.aggregate = None
+        self.chunk_size = chunk_size
+        self.cache = DataCache(cache_dir) if cache_dir else None
+        self.cache_hit = False
 
-    def load_data(self, file_path):
+    def load_data(self, file_path, streaming=False):
         # Загрузка данных из CSV файла
+        # При включенном кэше обработанные данные берутся с диска без повторного разбора
+        self.cache_hit = False
+        try:
+            if self.cache:
+                # Ключ файла снимается один раз до разбора и используется и для проверки, и для записи
+                fingerprint = source_fingerprint(file_path)
+                self.df = self.cache.load(file_path, fingerprint)
+                self.cache_hit = self.df is not None
+                if not self.cache_hit:
+                    self.df = self._concat_chunks(self.iter_chunks(file_path))
+                    self._store_cache(file_path, fingerprint)
+            elif streaming:
+                # Читаем файл блоками сразу в компактных типах
+                self.df = self._concat_chunks(self.iter_chunks(file_path))
+            else:
+                self.df = pd.read_csv(file_path, delimiter=';')
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка загрузки: {e}")
+            return False
+
+    def aggregate_activity(self, file_path, bin_minutes=None):
+        # Потоковый подсчет без сохранения исходных строк (self.df не заполняется)
+        # weekly_activity - экранное время по дню недели, часу (6-23) и ISO-неделе:
+        # из него получаются и почасовая активность, и стабильность по неделям;
+        # total_users, period_days и total_records - для метаданных расписания
+        # С bin_minutes за тот же проход собираются матрицы день x слот (slot_activity)
         try:
-            self.df = pd.read_csv(file_path, delimiter=';')
+            self.aggregate = self._aggregate_chunks(self.iter_chunks(file_path), bin_minutes)
             return True
         except Exception as e:
-            print(f"Ошибка загрузки: {e}")
+            logger.error(f"Ошибка загрузки: {e}")
             return False
 
+    def _store_cache(self, file_path, fingerprint):
+        # Ошибка записи кэша не мешает работе: разобранные данные уже в памяти
+        try:
+            self.cache.store(file_path, self.df, fingerprint)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить кэш: {e}")
+
+    def iter_chunks(self, file_path, byte_range=None):
+        # Потоковое чтение CSV блоками ограниченного размера
+        # Десятичная запятая и формат даты разбираются самим парсером
+        # byte_range - только часть файла (start, end) из source_byte_ranges, заголовок берется из начала файла
+        if byte_range is not None:
+            with open(file_path, 'rb') as file:
+                names = file.readline().decode('utf-8').rstrip('\r\n').split(';')
+            with ByteRangeReader(file_path, *byte_range) as source:
+                yield from self._read_chunks(source, header=None, names=names)
+        else:
+            yield from self._read_chunks(file_path)
+
+    def _read_chunks(self, source, **options):
+        try:
+            reader = pd.read_csv(
+                source,
+                delimiter=';',
+                decimal=',',
+                dtype=CSV_DTYPES,
+                parse_dates=['date'],
+                date_format=DATE_FORMAT,
+                chunksize=self.chunk_size,
+                **options,
+            )
+        except pd.errors.EmptyDataError:
+            # Пустой файл без заголовка - блоков нет
+            return
+        with reader:
+            for chunk in reader:
+                # В файле из одного заголовка блок пустой и дата не разобрана
+                if chunk.empty:
+                    continue
+                yield self._add_derived_columns(chunk)
+
     def preprocess_data(self):
         # Подготовка данных для анализа
+        # Данные, загруженные потоково, уже имеют нужные типы
 
         # Преобразуем экранное время в числа
-        self.df['screen_time'] = self.df['screen_time'].str.replace(',', '.').astype(float)
+        if not pd.api.types.is_numeric_dtype(self.df['screen_time']):
+            self.df['screen_time'] = self.df['screen_time'].str.replace(',', '.').astype(float)
 
         # Преобразуем даты в правильный формат
-        self.df['date'] = pd.to_datetime(self.df['date'])
-
-        # Извлекаем час из даты
-        self.df['hour'] = self.df['date'].dt.hour
+        if not pd.api.types.is_datetime64_any_dtype(self.df['date']):
+            self.df['date'] = pd.to_datetime(self.df['date'])
 
-        # Помечаем выходные дни
-        self.df['is_weekend'] = self.df['day_of_week'].isin([6, 7])
+        if 'hour' not in self.df.columns:
+            self.df = self._add_derived_columns(self.df)
 
         return self.df
 
     def get_clean_data(self):
         # Возвращает обработанные данные
-        return self.df
\ No newline at end of file
+        return self.df
+
+    @staticmethod
+    def _add_derived_columns(df):
+        # Извлекаем час из даты
+        df['hour'] = df['date'].dt.hour
+
+        # Помечаем выходные дни
+        df['is_weekend'] = df['day_of_week'].isin([6, 7])
+
+        return df
+
+    @staticmethod
+    def _aggregate_chunks(chunks, bin_minutes=None):
+        if bin_minutes:
+            from slot_selection import build_day_slot_matrix, slot_starts
+
+            slot_activity = np.zeros((len(DAYS_OF_WEEK), len(slot_starts(bin_minutes))))
+            slot_present = np.zeros(slot_activity.shape, dtype=bool)
+
+        weekly_activity = None
+        user_ids = np.array([], dtype='int32')
+        first_date = last_date = None
+        total_records = 0
+        for chunk in chunks:
+            total_records += len(chunk)
+            user_ids = np.union1d(user_ids, chunk['user_id'].unique())
+            chunk_first, chunk_last = chunk['date'].min(), chunk['date'].max()
+            first_date = chunk_first if first_date is None else min(first_date, chunk_first)
+            last_date = chunk_last if last_date is None else max(last_date, chunk_last)
+
+            # Недельные суммы блока складываем с накопленными
+            chunk_activity = weekly_screen_time(chunk[chunk['hour'].between(FIRST_HOUR, LAST_HOUR)])
+            weekly_activity = chunk_activity if weekly_activity is None else weekly_activity.add(
+                chunk_activity, fill_value=0
+            )
+
+            if bin_minutes:
+                chunk_slots, chunk_present = build_day_slot_matrix(chunk, bin_minutes)
+                slot_activity += chunk_slots
+                slot_present |= chunk_present
+
+        if weekly_activity is None:
+            weekly_activity = weekly_screen_time(DataProcessor._empty_frame())
+        aggregate = {
+            'weekly_activity': weekly_activity.sort_index(),
+            'total_users': len(user_ids),
+            'period_days': (last_date - first_date).days if total_records else 0,
+            'total_records': total_records,
+        }
+        if bin_minutes:
+            aggregate['slot_activity'] = (slot_activity, slot_present)
+        return aggregate
+
+    @staticmethod
+    def _concat_chunks(chunks):
+        # Склеиваем блоки, сохраняя категориальные колонки
+        # Набор категорий в разных блоках может отличаться, поэтому объединяем их
+        chunks = list(chunks)
+        if not chunks:
+            return DataProcessor._empty_frame()
+        if len(chunks) == 1:
+            return chunks[0]
+
+        categories = pd.api.types.union_categoricals(
+            [chunk['category'] for chunk in chunks]
+        ).categories
+        for chunk in chunks:
+            chunk['category'] = chunk['category'].cat.set_categories(categories)
+
+        return pd.concat(chunks, ignore_index=True)
+
+    @staticmethod
+    def _empty_frame():
+        # Пустая таблица с теми же колонками и типами, что и при разборе файла
+        df = pd.DataFrame({
+            column: pd.Series(dtype=CSV_DTYPES.get(column, 'datetime64[ns]')) for column in CSV_COLUMNS
+        })
+        return DataProcessor._add_derived_columns(df)
+
+
+def weekly_screen_time(df):
+    # Экранное время по дню недели, часу и ISO-неделе (уровни day_name, hour, year, week)
+    iso_calendar = df['date'].dt.isocalendar()
+    return df.groupby(
+        [df['day_name'], df['hour'], iso_calendar['year'], iso_calendar['week']],
+        sort=False, observed=True
+    )['screen_time'].sum()
+
+
+def source_byte_ranges(file_path, parts):
+    # Деление CSV на parts частей (start, end) в байтах без заголовка
+    # Границы сдвигаются на начало следующей строки, пустые части отбрасываются
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        file.readline()
+        bounds = [file.tell()]
+        for part in range(1, parts):
+            offset = bounds[0] + (size - bounds[0]) * part // parts
+            if offset <= bounds[-1]:
+                continue
+            # Символ перед offset - конец строки: тогда readline дочитывает только его
+            file.seek(offset - 1)
+            file.readline()
+            bounds.append(min(file.tell(), size))
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+class ByteRangeReader(io.RawIOBase):
+    # Часть файла [start, end) как отдельный поток для pd.read_csv
+
+    def __init__(self, file_path, start, end):
+        self.file = open(file_path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.file.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
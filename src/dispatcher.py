@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import glob
+import heapq
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models import MinuteNotificationSchedule, NotificationSchedule
+from peak_selection import DAYS_OF_WEEK
+from schedule_index import INDEX_FILE_NAME, ScheduleIndex, build_index_arrays
+from schedule_writer import iter_user_schedules
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько получателей отправляется одним вызовом sink.send
+BATCH_SIZE = 1_000
+
+# Одновременных отправок и пачек, ожидающих отправки (при заполнении очереди нарезка ждет)
+CONCURRENCY = 32
+QUEUE_SIZE = 256
+
+# Повторы неудачных отправок: задержка растет вдвое с каждой попыткой
+MAX_RETRIES = 3
+RETRY_DELAY = 0.5
+
+# Слот, пропущенный не более чем на GRACE_SECONDS (например при перезапуске), отправляется сразу
+# Уже отправленный слот повторно не отправляется: время отправок хранится в sent_slots (и в state_file)
+GRACE_SECONDS = 60
+
+# Как часто проверять, не заменен ли файл расписания, пока ждем следующий слот
+RELOAD_INTERVAL = 60
+
+
+def slot_label(day, minute):
+    # (0, 540) -> 'monday 09:00'
+    return f'{DAYS_OF_WEEK[day].lower()} {minute // 60:02d}:{minute % 60:02d}'
+
+
+class GlobalScheduleSource:
+    # Общее расписание (notification_schedule.json, в часах или минутах) для заданной аудитории
+
+    def __init__(self, schedule_path, audience):
+        self.schedule_path = schedule_path
+        self.audience = np.asarray(audience, dtype=np.int64)
+        self._slots = _load_global_slots(schedule_path)
+
+    def slots(self):
+        # Слоты недели: список (день 0-6, минута от полуночи)
+        return self._slots
+
+    def recipients(self, day, minute):
+        return self.audience
+
+    def reload(self):
+        return False
+
+
+class UserScheduleSource:
+    # Персональные расписания через обратный индекс (день, час) -> user_id
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def from_path(cls, path):
+        # Файл индекса .npy, папка с результатом generate_user_schedules или файлы JSON Lines
+        if os.path.isdir(path):
+            index_path = os.path.join(path, INDEX_FILE_NAME)
+            if os.path.exists(index_path):
+                return cls(ScheduleIndex(index_path))
+            return cls.from_jsonl(sorted(glob.glob(os.path.join(path, '*.jsonl*'))))
+        if path.endswith('.npy'):
+            return cls(ScheduleIndex(path))
+        return cls.from_jsonl([path])
+
+    @classmethod
+    def from_jsonl(cls, file_paths):
+        user_ids = []
+        times = []
+        for file_path in file_paths:
+            for row in iter_user_schedules(file_path):
+                day_times = np.full((len(DAYS_OF_WEEK), 4), -1)
+                for day_index, day in enumerate(DAYS_OF_WEEK):
+                    hours = row['schedule'][day.lower()]['times']
+                    day_times[day_index, :len(hours)] = hours
+                user_ids.append(row['user_id'])
+                times.append(day_times)
+
+        times = np.array(times).reshape(-1, len(DAYS_OF_WEEK), 4)
+        return cls(ScheduleIndex.from_arrays(*build_index_arrays(user_ids, times)))
+
+    def slots(self):
+        days, hours = np.nonzero(self.index.slot_sizes())
+        return [(int(day), int(hour) * 60) for day, hour in zip(days, hours)]
+
+    def recipients(self, day, minute):
+        return self.index.recipients(day, minute // 60)
+
+    def reload(self):
+        return self.index.reload()
+
+
+class StubSink:
+    # Приемник для проверки: считает уведомления, может имитировать задержку и ошибки
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = 0
+        self.batches = 0
+        self._rng = np.random.default_rng(seed)
+
+    async def send(self, user_ids, slot):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise ConnectionError(f'Имитация ошибки отправки для {slot}')
+        self.sent += len(user_ids)
+        self.batches += 1
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    # Запись отправленных пачек в JSON Lines: одна строка на пачку
+    # Запись выполняется в отдельном потоке, чтобы не останавливать цикл событий
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'a', encoding='utf-8')
+        self._lock = asyncio.Lock()
+
+    async def send(self, user_ids, slot):
+        line = json.dumps({'slot': slot, 'user_ids': np.asarray(user_ids).tolist()}) + '\n'
+        async with self._lock:
+            await asyncio.to_thread(self.file.write, line)
+
+    def close(self):
+        self.file.close()
+
+
+class NotificationDispatcher:
+    # Отправка уведомлений по расписанию: куча ближайших слотов недели,
+    # нарезка получателей на пачки, ограниченное число одновременных отправок и повторы
+    # hooks - функции вида hook(event, payload), вызываются после каждого слота ('slot')
+    # state_file - JSON с последними отправками слотов, чтобы не повторять их после перезапуска
+
+    def __init__(self, source, sink, batch_size=BATCH_SIZE, concurrency=CONCURRENCY, queue_size=QUEUE_SIZE,
+                 max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, hooks=None, clock=datetime.now,
+                 state_file=None):
+        self.source = source
+        self.sink = sink
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.hooks = list(hooks or [])
+        self.clock = clock
+        self.slot_records = []
+
+        # Последнее отправленное наступление каждого слота: (день, минута) -> запланированное время
+        self.state_file = state_file
+        self.sent_slots = _load_sent_slots(state_file) if state_file else {}
+
+    async def run(self, max_slots=None):
+        # Бесконечный цикл отправки (или до max_slots отправленных слотов)
+        heap = self._build_heap(self.clock())
+        dispatched = 0
+
+        while heap and (max_slots is None or dispatched < max_slots):
+            fire_at, day, minute = heap[0]
+            delay = (fire_at - self.clock()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, RELOAD_INTERVAL))
+                # Расписание могли заменить, пока мы ждали
+                if self.source.reload():
+                    heap = self._build_heap(self.clock())
+                continue
+
+            heapq.heapreplace(heap, (fire_at + timedelta(days=7), day, minute))
+            await self.dispatch_slot(day, minute, fire_at)
+            self._mark_sent(day, minute, fire_at)
+            dispatched += 1
+
+    async def dispatch_slot(self, day, minute, scheduled_at=None):
+        # Отправка одного слота, возвращает запись метрик слота
+        label = slot_label(day, minute)
+        started_at = self.clock()
+        started = time.perf_counter()
+        recipients = self.source.recipients(day, minute)
+
+        record = {
+            'slot': label,
+            'scheduled_at': (scheduled_at or started_at).isoformat(timespec='seconds'),
+            'lag_seconds': (started_at - scheduled_at).total_seconds() if scheduled_at else 0.0,
+            'recipients': len(recipients),
+            'sent': 0,
+            'failed': 0,
+            'retries': 0,
+            'batches': 0,
+            'seconds': None,
+            'throughput': None,
+        }
+
+        # Очередь ограничена: если отправка не успевает, нарезка новых пачек ждет
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [
+            asyncio.create_task(self._worker(queue, label, record))
+            for _ in range(min(self.concurrency, max(1, -(-len(recipients) // self.batch_size))))
+        ]
+        try:
+            for start in range(0, len(recipients), self.batch_size):
+                await queue.put(recipients[start:start + self.batch_size])
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        record['seconds'] = time.perf_counter() - started
+        record['throughput'] = record['sent'] / record['seconds'] if record['seconds'] > 0 else None
+        self.slot_records.append(record)
+
+        logger.info(f"Слот {label}: отправлено {record['sent']} из {record['recipients']}, "
+                    f"ошибок {record['failed']}, задержка {record['lag_seconds']:.1f} с, "
+                    f"{record['seconds']:.2f} с")
+        for hook in self.hooks:
+            hook('slot', record)
+        return record
+
+    def _build_heap(self, now):
+        # Ближайшее наступление каждого слота недели
+        # Наступление в пределах GRACE_SECONDS, которое уже отправлено, переносится на неделю вперед
+        heap = []
+        for day, minute in self.source.slots():
+            fire_at = _next_occurrence(now, day, minute)
+            last_sent = self.sent_slots.get((day, minute))
+            if last_sent is not None and fire_at <= last_sent:
+                fire_at += timedelta(days=7)
+            heap.append((fire_at, day, minute))
+        heapq.heapify(heap)
+        return heap
+
+    def _mark_sent(self, day, minute, fire_at):
+        self.sent_slots[(day, minute)] = fire_at
+        if self.state_file:
+            _save_sent_slots(self.state_file, self.sent_slots)
+
+    async def _worker(self, queue, label, record):
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            record['batches'] += 1
+            await self._send_with_retry(batch, label, record)
+
+    async def _send_with_retry(self, batch, label, record):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sink.send(batch, label)
+                record['sent'] += len(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    record['failed'] += len(batch)
+                    logger.warning(f"Слот {label}: пачка из {len(batch)} не отправлена: {e}")
+                    return
+                record['retries'] += 1
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+
+def _next_occurrence(now, day, minute):
+    # Ближайшее время слота (день недели, минута) не раньше now - GRACE_SECONDS
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    fire_at = midnight + timedelta(days=(day - now.weekday()) % 7, minutes=minute)
+    if fire_at < now - timedelta(seconds=GRACE_SECONDS):
+        fire_at += timedelta(days=7)
+    return fire_at
+
+
+def _load_sent_slots(state_file):
+    # Отправленные слоты из файла состояния; файла еще нет - отправок не было
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, encoding='utf-8') as file:
+        rows = json.load(file)
+    return {(row['day'], row['minute']): datetime.fromisoformat(row['sent_for']) for row in rows}
+
+
+def _save_sent_slots(state_file, sent_slots):
+    # Атомарная запись: временный файл рядом и переименование
+    rows = [
+        {'day': day, 'minute': minute, 'sent_for': fire_at.isoformat()}
+        for (day, minute), fire_at in sorted(sent_slots.items())
+    ]
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(state_file)), '.tmp-' + os.path.basename(state_file))
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(rows, file)
+    os.replace(temp_path, state_file)
+
+
+def _load_global_slots(schedule_path):
+    # Слоты общего расписания: время в часах (NotificationSchedule) или минутах (MinuteNotificationSchedule)
+    with open(schedule_path, encoding='utf-8') as file:
+        data = json.load(file)
+
+    if 'bin_minutes' in data:
+        schedule = MinuteNotificationSchedule.model_validate(data).global_schedule
+        minutes_per_unit = 1
+    else:
+        schedule = NotificationSchedule.model_validate(data).global_schedule
+        minutes_per_unit = 60
+
+    return [
+        (day_index, value * minutes_per_unit)
+        for day_index, day in enumerate(DAYS_OF_WEEK)
+        for value in getattr(schedule, day.lower()).times
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Отправка уведомлений по готовому расписанию')
+    parser.add_argument('schedule', help='notification_schedule.json, индекс .npy, папка или файл персональных расписаний')
+    parser.add_argument('--audience', help='файл с user_id (по одному в строке) для общего расписания')
+    parser.add_argument('--sink', choices=['stub', 'file'], default='stub')
+    parser.add_argument('--output', default='notifications.jsonl', help='файл для --sink file')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES)
+    parser.add_argument('--once', nargs=2, metavar=('DAY', 'HH:MM'), help='отправить один слот сейчас')
+    parser.add_argument('--state', help='файл состояния отправок, чтобы не повторять слоты после перезапуска')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.schedule.endswith('.json'):
+        audience = np.loadtxt(args.audience, dtype=np.int64, ndmin=1) if args.audience else np.zeros(0, np.int64)
+        source = GlobalScheduleSource(args.schedule, audience)
+    else:
+        source = UserScheduleSource.from_path(args.schedule)
+
+    sink = FileSink(args.output) if args.sink == 'file' else StubSink()
+    dispatcher = NotificationDispatcher(
+        source, sink, args.batch_size, args.concurrency, args.queue_size, args.max_retries,
+        state_file=args.state
+    )
+
+    try:
+        if args.once:
+            day = [name.lower() for name in DAYS_OF_WEEK].index(args.once[0].lower())
+            hour, minute = (int(part) for part in args.once[1].split(':'))
+            record = asyncio.run(dispatcher.dispatch_slot(day, hour * 60 + minute))
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        else:
+            asyncio.run(dispatcher.run())
+    finally:
+        sink.close()
+
+
+if __name__ == '__main__':
+    main()
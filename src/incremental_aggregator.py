@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from peak_selection import (
+    DAYS_OF_WEEK, FIRST_HOUR, HOURS, LAST_HOUR, select_spaced_hours, selection_to_schedule
+)
+
+
+# Понедельник, от которого отсчитываются номера недель
+WEEK_EPOCH = np.datetime64('1970-01-05')
+
+# Количество строк JSONL, обрабатываемых за один раз
+JSONL_BATCH_SIZE = 10_000
+
+
+class IncrementalActivityAggregator:
+    # Накопление активности день x час по мере поступления новых событий
+    # Каждое обновление стоит O(новых событий), история повторно не читается
+
+    def __init__(self, half_life_weeks=None):
+        # half_life_weeks - через сколько недель вес активности уменьшается вдвое
+        # None - без затухания, итог совпадает с обычными суммами
+        self.half_life_weeks = half_life_weeks
+        self.totals = np.zeros((len(DAYS_OF_WEEK), len(HOURS)))
+        self.present = np.zeros(self.totals.shape, dtype=bool)
+        self.weekly = {}
+        self.reference_week = None
+        self.events_seen = 0
+        # Ключи уже добавленных файлов, чтобы повторная загрузка не удваивала события
+        self.sources = set()
+
+    def has_source(self, source):
+        return source in self.sources
+
+    def add_events(self, events, source=None):
+        # Добавление пачки событий (DataFrame с колонками date и screen_time)
+        # source - ключ файла, из которого взяты события (запоминается в состоянии)
+        if source is not None:
+            self.sources.add(source)
+        dates = pd.to_datetime(events['date']).to_numpy()
+        screen_time = events['screen_time']
+        if not pd.api.types.is_numeric_dtype(screen_time):
+            screen_time = screen_time.astype(str).str.replace(',', '.', regex=False)
+        screen_time = pd.to_numeric(screen_time).to_numpy(dtype=float)
+
+        days = dates.astype('datetime64[D]')
+        hours = (dates - days).astype('timedelta64[h]').astype(int)
+        days_since_epoch = (days - WEEK_EPOCH).astype(int)
+        day_index = days_since_epoch % 7
+        week_index = days_since_epoch // 7
+
+        # Учитываем только дневное время 6-23
+        valid = (hours >= FIRST_HOUR) & (hours <= LAST_HOUR) & ~np.isnan(screen_time)
+        day_index, hours = day_index[valid], hours[valid] - FIRST_HOUR
+        week_index, screen_time = week_index[valid], screen_time[valid]
+        self.events_seen += int(valid.sum())
+
+        if len(screen_time) == 0:
+            return self
+
+        # Сдвигаем опорную неделю вперед, состаривая накопленные суммы
+        newest_week = int(week_index.max())
+        if self.reference_week is None:
+            self.reference_week = newest_week
+        elif newest_week > self.reference_week:
+            self.totals *= self._decay(newest_week - self.reference_week)
+            self.reference_week = newest_week
+
+        # События старше опорной недели входят в итог с меньшим весом
+        weights = self._decay(self.reference_week - week_index)
+        np.add.at(self.totals, (day_index, hours), screen_time * weights)
+        self.present[day_index, hours] = True
+
+        # Недельные суммы храним без затухания
+        for week in np.unique(week_index):
+            in_week = week_index == week
+            week_totals = self.weekly.setdefault(int(week), np.zeros(self.totals.shape))
+            np.add.at(week_totals, (day_index[in_week], hours[in_week]), screen_time[in_week])
+
+        return self
+
+    def add_jsonl(self, stream, batch_size=JSONL_BATCH_SIZE):
+        # Чтение событий из JSONL потока (например stdin) пачками
+        batch = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                self.add_events(pd.DataFrame(batch))
+                batch = []
+
+        if batch:
+            self.add_events(pd.DataFrame(batch))
+        return self
+
+    def hourly_activity(self):
+        # Текущие суммы в формате ActivityAnalyzer.analyze_hourly_activity
+        day_index, hour_index = np.nonzero(self.present)
+        return pd.DataFrame({
+            'day_name': [DAYS_OF_WEEK[i] for i in day_index],
+            'hour': HOURS[hour_index],
+            'screen_time': self.totals[day_index, hour_index],
+        })
+
+    def peak_schedule(self, num_peaks=3):
+        # Расписание по текущему состоянию с теми же правилами, что find_peak_hours_per_day
+        selected, _ = select_spaced_hours(self.totals, self.present, num_peaks, top_n=6)
+        return selection_to_schedule(selected, self.present)
+
+    def save_state(self, file_path):
+        # Сохранение состояния агрегатора в .npz файл
+        weeks = sorted(self.weekly)
+        np.savez(
+            file_path,
+            totals=self.totals,
+            present=self.present,
+            weeks=np.array(weeks, dtype=np.int64),
+            weekly=np.array([self.weekly[week] for week in weeks]).reshape(-1, *self.totals.shape),
+            reference_week=np.array(-1 if self.reference_week is None else self.reference_week),
+            half_life_weeks=np.array(np.nan if self.half_life_weeks is None else self.half_life_weeks),
+            events_seen=np.array(self.events_seen),
+            sources=np.array(sorted(self.sources), dtype=str),
+        )
+
+    @classmethod
+    def load_state(cls, file_path):
+        # Восстановление агрегатора из .npz файла
+        with np.load(file_path) as state:
+            half_life_weeks = float(state['half_life_weeks'])
+            aggregator = cls(None if np.isnan(half_life_weeks) else half_life_weeks)
+            aggregator.totals = state['totals']
+            aggregator.present = state['present']
+            aggregator.weekly = {int(week): totals for week, totals in zip(state['weeks'], state['weekly'])}
+            reference_week = int(state['reference_week'])
+            aggregator.reference_week = None if reference_week < 0 else reference_week
+            aggregator.events_seen = int(state['events_seen'])
+            # В состояниях старого формата списка файлов нет
+            aggregator.sources = set(state['sources'].tolist()) if 'sources' in state else set()
+        return aggregator
+
+    def _decay(self, weeks_ago):
+        # Вес активности, произошедшей weeks_ago недель назад
+        if self.half_life_weeks is None:
+            return np.ones_like(weeks_ago, dtype=float)
+        return 0.5 ** (np.asarray(weeks_ago, dtype=float) / self.half_life_weeks)
+
+
+def main():
+    # Обновление состояния событиями из stdin и вывод актуального расписания
+    parser = argparse.ArgumentParser(description='Инкрементальное обновление расписания уведомлений')
+    parser.add_argument('--state', help='Файл состояния агрегатора (.npz)')
+    parser.add_argument('--half-life-weeks', type=float, default=None)
+    parser.add_argument('--num-peaks', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.state and os.path.exists(args.state):
+        aggregator = IncrementalActivityAggregator.load_state(args.state)
+    else:
+        aggregator = IncrementalActivityAggregator(args.half_life_weeks)
+
+    aggregator.add_jsonl(sys.stdin)
+    if args.state:
+        aggregator.save_state(args.state)
+
+    print(json.dumps(aggregator.peak_schedule(args.num_peaks), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # resource есть только в Unix
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineMetrics:
+    # Сбор метрик по этапам анализа: время, обработанные строки, пиковая память, счетчики
+    # hooks - функции вида hook(event, payload), вызываются после каждого этапа ('stage')
+    # и в конце запуска ('run')
+
+    def __init__(self, hooks=None, trace_memory=False):
+        self.hooks = list(hooks or [])
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.counters = {}
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._started = time.perf_counter()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # Замер одного этапа, количество строк можно уточнить через record['rows']
+        record = {'name': name, 'seconds': None, 'rows': rows, 'peak_mb': None}
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            if self.trace_memory:
+                record['peak_mb'] = (tracemalloc.get_traced_memory()[1] - memory_before) / 2 ** 20
+            if started_tracing:
+                tracemalloc.stop()
+
+            self.stages.append(record)
+            logger.debug("Этап %s: %.3f с", name, record['seconds'])
+            self._call_hooks('stage', record)
+
+    def count(self, name, value=1):
+        # Увеличение счетчика (например попаданий в кэш)
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        # Итоговая запись метрик запуска
+        record = self.to_dict()
+        self._call_hooks('run', record)
+        return record
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'total_seconds': time.perf_counter() - self._started,
+            'stages': self.stages,
+            'counters': self.counters,
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+
+    def save_json(self, file_path):
+        # Сохранение метрик в виде одной JSON записи
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+    def _call_hooks(self, event, payload):
+        for hook in self.hooks:
+            hook(event, payload)
+
+
+def _peak_rss_mb():
+    # Пиковый размер резидентной памяти процесса (в Linux ru_maxrss в килобайтах)
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -1,9 +1,23 @@
-from notification_scheduler import NotificationScheduler
+import logging
+import sys
+
+
+def setup_logging(quiet=False, stream=None, stages=False):
+    # Вывод сообщений анализа в консоль в прежнем виде (без префиксов)
+    # Время этапов (instrumentation) выводится только при stages=True
+    logging.basicConfig(level=logging.INFO if quiet else logging.DEBUG, format='%(message)s',
+                        stream=stream or sys.stdout)
+    logging.getLogger('instrumentation').setLevel(logging.DEBUG if stages else logging.INFO)
+    for noisy_logger in ('matplotlib', 'PIL'):
+        logging.getLogger(noisy_logger).setLevel(logging.WARNING)
+
 
 def main():
     # Запуск анализа для определения лучшего времени уведомлений
+    setup_logging()
+    from notification_scheduler import NotificationScheduler
     scheduler = NotificationScheduler()
     scheduler.run_full_analysis()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
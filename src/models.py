@@ -1,8 +1,15 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, TypeAdapter, validator
 from typing import List, Dict
 from datetime import datetime
 
 
+def validate_count(cls, count_value):
+    # Проверка что количество уведомлений не превышает лимит (общая для расписаний по часам и минутам)
+    if count_value < 1 or count_value > 4:
+        raise ValueError(f'Количество уведомлений должно быть от 1 до 4, получено {count_value}')
+    return count_value
+
+
 class NotificationTime(BaseModel):
     # Хранит информацию о времени уведомлений для одного дня
     times: List[int] = Field(..., description="Список часов для уведомлений")
@@ -15,12 +22,7 @@ class NotificationTime(BaseModel):
             raise ValueError(f'Время уведомлений должно быть между 6 и 23, получено {hour_value}')
         return hour_value
 
-    @validator('count')
-    def validate_count(cls, count_value):
-        # Проверка что количество уведомлений не превышает лимит
-        if count_value < 1 or count_value > 4:
-            raise ValueError(f'Количество уведомлений должно быть от 1 до 4, получено {count_value}')
-        return count_value
+    _validate_count = validator('count')(validate_count)
 
 
 class GlobalSchedule(BaseModel):
@@ -34,6 +36,54 @@ class GlobalSchedule(BaseModel):
     sunday: NotificationTime
 
 
+class NotificationMinuteTime(BaseModel):
+    # Время уведомлений для одного дня с точностью до минуты (минуты от начала суток)
+    times: List[int] = Field(..., description="Список времени уведомлений в минутах от полуночи")
+    count: int = Field(..., description="Количество уведомлений в день")
+
+    @validator('times', each_item=True)
+    def validate_minutes(cls, minute_value):
+        # Проверка что время уведомлений находится в допустимом диапазоне (6:00-23:59)
+        if minute_value < 6 * 60 or minute_value > 24 * 60 - 1:
+            raise ValueError(f'Время уведомлений должно быть между 6:00 и 23:59, получено {minute_value}')
+        return minute_value
+
+    _validate_count = validator('count')(validate_count)
+
+
+class MinuteSchedule(BaseModel):
+    # Расписание уведомлений на всю неделю с точностью до минуты
+    monday: NotificationMinuteTime
+    tuesday: NotificationMinuteTime
+    wednesday: NotificationMinuteTime
+    thursday: NotificationMinuteTime
+    friday: NotificationMinuteTime
+    saturday: NotificationMinuteTime
+    sunday: NotificationMinuteTime
+
+
+class UserSchedule(BaseModel):
+    # Персональное расписание уведомлений одного пользователя
+    user_id: int
+    schedule: GlobalSchedule
+
+
+class UserCategorySchedule(BaseModel):
+    # Персональное расписание пользователя для одной категории приложений
+    user_id: int
+    category: str
+    schedule: GlobalSchedule
+
+
+# Один валидатор на весь список персональных расписаний
+_user_schedule_list = TypeAdapter(List[UserSchedule])
+
+
+def validate_user_schedules(rows) -> List[UserSchedule]:
+    # Пакетная проверка персональных расписаний (словари или модели)
+    return _user_schedule_list.validate_python(rows)
+
+
 class AnalysisMetadata(BaseModel):
     # Информация о проведенном анализе данных
     total_users_analyzed: int = Field(..., ge=0)
@@ -41,6 +91,25 @@ class AnalysisMetadata(BaseModel):
     total_activity_records: int = Field(..., ge=0)
     analysis_date: str
 
+    @classmethod
+    def from_summary(cls, total_users: int, period_days: int, total_records: int):
+        # Метаданные по уже посчитанным итогам, дата анализа - сегодня
+        return cls(
+            total_users_analyzed=total_users,
+            data_period_days=period_days,
+            total_activity_records=total_records,
+            analysis_date=datetime.now().strftime("%Y-%m-%d")
+        )
+
+    @classmethod
+    def from_dataframe(cls, df):
+        # Метаданные по исходной таблице активности
+        return cls.from_summary(
+            total_users=df['user_id'].nunique(),
+            period_days=(df['date'].max() - df['date'].min()).days,
+            total_records=len(df)
+        )
+
 
 class NotificationSchedule(BaseModel):
     # Основная модель содержащая все расписание и метаданные
@@ -56,7 +125,17 @@ class NotificationSchedule(BaseModel):
     @classmethod
     def create_from_analysis(cls, peak_hours: Dict, df):
         # Создание расписания на основе результатов анализа
+        return cls.create_from_metadata(peak_hours, AnalysisMetadata.from_dataframe(df))
+
+    @classmethod
+    def create_from_summary(cls, peak_hours: Dict, total_users: int, period_days: int, total_records: int):
+        # Создание расписания по уже посчитанным итогам (без исходной таблицы)
+        return cls.create_from_metadata(
+            peak_hours, AnalysisMetadata.from_summary(total_users, period_days, total_records)
+        )
 
+    @classmethod
+    def create_from_metadata(cls, peak_hours: Dict, analysis_info: AnalysisMetadata):
         # Формируем расписание для каждого дня недели
         schedule_for_week = {}
         for day_name, hours_list in peak_hours.items():
@@ -65,15 +144,102 @@ class NotificationSchedule(BaseModel):
                 count=len(hours_list)
             )
 
-        # Собираем информацию об анализе
-        analysis_info = AnalysisMetadata(
-            total_users_analyzed=df['user_id'].nunique(),
-            data_period_days=(df['date'].max() - df['date'].min()).days,
-            total_activity_records=len(df),
-            analysis_date=datetime.now().strftime("%Y-%m-%d")
+        return cls(
+            global_schedule=GlobalSchedule(**schedule_for_week),
+            analysis_metadata=analysis_info
         )
 
+
+class CategorySchedules(BaseModel):
+    # Расписания уведомлений для каждой категории приложений
+    categories: Dict[str, NotificationSchedule]
+
+    def save_to_json(self, file_path: str):
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(self.model_dump_json(indent=2, ensure_ascii=False))
+
+
+class MinuteNotificationSchedule(BaseModel):
+    # Расписание по слотам внутри часа: ширина слота и окно, по которому оценивался слот
+    bin_minutes: int = Field(..., ge=1, le=60)
+    window_minutes: int = Field(..., ge=1)
+    global_schedule: MinuteSchedule
+    analysis_metadata: AnalysisMetadata
+
+    def save_to_json(self, file_path: str):
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(self.model_dump_json(indent=2, ensure_ascii=False))
+
+    @classmethod
+    def create_from_analysis(cls, peak_minutes: Dict, df, bin_minutes: int, window_minutes: int):
+        # Создание расписания по времени в минутах для каждого дня
+        return cls.create_from_metadata(peak_minutes, AnalysisMetadata.from_dataframe(df), bin_minutes, window_minutes)
+
+    @classmethod
+    def create_from_metadata(cls, peak_minutes: Dict, analysis_info: AnalysisMetadata, bin_minutes: int,
+                             window_minutes: int):
+        schedule_for_week = {
+            day_name: NotificationMinuteTime(times=minutes_list, count=len(minutes_list))
+            for day_name, minutes_list in peak_minutes.items()
+        }
         return cls(
-            global_schedule=GlobalSchedule(**schedule_for_week),
+            bin_minutes=bin_minutes,
+            window_minutes=window_minutes,
+            global_schedule=MinuteSchedule(**schedule_for_week),
             analysis_metadata=analysis_info
-        )
\ No newline at end of file
+        )
+
+
+class HourEstimate(BaseModel):
+    # Оценка активности выбранного часа и ее доверительный интервал
+    hour: int
+    activity: float
+    low: float
+    high: float
+
+
+class DayErrorBounds(BaseModel):
+    # Границы ошибки для часов одного дня; stability - доля случайных оценок с тем же выбором часов
+    hours: List[HourEstimate]
+    stability: float = Field(..., ge=0, le=1)
+
+
+class ApproximationReport(BaseModel):
+    # Точность приближенного анализа по выборке
+    sample_size: int = Field(..., ge=2)
+    confidence: float = Field(..., gt=0, lt=1)
+    users_low: int = Field(..., ge=0)
+    users_high: int = Field(..., ge=0)
+    coverage: float
+    coverage_low: float
+    coverage_high: float
+    days: Dict[str, DayErrorBounds]
+
+
+class ApproximateNotificationSchedule(NotificationSchedule):
+    # Расписание, построенное по наброску истории, с границами ошибки рядом с выбранными часами
+    approximation: ApproximationReport
+
+    @classmethod
+    def create_from_estimate(cls, estimate: Dict, period_days: int, total_records: int, sample_size: int):
+        schedule = NotificationSchedule.create_from_summary(
+            estimate['peak_hours'],
+            total_users=estimate['users']['estimate'],
+            period_days=max(1, period_days),
+            total_records=total_records
+        )
+        report = ApproximationReport(
+            sample_size=sample_size,
+            confidence=estimate['confidence'],
+            users_low=estimate['users']['low'],
+            users_high=estimate['users']['high'],
+            coverage=estimate['coverage']['overall_coverage'],
+            coverage_low=estimate['coverage']['low'],
+            coverage_high=estimate['coverage']['high'],
+            days=estimate['days']
+        )
+        return cls(
+            global_schedule=schedule.global_schedule,
+            analysis_metadata=schedule.analysis_metadata,
+            approximation=report
+        )
@@ -1,73 +1,291 @@
+import logging
 import os
 from data_processor import DataProcessor
 from activity_analyzer import ActivityAnalyzer
+from category_schedules import (
+    CategoryActivityCube, build_category_schedules, category_peak_hours, write_user_category_schedules
+)
+from instrumentation import PipelineMetrics
+from models import AnalysisMetadata, ApproximateNotificationSchedule, MinuteNotificationSchedule
 from schedule_generator import ScheduleGenerator
-from visualizer import Visualizer
+from sketches import SAMPLE_SIZE, ActivitySketch, estimate_peak_hours, sketch_files
+
+
+logger = logging.getLogger(__name__)
+
+# Пути по умолчанию (относительно папки src, как при запуске main.py)
+DATA_FILE = "../data/processed_screen_time_data.csv"
+OUTPUT_DIR = "../output"
+REPORTS_DIR = "../reports"
 
 
 # Основной метод запуска всего анализа
 class NotificationScheduler:
 
-    def __init__(self):
-        self.data_processor = DataProcessor()
+    def __init__(self, streaming=False, cache_dir=None, quiet=False, hooks=None,
+                 trace_memory=False, metrics_file=None, random_trials=None, random_seed=None,
+                 solver='greedy', data_file=DATA_FILE, output_dir=OUTPUT_DIR, reports_dir=REPORTS_DIR,
+                 num_peaks=3):
+        self.data_processor = DataProcessor(cache_dir=cache_dir)
+        self.streaming = streaming
         self.df = None
+        # Итоги потокового подсчета: в потоковом режиме вместо исходной таблицы
+        self.aggregate = None
+
+        # Входной файл и папки для расписаний и графиков
+        self.data_file = data_file
+        self.output_dir = output_dir
+        self.reports_dir = reports_dir
+
+        # Тихий режим отключает отладочный вывод и расчеты только для него
+        self.quiet = quiet
+        # Метрики этапов: hooks получают события 'stage' и 'run', итог пишется в metrics_file
+        self.hooks = hooks
+        self.trace_memory = trace_memory
+        self.metrics_file = metrics_file
+        self.metrics = PipelineMetrics(hooks=self.hooks, trace_memory=self.trace_memory)
+
+        # Число случайных расписаний для оценки случайного алгоритма (None - одно расписание)
+        self.random_trials = random_trials
+        self.random_seed = random_seed
+
+        # Алгоритм выбора часов: 'greedy' (по умолчанию) или 'optimal' (точный)
+        self.solver = solver
+        # Уведомлений в день во всех расписаниях
+        self.num_peaks = num_peaks
 
     def run_full_analysis(self):
+        self.metrics = PipelineMetrics(hooks=self.hooks, trace_memory=self.trace_memory)
+
         # Загрузка данных
-        data_file = "../data/processed_screen_time_data.csv"
-        if not self.data_processor.load_data(data_file):
-            print("Ошибка загрузки данных")
+        if not self.load_data():
             return
 
-        self.df = self.data_processor.preprocess_data()
-        print(f"Данные загружены: {len(self.df)} строк")
+        # Анализ активности и сравнение с другими алгоритмами
+        analysis = self.analyze()
+
+        # Генерация расписания
+        self.save_schedule(analysis['best_times'])
+
+        # Создание графиков
+        self.create_plot(analysis['activity_data'], analysis['best_times'])
+
+        logger.info("Анализ завершен!")
+
+        # Показываем итоговое расписание
+        logger.info("Итоговое расписание уведомлений:")
+        for day, times in analysis['best_times'].items():
+            logger.info(f"   {day}: {times} (количество: {len(times)})")
+
+        # Итоговая запись метрик
+        record = self.metrics.finish()
+        if self.metrics_file:
+            self.metrics.save_json(self.metrics_file)
+        return record
+
+    def load_data(self, bin_minutes=None):
+        # В потоковом режиме файл сворачивается в недельные суммы по блокам, строки не хранятся;
+        # bin_minutes - за тот же проход собрать и матрицы слотов внутри часа
+        with self.metrics.stage('load_data') as stage:
+            if self.streaming:
+                loaded = self.data_processor.aggregate_activity(self.data_file, bin_minutes)
+                if loaded:
+                    self.aggregate = self.data_processor.aggregate
+            else:
+                loaded = self.data_processor.load_data(self.data_file, streaming=self.streaming)
+                if loaded:
+                    self.df = self.data_processor.preprocess_data()
+            if loaded:
+                stage['rows'] = self._row_count()
+        if not loaded:
+            logger.error("Ошибка загрузки данных")
+            return False
+        if self.data_processor.cache_hit:
+            self.metrics.count('cache_hits')
+
+        logger.info(f"Данные загружены: {self._row_count()} строк")
+        return True
+
+    def _row_count(self):
+        # Число исходных строк: по таблице или по итогам потокового подсчета
+        return len(self.df) if self.df is not None else self.aggregate['total_records']
+
+    def make_analyzer(self):
+        # Анализатор по исходной таблице или, в потоковом режиме, по итогам подсчета
+        if self.df is not None:
+            return ActivityAnalyzer(self.df, quiet=self.quiet)
+        return ActivityAnalyzer(
+            None, quiet=self.quiet, weekly_activity=self.aggregate['weekly_activity'],
+            slot_activity=self.aggregate.get('slot_activity')
+        )
 
-        # Анализ активности
-        analyzer = ActivityAnalyzer(self.df)
-        activity_data = analyzer.analyze_hourly_activity()
-        best_times = analyzer.find_peak_hours_per_day(activity_data)
+    def analysis_metadata(self):
+        # Метаданные расписания по таблице или по итогам потокового подсчета
+        if self.df is not None:
+            return AnalysisMetadata.from_dataframe(self.df)
+        return AnalysisMetadata.from_summary(
+            self.aggregate['total_users'], self.aggregate['period_days'], self.aggregate['total_records']
+        )
+
+    def analyze(self, compare=True):
+        # Выбор часов, их покрытие и (при compare=True) сравнение с другими алгоритмами
+        analyzer = self.make_analyzer()
+        with self.metrics.stage('analyze_hourly_activity', rows=self._row_count()):
+            activity_data = analyzer.analyze_hourly_activity()
+        with self.metrics.stage('find_peak_hours_per_day', rows=len(activity_data)):
+            if self.solver == 'optimal':
+                best_times = analyzer.find_optimal_peak_hours(activity_data, self.num_peaks)
+            else:
+                best_times = analyzer.find_peak_hours_per_day(activity_data, self.num_peaks)
 
         # Расчет эффективности выбранного времени
-        coverage = analyzer.calculate_coverage(activity_data, best_times)
+        with self.metrics.stage('calculate_coverage', rows=len(activity_data)):
+            coverage = analyzer.calculate_coverage(activity_data, best_times)
 
-        print(f"ЭФФЕКТИВНОСТЬ АЛГОРИТМА:")
-        print(f"   Общее покрытие активности: {coverage['overall_coverage']:.1f}%")
-        print(f"   Всего активности: {coverage['total_activity']:.0f} мин")
-        print(f"   Покрыто уведомлениями: {coverage['covered_activity']:.0f} мин")
+        logger.info("ЭФФЕКТИВНОСТЬ АЛГОРИТМА:")
+        logger.info(f"   Общее покрытие активности: {coverage['overall_coverage']:.1f}%")
+        logger.info(f"   Всего активности: {coverage['total_activity']:.0f} мин")
+        logger.info(f"   Покрыто уведомлениями: {coverage['covered_activity']:.0f} мин")
 
-        print(f"Покрытие по дням:")
+        logger.info("Покрытие по дням:")
         for day, coverage_percent in coverage['daily_coverage'].items():
-            print(f"   {day}: {coverage_percent:.1f}%")
+            logger.info(f"   {day}: {coverage_percent:.1f}%")
+
+        analysis = {'activity_data': activity_data, 'best_times': best_times, 'coverage': coverage}
+        if not compare:
+            return analysis
 
         # Сравнение с другими алгоритмами
-        comparison = analyzer.compare_with_other_algorithms(activity_data, best_times)
+        with self.metrics.stage('compare_with_other_algorithms', rows=self._row_count()):
+            comparison = analyzer.compare_with_other_algorithms(
+                activity_data, best_times, self.random_trials, self.random_seed, self.num_peaks
+            )
 
-        print(f"СРАВНЕНИЕ АЛГОРИТМОВ:")
-        print(f"   Наш алгоритм (с интервалами): {comparison['our_algorithm']['coverage']:.1f}%")
-        print(f"   CV алгоритм (стабильность): {comparison['cv_algorithm']['coverage']:.1f}%")
-        print(f"   Случайный алгоритм: {comparison['random_algorithm']:.1f}%")
-        print(f"   Улучшение над CV: +{comparison['improvement_over_cv']:.1f}%")
-        print(f"   Улучшение над случайным: +{comparison['improvement_over_random']:.1f}%")
+        logger.info("СРАВНЕНИЕ АЛГОРИТМОВ:")
+        logger.info(f"   Наш алгоритм (с интервалами): {comparison['our_algorithm']['coverage']:.1f}%")
+        logger.info(f"   CV алгоритм (стабильность): {comparison['cv_algorithm']['coverage']:.1f}%")
+        logger.info(f"   Случайный алгоритм: {comparison['random_algorithm']:.1f}%")
+        if 'random_baseline' in comparison:
+            low, high = comparison['random_baseline']['confidence_interval']
+            logger.info(f"      {comparison['random_baseline']['trials']} испытаний, "
+                        f"доверительный интервал: {low:.2f}% - {high:.2f}%")
+        logger.info(f"   Улучшение над CV: +{comparison['improvement_over_cv']:.1f}%")
+        logger.info(f"   Улучшение над случайным: +{comparison['improvement_over_random']:.1f}%")
 
-        # Генерация расписания
+        analysis['comparison'] = comparison
+        return analysis
+
+    def save_schedule(self, best_times):
         generator = ScheduleGenerator()
-        final_schedule = generator.generate_schedule(best_times, self.df)
+        output_file = os.path.join(self.output_dir, "notification_schedule.json")
+        with self.metrics.stage('generate_schedule', rows=self._row_count()):
+            if self.df is not None:
+                final_schedule = generator.generate_schedule(best_times, self.df)
+            else:
+                final_schedule = generator.generate_schedule_from_summary(best_times, self.aggregate)
 
-        # Сохранение результатов
-        output_file = "../output/notification_schedule.json"
-        os.makedirs("../output", exist_ok=True)
-        generator.save_schedule(final_schedule, output_file)
-        print(f"Расписание сохранено: {output_file}")
+            # Сохранение результатов
+            os.makedirs(self.output_dir, exist_ok=True)
+            generator.save_schedule(final_schedule, output_file)
+        logger.info(f"Расписание сохранено: {output_file}")
+        return output_file
 
-        # Создание графиков
+    def create_plot(self, activity_data, best_times, dpi=300, fmt=None):
+        # matplotlib загружается только здесь
+        from visualizer import Visualizer
         visualizer = Visualizer()
-        os.makedirs("../reports", exist_ok=True)
-        plot_file = "../reports/main_analysis.png"
-        visualizer.create_simple_analysis_plot(activity_data, best_times, plot_file)
+        os.makedirs(self.reports_dir, exist_ok=True)
+        plot_file = os.path.join(self.reports_dir, "main_analysis." + (fmt or "png"))
+        with self.metrics.stage('create_plot', rows=len(activity_data)):
+            visualizer.create_simple_analysis_plot(activity_data, best_times, plot_file, dpi, fmt)
+        return plot_file
 
-        print("Анализ завершен!")
+    def run_category_schedules(self, by_user=False):
+        # Расписания для каждой категории (или пользователь x категория) за один проход по данным
+        os.makedirs(self.output_dir, exist_ok=True)
 
-        # Показываем итоговое расписание
-        print("Итоговое расписание уведомлений:")
-        for day, times in best_times.items():
-            print(f"   {day}: {times} (количество: {len(times)})")
\ No newline at end of file
+        cube = CategoryActivityCube.from_csv(self.data_file, by_user=by_user)
+        if by_user:
+            output_file = os.path.join(self.output_dir, "user_category_schedules.jsonl")
+            written = write_user_category_schedules(cube, output_file, self.num_peaks, self.solver)
+            logger.info(f"Расписания пользователь x категория: {written}")
+        else:
+            output_file = os.path.join(self.output_dir, "category_schedules.json")
+            schedules = build_category_schedules(cube, self.num_peaks, self.solver)
+            schedules.save_to_json(output_file)
+            logger.info(f"Расписания по категориям: {', '.join(schedules.categories)}")
+
+        logger.info(f"Расписания сохранены: {output_file}")
+        return output_file
+
+    def run_slot_analysis(self, bin_minutes=15, window_minutes=60, min_gap_minutes=180):
+        # Расписание с точностью до слота внутри часа
+        if not self.load_data(bin_minutes):
+            return
+
+        analyzer = self.make_analyzer()
+        peak_minutes = analyzer.find_peak_slots_per_day(
+            bin_minutes, window_minutes, self.num_peaks, min_gap_minutes, self.solver
+        )
+        coverage = analyzer.calculate_slot_coverage(peak_minutes, bin_minutes, window_minutes)
+        logger.info(f"Слоты по {bin_minutes} мин, окно {window_minutes} мин: "
+                    f"покрытие {coverage['overall_coverage']:.1f}%")
+
+        output_file = os.path.join(self.output_dir, "notification_schedule_minutes.json")
+        os.makedirs(self.output_dir, exist_ok=True)
+        schedule = MinuteNotificationSchedule.create_from_metadata(
+            peak_minutes, self.analysis_metadata(), bin_minutes, window_minutes
+        )
+        schedule.save_to_json(output_file)
+        logger.info(f"Расписание сохранено: {output_file}")
+        return peak_minutes
+
+    def run_approximate_analysis(self, sample_size=SAMPLE_SIZE, sketch_file=None, workers=None, seed=None, save=True):
+        # Приближенный анализ по наброску истории: память не зависит от объема данных
+        # sketch_file - готовый набросок (.npz), например собранный командой ingest по нескольким файлам
+        with self.metrics.stage('build_sketch') as stage:
+            if sketch_file:
+                sketch = ActivitySketch.load_state(sketch_file)
+            else:
+                sketch = sketch_files([self.data_file], sample_size, seed=seed, workers=workers)
+            stage['rows'] = sketch.records
+
+        with self.metrics.stage('estimate_peak_hours', rows=len(sketch.sample_cells)):
+            estimate = estimate_peak_hours(sketch, self.num_peaks, self.solver, seed=seed)
+
+        coverage = estimate['coverage']
+        logger.info(f"Приближенный анализ: {sketch.records} строк, выборка до {sketch.sample_size} записей на час")
+        logger.info(f"   Пользователей: {estimate['users']['estimate']} "
+                    f"({estimate['users']['low']} - {estimate['users']['high']})")
+        logger.info(f"   Покрытие: {coverage['overall_coverage']:.1f}% "
+                    f"({coverage['low']:.1f}% - {coverage['high']:.1f}%)")
+        for day, bounds in estimate['days'].items():
+            logger.info(f"   {day}: {estimate['peak_hours'][day]} (устойчивость {bounds['stability']:.0%})")
+        if not save:
+            return estimate
+
+        # Отдельный файл, чтобы не заменять точное расписание приближенным
+        output_file = os.path.join(self.output_dir, "notification_schedule_approximate.json")
+        os.makedirs(self.output_dir, exist_ok=True)
+        schedule = ApproximateNotificationSchedule.create_from_estimate(
+            estimate, sketch.period_days(), sketch.records, sketch.sample_size
+        )
+        schedule.save_to_json(output_file)
+        logger.info(f"Расписание сохранено: {output_file}")
+        return estimate
+
+    def run_category_reports(self, dpi=100, fmt='png', workers=None):
+        # Графики активности для каждой категории, рисуются параллельно
+        from visualizer import render_reports
+
+        output_dir = os.path.join(self.reports_dir, "categories")
+
+        cube = CategoryActivityCube.from_csv(self.data_file)
+        peak_hours = category_peak_hours(cube, self.num_peaks, self.solver)
+        reports = {}
+        for codes, _, activity, present in cube.iter_group_batches():
+            for code, category_activity, category_present in zip(codes.tolist(), activity, present):
+                category = cube.categories[code]
+                reports[category] = (category_activity, category_present, peak_hours[category])
+
+        return render_reports(reports, output_dir, dpi, fmt, workers)
@@ -0,0 +1,135 @@
+import numpy as np
+
+from peak_selection import FIRST_HOUR, HOURS, LAST_HOUR, fill_default_days, select_spaced_hours
+
+
+# Ограничения на количество уведомлений в день (как в NotificationTime)
+MIN_PEAKS = 1
+MAX_PEAKS = 4
+
+# Сколько строк решается за один раз
+SOLVE_BATCH_SIZE = 50_000
+
+
+def select_optimal_hours(scores, num_peaks=3, min_gap=3):
+    # Точный выбор num_peaks часов 6-23 с максимальной суммой баллов
+    # при интервале между часами не менее min_gap (динамическое программирование по часам)
+    # scores имеет форму (..., 18), результат - (..., num_peaks) часов по возрастанию
+    if not MIN_PEAKS <= num_peaks <= MAX_PEAKS:
+        raise ValueError(f'Количество уведомлений должно быть от 1 до 4, получено {num_peaks}')
+    if FIRST_HOUR + (num_peaks - 1) * min_gap > LAST_HOUR:
+        raise ValueError(f'Нельзя выбрать {num_peaks} часов 6-23 с интервалом {min_gap}')
+
+    return HOURS[select_optimal_columns(scores, num_peaks, min_gap)]
+
+
+def select_optimal_columns(scores, num_peaks=3, min_gap=3):
+    # То же для произвольного числа столбцов (например слотов внутри дня)
+    # min_gap задается в столбцах, результат - (..., num_peaks) номеров столбцов по возрастанию
+    column_count = np.shape(scores)[-1]
+    if not MIN_PEAKS <= num_peaks <= MAX_PEAKS:
+        raise ValueError(f'Количество уведомлений должно быть от 1 до 4, получено {num_peaks}')
+    # При нулевом интервале один и тот же час мог бы войти в набор несколько раз
+    if min_gap < 1:
+        raise ValueError(f'Интервал между часами должен быть не меньше 1, получено {min_gap}')
+    if (num_peaks - 1) * min_gap >= column_count:
+        raise ValueError(f'Нельзя выбрать {num_peaks} из {column_count} слотов с интервалом {min_gap}')
+
+    lead_shape = np.shape(scores)[:-1]
+    scores = np.asarray(scores, dtype=float).reshape(-1, column_count)
+    selected = np.empty((len(scores), num_peaks), dtype=int)
+    for start in range(0, len(scores), SOLVE_BATCH_SIZE):
+        batch = slice(start, start + SOLVE_BATCH_SIZE)
+        selected[batch] = _solve_batch(scores[batch], num_peaks, min_gap)
+
+    return selected.reshape(lead_shape + (num_peaks,))
+
+
+def select_schedule_hours(scores, present, num_peaks=3, solver='greedy'):
+    # Часы расписания для пачки строк (..., 7, 18) выбранным алгоритмом
+    # solver: 'greedy' - как find_peak_hours_per_day, 'optimal' - точный выбор
+    # Дни без данных получают время по умолчанию, результат (..., 7, max(k, 3)) с пустыми местами = -1
+    if solver == 'optimal':
+        selected = select_optimal_hours(scores, num_peaks)
+    elif solver == 'greedy':
+        selected, _ = select_spaced_hours(scores, present, num_peaks, top_n=6)
+    else:
+        raise ValueError(f"Неизвестный алгоритм выбора часов: {solver}, доступны: greedy, optimal")
+    return fill_default_days(selected, present)
+
+
+def _solve_batch(scores, num_peaks, min_gap):
+    # Динамическое программирование для пачки строк, возвращает позиции часов
+    row_count, hour_count = scores.shape
+    rows = np.arange(row_count)
+    positions = np.arange(hour_count)
+
+    # best[j][:, h] - лучшая сумма из j + 1 часов, последний из которых h
+    # previous[j][:, h] - позиция предыдущего часа в таком наборе
+    best = np.full((num_peaks, row_count, hour_count), -np.inf)
+    previous = np.zeros((num_peaks, row_count, hour_count), dtype=int)
+    best[0] = scores
+
+    for level in range(1, num_peaks):
+        # Лучшее значение предыдущего уровня среди часов не позже h и его позиция
+        prefix_best = np.maximum.accumulate(best[level - 1], axis=1)
+        is_new_best = np.ones((row_count, hour_count), dtype=bool)
+        is_new_best[:, 1:] = best[level - 1][:, 1:] > prefix_best[:, :-1]
+        prefix_position = np.maximum.accumulate(np.where(is_new_best, positions, 0), axis=1)
+
+        best[level][:, min_gap:] = scores[:, min_gap:] + prefix_best[:, :hour_count - min_gap]
+        previous[level][:, min_gap:] = prefix_position[:, :hour_count - min_gap]
+
+    # Восстанавливаем набор часов с конца
+    selected = np.empty((row_count, num_peaks), dtype=int)
+    position = best[num_peaks - 1].argmax(axis=1)
+    for level in range(num_peaks - 1, -1, -1):
+        selected[:, level] = position
+        position = previous[level][rows, position]
+
+    return selected
+
+
+def compare_with_greedy(scores, present, num_peaks=3, min_gap=3):
+    # Сравнение точного решения с жадным алгоритмом find_peak_hours_per_day
+    # Покрытие считается как доля суммы баллов строки, попавшая в выбранные часы
+    # Жадный алгоритм при нехватке часов добавляет часы без соблюдения интервала,
+    # поэтому в отдельных строках он может дать большее покрытие
+    scores = np.asarray(scores, dtype=float).reshape(-1, len(HOURS))
+    present = np.asarray(present, dtype=bool).reshape(-1, len(HOURS))
+
+    greedy, _ = select_spaced_hours(scores, present, num_peaks, min_gap=min_gap)
+    optimal = select_optimal_hours(scores, num_peaks, min_gap)
+
+    greedy_covered = _covered(scores, greedy)
+    optimal_covered = _covered(scores, optimal)
+    totals = scores.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        greedy_coverage = np.where(totals > 0, greedy_covered / totals * 100, 0)
+        optimal_coverage = np.where(totals > 0, optimal_covered / totals * 100, 0)
+    gain = optimal_coverage - greedy_coverage
+
+    # Строки, где жадный алгоритм нарушил интервал, добирая часы
+    gap_ok = (np.diff(greedy, axis=1) >= min_gap) | (greedy[:, 1:] < 0)
+    greedy_respects_gap = gap_ok.all(axis=1)
+
+    overall_total = totals.sum()
+    return {
+        'rows': len(scores),
+        'greedy_coverage': float(greedy_covered.sum() / overall_total * 100) if overall_total > 0 else 0.0,
+        'optimal_coverage': float(optimal_covered.sum() / overall_total * 100) if overall_total > 0 else 0.0,
+        'mean_gain': float(gain.mean()) if len(gain) else 0.0,
+        'max_gain': float(gain.max()) if len(gain) else 0.0,
+        'improved_rows': int((gain > 1e-9).sum()),
+        'greedy_gap_violations': int((~greedy_respects_gap).sum()),
+        'mean_gain_without_violations': float(gain[greedy_respects_gap].mean()) if greedy_respects_gap.any() else 0.0,
+        'row_gain': gain,
+    }
+
+
+def _covered(scores, selected):
+    # Сумма баллов выбранных часов каждой строки (пустые места = -1 не учитываются)
+    used = selected >= 0
+    values = np.take_along_axis(scores, np.where(used, selected - FIRST_HOUR, 0), axis=1)
+    return np.where(used, values, 0).sum(axis=1)
@@ -0,0 +1,124 @@
+from itertools import combinations
+
+import numpy as np
+
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+FIRST_HOUR = 6
+LAST_HOUR = 23
+HOURS = np.arange(FIRST_HOUR, LAST_HOUR + 1)
+DEFAULT_HOURS = [9, 14, 19]
+
+
+def build_day_hour_matrix(hourly_activity, value_column='screen_time'):
+    # Плотная матрица 7x18 (день недели x час) из таблицы вида day_name/hour/value
+    # Вторая матрица отмечает ячейки, для которых в таблице есть строка
+    # pandas загружается здесь, чтобы модули, которым нужны только константы, запускались быстро
+    import pandas as pd
+
+    matrix = np.zeros((len(DAYS_OF_WEEK), len(HOURS)))
+    present = np.zeros(matrix.shape, dtype=bool)
+
+    day_codes = pd.Categorical(hourly_activity['day_name'], categories=DAYS_OF_WEEK).codes
+    hours = hourly_activity['hour'].to_numpy()
+    values = hourly_activity[value_column].to_numpy(dtype=float)
+
+    valid = (day_codes >= 0) & (hours >= FIRST_HOUR) & (hours <= LAST_HOUR) & ~np.isnan(values)
+    matrix[day_codes[valid], hours[valid] - FIRST_HOUR] = values[valid]
+    present[day_codes[valid], hours[valid] - FIRST_HOUR] = True
+
+    return matrix, present
+
+
+def rank_hours(scores, present, top_n=6, hours=HOURS):
+    # Часы каждой строки в порядке убывания балла (при равенстве - более ранний час)
+    # Отсутствующие часы заменяются на -1 и уходят в конец
+    # hours - значения для столбцов scores (например начала слотов в минутах)
+    scores = np.asarray(scores, dtype=float).reshape(-1, len(hours))
+    present = np.asarray(present, dtype=bool).reshape(-1, len(hours))
+
+    masked = np.where(present, scores, -np.inf)
+    order = np.argsort(-masked, axis=1, kind='stable')[:, :top_n]
+    ranked_present = np.take_along_axis(present, order, axis=1)
+    return np.where(ranked_present, hours[order], -1)
+
+
+def select_spaced_hours(scores, present, num_peaks=3, top_n=6, min_gap=3,
+                        fill_from_top=True, default_hours=DEFAULT_HOURS, hours=HOURS):
+    # Жадный выбор часов с интервалом не менее min_gap сразу для всех строк
+    # scores и present имеют форму (..., 18), результат - (..., num_peaks), пустые места = -1
+    # Для других столбцов (слоты в минутах) hours, min_gap и default_hours задаются в тех же единицах
+    lead_shape = np.shape(scores)[:-1]
+    ranked = rank_hours(scores, present, top_n, hours)
+    rows = np.arange(ranked.shape[0])
+
+    selected = np.full((ranked.shape[0], num_peaks), -1)
+    taken = np.zeros(ranked.shape, dtype=bool)
+    counts = np.zeros(ranked.shape[0], dtype=int)
+
+    # Отбираем часы по убыванию балла, пропуская слишком близкие к уже выбранным
+    for rank in range(ranked.shape[1]):
+        candidate = ranked[:, rank]
+        too_close = (selected >= 0) & (np.abs(selected - candidate[:, None]) < min_gap)
+        accept = (candidate >= 0) & ~too_close.any(axis=1) & (counts < num_peaks)
+        selected[rows[accept], counts[accept]] = candidate[accept]
+        taken[accept, rank] = True
+        counts += accept
+
+    # Если не набрали нужное количество - добавляем из оставшихся лучших часов
+    if fill_from_top:
+        for rank in range(ranked.shape[1]):
+            candidate = ranked[:, rank]
+            accept = (candidate >= 0) & ~taken[:, rank] & (counts < num_peaks)
+            selected[rows[accept], counts[accept]] = candidate[accept]
+            counts += accept
+
+    # Если все еще не хватает - добавляем время по умолчанию
+    for default_hour in default_hours:
+        accept = ~(selected == default_hour).any(axis=1) & (counts < num_peaks)
+        selected[rows[accept], counts[accept]] = default_hour
+        counts += accept
+
+    # Сортируем выбранные часы, оставляя пустые места в конце
+    selected = np.sort(np.where(selected < 0, hours[-1] + 1, selected), axis=1)
+    selected[selected > hours[-1]] = -1
+
+    return selected.reshape(lead_shape + (num_peaks,)), ranked.reshape(lead_shape + (ranked.shape[1],))
+
+
+def selection_to_schedule(selected, present, default_hours=DEFAULT_HOURS):
+    # Перевод матрицы выбранных часов (7 x k) в словарь {'monday': [...], ...}
+    # Для дней без данных используется время по умолчанию
+    day_has_data = np.asarray(present, dtype=bool).any(axis=-1)
+    schedule = {}
+
+    for day_index, day in enumerate(DAYS_OF_WEEK):
+        if day_has_data[day_index]:
+            schedule[day.lower()] = [int(hour) for hour in selected[day_index] if hour >= 0]
+        else:
+            schedule[day.lower()] = list(default_hours)
+
+    return schedule
+
+
+def fill_default_days(selected, present, default_hours=DEFAULT_HOURS):
+    # Массив выбранных часов (..., 7, k), где дни без данных заменены временем по умолчанию
+    # Ширина результата - max(k, len(default_hours)), пустые места = -1
+    selected = np.asarray(selected)
+    width = max(selected.shape[-1], len(default_hours))
+    filled = np.full(selected.shape[:-1] + (width,), -1)
+    filled[..., :selected.shape[-1]] = selected
+
+    day_has_data = np.asarray(present, dtype=bool).any(axis=-1)
+    filled[~day_has_data] = -1
+    filled[~day_has_data, :len(default_hours)] = default_hours
+    return filled
+
+
+def spaced_hour_combinations(num_peaks=3, min_gap=None):
+    # Все наборы из num_peaks часов 6-23 по возрастанию, массив (n_combinations, num_peaks)
+    # При заданном min_gap остаются только наборы с интервалом не менее min_gap часов
+    hour_sets = np.array(list(combinations(HOURS.tolist(), num_peaks)), dtype=int).reshape(-1, num_peaks)
+    if min_gap is not None and num_peaks > 1:
+        hour_sets = hour_sets[(np.diff(hour_sets, axis=1) >= min_gap).all(axis=1)]
+    return hour_sets
@@ -0,0 +1,62 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from peak_selection import FIRST_HOUR, spaced_hour_combinations
+
+
+# Количество испытаний, обрабатываемых за один раз
+TRIALS_BATCH_SIZE = 1_000_000
+
+# Перцентили распределения покрытия в отчете
+REPORT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def random_schedule_coverage(activity_matrix, trials=100_000, num_peaks=3, min_gap=None, seed=None):
+    # Покрытие (%) для trials случайных расписаний, массив формы (trials,)
+    # Каждый день независимо получает равновероятный набор из num_peaks часов 6-23,
+    # при заданном min_gap - только среди наборов с нужным интервалом
+    if trials < 1:
+        raise ValueError(f'Число испытаний должно быть не меньше 1, получено {trials}')
+    activity_matrix = np.asarray(activity_matrix, dtype=float)
+    total_activity = activity_matrix.sum()
+    rng = np.random.default_rng(seed)
+
+    # Активность, которую покрывает каждый возможный набор часов в каждый день
+    hour_sets = spaced_hour_combinations(num_peaks, min_gap)
+    set_activity = activity_matrix[:, hour_sets - FIRST_HOUR].sum(axis=-1)
+    day_count = activity_matrix.shape[0]
+
+    coverage = np.empty(trials)
+    for start in range(0, trials, TRIALS_BATCH_SIZE):
+        batch_size = min(TRIALS_BATCH_SIZE, trials - start)
+        chosen_sets = rng.integers(0, len(hour_sets), size=(batch_size, day_count))
+        covered = set_activity[np.arange(day_count), chosen_sets].sum(axis=1)
+        coverage[start:start + batch_size] = covered
+
+    if total_activity > 0:
+        return coverage / total_activity * 100
+    return np.zeros(trials)
+
+
+def monte_carlo_baseline(activity_matrix, trials=100_000, num_peaks=3, min_gap=None, seed=None, confidence=0.95):
+    # Статистика покрытия случайных расписаний: среднее, перцентили и доверительный интервал среднего
+    coverage = random_schedule_coverage(activity_matrix, trials, num_peaks, min_gap, seed)
+    mean = float(coverage.mean())
+    std = float(coverage.std(ddof=1)) if trials > 1 else 0.0
+
+    # Нормальное приближение для среднего при большом числе испытаний
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * std / trials ** 0.5
+
+    return {
+        'trials': trials,
+        'seed': seed,
+        'min_gap': min_gap,
+        'mean': mean,
+        'std': std,
+        'percentiles': {
+            p: float(value) for p, value in zip(REPORT_PERCENTILES, np.percentile(coverage, REPORT_PERCENTILES))
+        },
+        'confidence': confidence,
+        'confidence_interval': (mean - margin, mean + margin),
+    }
@@ -10,6 +10,12 @@ class ScheduleGenerator:
         schedule = NotificationSchedule.create_from_analysis(peak_hours, df)
         return schedule
 
+    def generate_schedule_from_summary(self, peak_hours, summary):
+        # То же по итогам потокового подсчета (DataProcessor.aggregate_activity) без исходной таблицы
+        return NotificationSchedule.create_from_summary(
+            peak_hours, summary['total_users'], summary['period_days'], summary['total_records']
+        )
+
     def save_schedule(self, schedule: NotificationSchedule, output_path: str):
         # Сохранение расписания в файл
         schedule.save_to_json(output_path)
\ No newline at end of file
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from peak_selection import DAYS_OF_WEEK
+
+
+logger = logging.getLogger(__name__)
+
+# Слот - пара (день недели, час), всего 7 x 24 слота
+HOURS_PER_DAY = 24
+SLOT_COUNT = len(DAYS_OF_WEEK) * HOURS_PER_DAY
+
+# Имя файла индекса в папке персональных расписаний
+INDEX_FILE_NAME = 'schedule_index.npy'
+
+# Файл индекса - один .npy массив int64:
+# первые SLOT_COUNT + 1 значений - смещения слотов, дальше - отсортированные user_id
+HEADER_SIZE = SLOT_COUNT + 1
+
+
+def slot_number(day, hour):
+    # Номер слота по дню (название или индекс 0-6) и часу
+    if isinstance(day, str):
+        day = [name.lower() for name in DAYS_OF_WEEK].index(day.lower())
+    if not 0 <= day < len(DAYS_OF_WEEK) or not 0 <= hour < HOURS_PER_DAY:
+        raise ValueError(f'Неверный слот: день {day}, час {hour}')
+    return day * HOURS_PER_DAY + hour
+
+
+def build_index_arrays(user_ids, times):
+    # Обратный индекс из массивов расписаний
+    # user_ids (n,), times (n, 7, k) с пустыми местами = -1
+    # Возвращает (offsets[SLOT_COUNT + 1], user_ids отсортированные по слоту и user_id)
+    times = np.asarray(times)
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+
+    user_position, day_index, _ = np.nonzero(times >= 0)
+    slots = day_index * HOURS_PER_DAY + times[times >= 0]
+    entries = user_ids[user_position]
+
+    order = np.lexsort((entries, slots))
+    offsets = np.zeros(HEADER_SIZE, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(slots, minlength=SLOT_COUNT))
+    return offsets, entries[order]
+
+
+def write_index(file_path, offsets, entries):
+    # Атомарная запись индекса из готовых массивов
+    def fill(data):
+        data[:HEADER_SIZE] = offsets
+        data[HEADER_SIZE:] = entries
+
+    _write_index_file(file_path, len(entries), fill)
+
+
+def merge_index_files(part_paths, file_path):
+    # Объединение частичных индексов шардов в один индекс
+    # Слоты обрабатываются по одному, поэтому в памяти держится только один слот
+    parts = [np.load(path, mmap_mode='r') for path in part_paths]
+    if not parts:
+        write_index(file_path, np.zeros(HEADER_SIZE, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        return
+
+    offsets = np.zeros(HEADER_SIZE, dtype=np.int64)
+    for part in parts:
+        offsets[1:] += np.diff(part[:HEADER_SIZE])
+    offsets = np.cumsum(offsets)
+
+    def fill(data):
+        data[:HEADER_SIZE] = offsets
+        for slot in range(SLOT_COUNT):
+            slot_entries = [
+                part[HEADER_SIZE + part[slot]:HEADER_SIZE + part[slot + 1]] for part in parts
+            ]
+            data[HEADER_SIZE + offsets[slot]:HEADER_SIZE + offsets[slot + 1]] = np.sort(
+                np.concatenate(slot_entries)
+            )
+
+    _write_index_file(file_path, int(offsets[-1]), fill)
+
+
+def _write_index_file(file_path, entry_count, fill):
+    # Атомарная запись: fill заполняет memory map временного файла в той же папке,
+    # затем файл переименовывается поверх старого индекса
+    index_dir = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(index_dir, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=index_dir, prefix='.tmp-', suffix='.npy')
+    os.close(file_descriptor)
+
+    try:
+        data = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.int64,
+                                         shape=(HEADER_SIZE + entry_count,))
+        fill(data)
+        data.flush()
+        del data
+        os.replace(temp_path, file_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+class ScheduleIndex:
+    # Чтение обратного индекса "кого уведомить сейчас" через memory map
+    # Новый индекс подхватывается автоматически после атомарной замены файла
+
+    def __init__(self, file_path, data=None):
+        # data - готовый массив индекса в памяти, тогда file_path=None и перечитывать нечего
+        self.file_path = file_path
+        self._data = data
+        self._file_id = None
+        self.reload()
+
+    @classmethod
+    def from_arrays(cls, offsets, entries):
+        # Индекс в памяти (например построенный из JSON Lines), без файла на диске
+        return cls(None, np.concatenate([np.asarray(offsets, dtype=np.int64), np.asarray(entries, dtype=np.int64)]))
+
+    def reload(self):
+        # Перечитывает индекс, если файл был заменен
+        if self.file_path is None:
+            return False
+        stat = os.stat(self.file_path)
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id != self._file_id:
+            self._data = np.load(self.file_path, mmap_mode='r')
+            self._file_id = file_id
+            return True
+        return False
+
+    def recipients(self, day, hour):
+        # Отсортированные user_id для слота, время O(размер ответа)
+        slot = slot_number(day, hour)
+        data = self._data
+        return data[HEADER_SIZE + data[slot]:HEADER_SIZE + data[slot + 1]]
+
+    def slot_sizes(self):
+        # Количество получателей в каждом слоте (7 x 24)
+        return np.diff(self._data[:HEADER_SIZE]).reshape(len(DAYS_OF_WEEK), HOURS_PER_DAY)
+
+
+async def serve(index_path, host='127.0.0.1', port=8080):
+    # Локальный HTTP сервер: GET /recipients?day=monday&hour=9
+    index = ScheduleIndex(index_path)
+    loop = asyncio.get_running_loop()
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Заголовки запроса не нужны, просто дочитываем их
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            # Проверка и перечитывание файла индекса - блокирующий ввод-вывод, выполняется вне цикла событий
+            try:
+                await loop.run_in_executor(None, index.reload)
+            except (OSError, ValueError) as e:
+                status, body = _reload_error(e)
+            else:
+                status, body = _handle_request(index, request_line.decode('latin-1'))
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Индекс расписаний доступен на http://{host}:{port}/recipients")
+    async with server:
+        await server.serve_forever()
+
+
+def _handle_request(index, request_line):
+    # Разбор строки запроса и формирование ответа (статус, тело)
+    parts = request_line.split()
+    if len(parts) < 2 or parts[0] != 'GET':
+        return '405 Method Not Allowed', {'error': 'Поддерживается только GET'}
+
+    url = urlsplit(parts[1])
+    if url.path != '/recipients':
+        return '404 Not Found', {'error': f'Неизвестный путь {url.path}'}
+
+    query = parse_qs(url.query)
+    try:
+        day = query['day'][0]
+        day = int(day) if day.isdigit() else day
+        hour = int(query['hour'][0])
+        user_ids = index.recipients(day, hour)
+    except (KeyError, ValueError) as e:
+        return '400 Bad Request', {'error': f'Нужны параметры day и hour: {e}'}
+
+    return '200 OK', {'day': day, 'hour': hour, 'count': len(user_ids), 'user_ids': user_ids.tolist()}
+
+
+def _reload_error(error):
+    # Индекс удален или заменяется: отвечаем ошибкой, сервер продолжает работу
+    return '503 Service Unavailable', {'error': f'Индекс недоступен: {error}'}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='Запросы к индексу расписаний уведомлений')
+    parser.add_argument('index', help='Файл индекса (.npy)')
+    parser.add_argument('--day', help='День недели для разового запроса')
+    parser.add_argument('--hour', type=int, help='Час для разового запроса')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.day is not None and args.hour is not None:
+        day = int(args.day) if args.day.isdigit() else args.day
+        for user_id in ScheduleIndex(args.index).recipients(day, args.hour):
+            print(user_id)
+    else:
+        asyncio.run(serve(args.index, args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
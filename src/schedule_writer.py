@@ -0,0 +1,153 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+from models import validate_user_schedules
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, LAST_HOUR
+
+
+# Сколько расписаний форматируется и пишется за один раз
+WRITE_BATCH_SIZE = 10_000
+
+
+def open_schedule_file(file_path, mode='rt', compresslevel=6):
+    # Открытие файла расписаний, файлы с расширением .gz сжимаются gzip
+    if file_path.endswith('.gz'):
+        if 'w' in mode:
+            return gzip.open(file_path, mode, encoding='utf-8', compresslevel=compresslevel)
+        return gzip.open(file_path, mode, encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+
+def iter_user_schedules(file_path):
+    # Построчное чтение персональных расписаний из JSON Lines (в том числе .gz)
+    with open_schedule_file(file_path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def validate_schedule_arrays(times, counts):
+    # Векторная проверка тех же ограничений, что в NotificationTime
+    # times - (n, 7, k) с пустыми местами = -1, counts - (n, 7)
+    times = np.asarray(times)
+    counts = np.asarray(counts)
+
+    used = times >= 0
+    bad_hours = used & ((times < FIRST_HOUR) | (times > LAST_HOUR))
+    if bad_hours.any():
+        hour_value = times[bad_hours][0]
+        raise ValueError(f'Время уведомлений должно быть между 6 и 23, получено {hour_value}')
+
+    bad_counts = (counts < 1) | (counts > 4)
+    if bad_counts.any():
+        count_value = counts[bad_counts][0]
+        raise ValueError(f'Количество уведомлений должно быть от 1 до 4, получено {count_value}')
+
+    # Часы дня идут по возрастанию без повторов, пустые места - только в конце
+    unordered = used[..., 1:] & ~(used[..., :-1] & (times[..., 1:] > times[..., :-1]))
+    if unordered.any():
+        day_times = times[unordered.any(axis=-1)][0]
+        raise ValueError(f'Часы уведомлений должны идти по возрастанию без повторов, получено {day_times.tolist()}')
+
+    mismatched = counts != used.sum(axis=-1)
+    if mismatched.any():
+        count_value = counts[mismatched][0]
+        hours_count = used.sum(axis=-1)[mismatched][0]
+        raise ValueError(f'Количество уведомлений {count_value} не совпадает с числом часов {hours_count}')
+
+
+class ScheduleWriter:
+    # Потоковая запись персональных расписаний в компактный JSON Lines
+    # Память не зависит от количества записанных расписаний
+
+    def __init__(self, file_path, compresslevel=6):
+        self.file_path = file_path
+        self.compresslevel = compresslevel
+        self.file = None
+        self.written = 0
+        self._day_fragments = [{} for _ in DAYS_OF_WEEK]
+        self._category_fragments = {}
+
+    def __enter__(self):
+        self.file = open_schedule_file(self.file_path, 'wt', self.compresslevel)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+
+    def write_models(self, schedules, validate=True):
+        # Запись расписаний из словарей или моделей UserSchedule
+        # При validate=True вся пачка проверяется одним валидатором
+        batch = []
+        for schedule in schedules:
+            batch.append(schedule)
+            if len(batch) >= WRITE_BATCH_SIZE:
+                self._write_model_batch(batch, validate)
+                batch = []
+
+        if batch:
+            self._write_model_batch(batch, validate)
+
+    def write_arrays(self, user_ids, times, counts=None, trusted=False, categories=None):
+        # Быстрая запись из массивов: user_ids (n,), times (n, 7, k) с пустыми местами = -1
+        # Часы дня должны идти по возрастанию и без повторов, как их выдает движок выбора часов
+        # (проверяется вместе с количеством)
+        # trusted=True пропускает проверку для данных, полученных из движка выбора часов
+        # categories (n,) - названия категорий для записей UserCategorySchedule
+        times = np.asarray(times)
+        counts = (times >= 0).sum(axis=-1) if counts is None else np.asarray(counts)
+
+        for start in range(0, len(user_ids), WRITE_BATCH_SIZE):
+            batch = slice(start, start + WRITE_BATCH_SIZE)
+            if not trusted:
+                validate_schedule_arrays(times[batch], counts[batch])
+
+            # Кодируем набор часов дня битовой маской, чтобы переиспользовать готовые фрагменты JSON
+            batch_times = times[batch]
+            hour_bits = np.where(batch_times >= 0, 1 << (batch_times - FIRST_HOUR).clip(min=0), 0)
+            day_keys = np.bitwise_or.reduce(hour_bits, axis=-1) * 8 + counts[batch]
+
+            day_columns = []
+            for day_index in range(len(DAYS_OF_WEEK)):
+                key_index, unique_keys = pd.factorize(day_keys[:, day_index])
+                fragments = [self._day_fragment(day_index, key) for key in unique_keys.tolist()]
+                day_columns.append(map(fragments.__getitem__, key_index.tolist()))
+
+            heads = [f'{{"user_id":{user_id},' for user_id in np.asarray(user_ids[batch]).tolist()]
+            if categories is not None:
+                heads = [
+                    head + self._category_fragment(category)
+                    for head, category in zip(heads, np.asarray(categories[batch]).tolist())
+                ]
+
+            lines = [
+                f'{head}"schedule":{{{",".join(day_parts)}}}}}\n'
+                for head, *day_parts in zip(heads, *day_columns)
+            ]
+
+            self.file.write(''.join(lines))
+            self.written += len(lines)
+
+    def _write_model_batch(self, batch, validate):
+        if validate:
+            batch = validate_user_schedules(batch)
+        self.file.write(''.join(schedule.model_dump_json() + '\n' for schedule in batch))
+        self.written += len(batch)
+
+    def _day_fragment(self, day_index, key):
+        # Готовый JSON фрагмент одного дня, кэшируется по набору часов и количеству
+        fragments = self._day_fragments[day_index]
+        if key not in fragments:
+            mask, count = key // 8, key % 8
+            hours = [FIRST_HOUR + bit for bit in range(LAST_HOUR - FIRST_HOUR + 1) if mask >> bit & 1]
+            day = DAYS_OF_WEEK[day_index].lower()
+            fragments[key] = f'"{day}":{{"times":{json.dumps(hours, separators=(",", ":"))},"count":{count}}}'
+        return fragments[key]
+
+    def _category_fragment(self, category):
+        if category not in self._category_fragments:
+            self._category_fragments[category] = f'"category":{json.dumps(category, ensure_ascii=False)},'
+        return self._category_fragments[category]
@@ -0,0 +1,356 @@
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from coverage import CoverageEvaluator
+from data_cache import source_fingerprint
+from data_processor import CHUNK_SIZE, DataProcessor
+from optimal_selection import select_schedule_hours
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, HOURS, LAST_HOUR, selection_to_schedule
+
+
+# Точность HyperLogLog: 2^14 регистров (16 КБ), относительная ошибка около 0.8%
+HLL_PRECISION = 14
+
+# Сколько записей хранится в выборке каждой ячейки день x час
+SAMPLE_SIZE = 1024
+
+# Ячеек день x час
+CELL_COUNT = len(DAYS_OF_WEEK) * len(HOURS)
+
+# Случайных матриц активности для оценки устойчивости выбранных часов
+STABILITY_TRIALS = 1000
+
+CONFIDENCE = 0.95
+
+
+class HyperLogLog:
+    # Приближенный подсчет различных user_id в памяти фиксированного размера
+    # Объединение двух счетчиков (merge) равно счетчику по объединенным данным
+
+    def __init__(self, precision=HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f'Точность HyperLogLog должна быть от 4 до 18, получено {precision}')
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        hashed = _hash64(values)
+        index = (hashed >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Позиция первой единицы в оставшихся битах хэша
+        rest = hashed & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f'Разная точность HyperLogLog: {self.precision} и {other.precision}')
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        estimate = alpha * register_count ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+
+        # Для малых количеств точнее подсчет по пустым регистрам
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * register_count and empty:
+            estimate = register_count * np.log(register_count / empty)
+        return float(estimate)
+
+    def relative_error(self):
+        # Стандартная относительная ошибка оценки
+        return 1.04 / np.sqrt(len(self.registers))
+
+
+class ActivitySketch:
+    # Сжатое описание истории для приближенного анализа:
+    # - HyperLogLog для числа пользователей,
+    # - точное число записей и период данных,
+    # - выборка до sample_size записей в каждой ячейке день x час (стратифицированная выборка)
+    # Каждой записи присваивается случайный ключ, в выборке ячейки остаются записи с наименьшими
+    # ключами, поэтому наброски разных файлов и процессов объединяются без потери точности
+
+    def __init__(self, sample_size=SAMPLE_SIZE, precision=HLL_PRECISION, seed=None):
+        if sample_size < 2:
+            raise ValueError(f'Размер выборки ячейки должен быть не меньше 2, получено {sample_size}')
+        self.sample_size = sample_size
+        self.users = HyperLogLog(precision)
+        self.records = 0
+        self.first_date = None
+        self.last_date = None
+        # Число записей в каждой ячейке (точное) и выборка, упорядоченная по ячейке и ключу
+        self.cell_counts = np.zeros(CELL_COUNT, dtype=np.int64)
+        self.sample_cells = np.zeros(0, dtype=np.int64)
+        self.sample_keys = np.zeros(0)
+        self.sample_values = np.zeros(0)
+        # Хэши содержимого уже учтенных файлов: один файл нельзя добавить дважды
+        self.sources = set()
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_frame(cls, df, sample_size=SAMPLE_SIZE, precision=HLL_PRECISION, seed=None):
+        return cls(sample_size, precision, seed).add_chunk(df)
+
+    @classmethod
+    def from_csv(cls, file_path, sample_size=SAMPLE_SIZE, precision=HLL_PRECISION, seed=None,
+                 chunk_size=CHUNK_SIZE, source=None):
+        # Потоковая сборка: в памяти одновременно только один блок CSV
+        # source - хэш содержимого файла, если он уже посчитан
+        sketch = cls(sample_size, precision, seed)
+        sketch.sources.add(source or source_fingerprint(file_path)['content_hash'])
+        for chunk in DataProcessor(chunk_size=chunk_size).iter_chunks(file_path):
+            sketch.add_chunk(chunk)
+        return sketch
+
+    def add_chunk(self, chunk):
+        self.users.add(chunk['user_id'].to_numpy(dtype=np.int64))
+        self.records += len(chunk)
+        if len(chunk):
+            dates = pd.to_datetime(chunk['date'])
+            self._update_period(dates.min(), dates.max())
+
+        # В выборку попадает только дневное время 6-23, как в analyze_hourly_activity
+        day_codes = pd.Categorical(chunk['day_name'], categories=DAYS_OF_WEEK).codes.astype(np.int64)
+        hours = chunk['hour'].to_numpy()
+        values = chunk['screen_time'].to_numpy(dtype=float)
+        valid = (day_codes >= 0) & (hours >= FIRST_HOUR) & (hours <= LAST_HOUR) & ~np.isnan(values)
+        cells = day_codes[valid] * len(HOURS) + hours[valid] - FIRST_HOUR
+        values = values[valid]
+        self.cell_counts += np.bincount(cells, minlength=CELL_COUNT)
+
+        # В заполненную выборку ячейки может попасть только запись с ключом меньше наибольшего
+        keys = self._rng.random(len(cells))
+        candidates = keys < self._key_thresholds()[cells]
+        self._merge_samples(cells[candidates], keys[candidates], values[candidates])
+        return self
+
+    def has_source(self, source):
+        return source in self.sources
+
+    def merge(self, other):
+        # Объединение с наброском другого файла или процесса
+        if other.sample_size != self.sample_size:
+            raise ValueError(f'Разный размер выборки: {self.sample_size} и {other.sample_size}')
+        repeated = self.sources & other.sources
+        if repeated:
+            raise ValueError(f'Данные файла уже учтены в наброске: {", ".join(sorted(repeated))}')
+        self.sources |= other.sources
+        self.users.merge(other.users)
+        self.records += other.records
+        if other.first_date is not None:
+            self._update_period(other.first_date, other.last_date)
+        self.cell_counts += other.cell_counts
+        self._merge_samples(other.sample_cells, other.sample_keys, other.sample_values)
+        return self
+
+    def estimate(self):
+        # Оценка сумм активности 7x18, их стандартной ошибки и матрица непустых ячеек
+        # Ячейки, где записей не больше sample_size, посчитаны точно (ошибка 0)
+        sampled = np.bincount(self.sample_cells, minlength=CELL_COUNT)
+        sums = np.bincount(self.sample_cells, weights=self.sample_values, minlength=CELL_COUNT)
+        squares = np.bincount(self.sample_cells, weights=self.sample_values ** 2, minlength=CELL_COUNT)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(sampled > 0, sums / sampled, 0.0)
+            variance = np.where(sampled > 1, (squares - sampled * mean ** 2) / (sampled - 1), 0.0)
+            unsampled_share = np.where(self.cell_counts > 0, 1 - sampled / self.cell_counts, 0.0)
+            standard_error = self.cell_counts * np.sqrt(
+                np.maximum(variance, 0.0) / np.maximum(sampled, 1) * unsampled_share
+            )
+
+        shape = (len(DAYS_OF_WEEK), len(HOURS))
+        return (
+            (self.cell_counts * mean).reshape(shape),
+            standard_error.reshape(shape),
+            (self.cell_counts > 0).reshape(shape),
+        )
+
+    def period_days(self):
+        if self.first_date is None:
+            return 0
+        return (self.last_date - self.first_date).days
+
+    def save_state(self, file_path):
+        # Сохранение наброска в .npz файл (как состояние IncrementalActivityAggregator)
+        np.savez(
+            file_path,
+            sample_size=np.array(self.sample_size),
+            registers=self.users.registers,
+            records=np.array(self.records),
+            period=np.array([
+                -1 if self.first_date is None else self.first_date.value,
+                -1 if self.last_date is None else self.last_date.value,
+            ], dtype=np.int64),
+            cell_counts=self.cell_counts,
+            sample_cells=self.sample_cells,
+            sample_keys=self.sample_keys,
+            sample_values=self.sample_values,
+            sources=np.array(sorted(self.sources), dtype=str),
+        )
+
+    @classmethod
+    def load_state(cls, file_path, seed=None):
+        with np.load(file_path) as state:
+            registers = state['registers']
+            sketch = cls(int(state['sample_size']), int(np.log2(len(registers))), seed)
+            sketch.users.registers = registers.copy()
+            sketch.records = int(state['records'])
+            first, last = state['period'].tolist()
+            if first >= 0:
+                sketch.first_date, sketch.last_date = pd.Timestamp(first), pd.Timestamp(last)
+            sketch.cell_counts = state['cell_counts']
+            sketch.sample_cells = state['sample_cells']
+            sketch.sample_keys = state['sample_keys']
+            sketch.sample_values = state['sample_values']
+            sketch.sources = set(state['sources'].tolist()) if 'sources' in state else set()
+        return sketch
+
+    def _update_period(self, first, last):
+        self.first_date = first if self.first_date is None else min(self.first_date, first)
+        self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+    def _key_thresholds(self):
+        # Наибольший ключ в заполненных выборках ячеек (для незаполненных - бесконечность)
+        thresholds = np.full(CELL_COUNT, np.inf)
+        sampled = np.bincount(self.sample_cells, minlength=CELL_COUNT)
+        full = np.flatnonzero(sampled >= self.sample_size)
+        # Выборка упорядочена по ячейке и ключу: наибольший ключ - последний в ячейке
+        thresholds[full] = self.sample_keys[np.cumsum(sampled)[full] - 1]
+        return thresholds
+
+    def _merge_samples(self, cells, keys, values):
+        # Оставляем в каждой ячейке sample_size записей с наименьшими ключами
+        if len(cells) == 0:
+            return
+        cells = np.concatenate([self.sample_cells, cells])
+        keys = np.concatenate([self.sample_keys, keys])
+        values = np.concatenate([self.sample_values, values])
+
+        order = np.lexsort((keys, cells))
+        cells, keys, values = cells[order], keys[order], values[order]
+        rank = np.arange(len(cells)) - np.searchsorted(cells, cells)
+        kept = rank < self.sample_size
+        self.sample_cells, self.sample_keys, self.sample_values = cells[kept], keys[kept], values[kept]
+
+
+def sketch_files(file_paths, sample_size=SAMPLE_SIZE, precision=HLL_PRECISION, seed=None, workers=None):
+    # Наброски нескольких файлов строятся параллельно и объединяются
+    # У каждого файла свой поток случайных ключей, чтобы выборки не зависели друг от друга
+    seeds = np.random.SeedSequence(seed).spawn(len(file_paths))
+    tasks = [(file_path, sample_size, precision, file_seed) for file_path, file_seed in zip(file_paths, seeds)]
+
+    if workers == 1 or len(tasks) <= 1:
+        sketches = [_sketch_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sketches = list(executor.map(_sketch_file, tasks))
+
+    sketch = ActivitySketch(sample_size, precision, seed)
+    for part in sketches:
+        sketch.merge(part)
+    return sketch
+
+
+def _sketch_file(task):
+    file_path, sample_size, precision, seed = task
+    return ActivitySketch.from_csv(file_path, sample_size, precision, seed)
+
+
+def estimate_peak_hours(sketch, num_peaks=3, solver='greedy', trials=STABILITY_TRIALS,
+                        confidence=CONFIDENCE, seed=None):
+    # Пиковые часы по наброску и границы ошибки для них
+    # Устойчивость дня - доля случайных матриц активности (оценка +- ее стандартная ошибка),
+    # для которых выбираются те же часы; 1.0 означает, что выбор не зависит от ошибки выборки
+    activity, standard_error, present = sketch.estimate()
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    times = select_schedule_hours(activity, present, num_peaks, solver)
+    peak_hours = selection_to_schedule(times, present)
+
+    rng = np.random.default_rng(seed)
+    draws = np.maximum(activity + standard_error * rng.standard_normal((trials,) + activity.shape), 0.0)
+    draw_times = select_schedule_hours(draws, np.broadcast_to(present, draws.shape), num_peaks, solver)
+    stability = (np.sort(draw_times, axis=-1) == np.sort(times, axis=-1)).all(axis=-1).mean(axis=0)
+
+    days = {}
+    for day_index, day in enumerate(DAYS_OF_WEEK):
+        columns = [hour - FIRST_HOUR for hour in peak_hours[day.lower()] if present[day_index, hour - FIRST_HOUR]]
+        days[day.lower()] = {
+            'hours': [
+                {
+                    'hour': int(HOURS[column]),
+                    'activity': float(activity[day_index, column]),
+                    'low': float(max(0.0, activity[day_index, column] - z * standard_error[day_index, column])),
+                    'high': float(activity[day_index, column] + z * standard_error[day_index, column]),
+                }
+                for column in columns
+            ],
+            'stability': float(stability[day_index]),
+        }
+
+    users = sketch.users.count()
+    users_margin = z * sketch.users.relative_error() * users
+
+    return {
+        'peak_hours': peak_hours,
+        'activity': activity,
+        'present': present,
+        'coverage': _coverage_bounds(activity, standard_error, peak_hours, z),
+        'users': {
+            'estimate': int(round(users)),
+            'low': int(max(0, np.floor(users - users_margin))),
+            'high': int(np.ceil(users + users_margin)),
+        },
+        'days': days,
+        'confidence': confidence,
+    }
+
+
+def _coverage_bounds(activity, standard_error, peak_hours, z):
+    # Покрытие выбранных часов и его граница ошибки (дельта-метод для доли covered / total,
+    # ячейки оцениваются независимо)
+    coverage = CoverageEvaluator.from_matrix(activity).evaluate_schedule(peak_hours)
+    covered_mask = np.zeros(activity.shape, dtype=bool)
+    for day_index, day in enumerate(DAYS_OF_WEEK):
+        columns = [hour - FIRST_HOUR for hour in peak_hours[day.lower()] if FIRST_HOUR <= hour <= LAST_HOUR]
+        covered_mask[day_index, columns] = True
+
+    covered = activity[covered_mask].sum()
+    uncovered = activity[~covered_mask].sum()
+    total = covered + uncovered
+    if total <= 0:
+        margin = 0.0
+    else:
+        variance = (uncovered ** 2 * np.sum(standard_error[covered_mask] ** 2)
+                    + covered ** 2 * np.sum(standard_error[~covered_mask] ** 2)) / total ** 4
+        margin = z * np.sqrt(variance) * 100
+
+    overall = float(coverage['overall_coverage'])
+    return {
+        'overall_coverage': overall,
+        'low': float(max(0.0, overall - margin)),
+        'high': float(min(100.0, overall + margin)),
+        'total_activity': float(coverage['total_activity']),
+        'covered_activity': float(coverage['covered_activity']),
+    }
+
+
+def _hash64(values):
+    # splitmix64: равномерный 64-битный хэш целых user_id
+    hashed = np.asarray(values, dtype=np.int64).view(np.uint64)
+    hashed = hashed + np.uint64(0x9E3779B97F4A7C15)
+    hashed = (hashed ^ (hashed >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashed = (hashed ^ (hashed >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return hashed ^ (hashed >> np.uint64(31))
+
+
+def _bit_length(values):
+    # Число значащих битов uint64 без потери точности: по 32 бита в float64
+    high = np.frexp((values >> np.uint64(32)).astype(float))[1]
+    low = np.frexp((values & np.uint64(0xFFFFFFFF)).astype(float))[1]
+    return np.where(high > 0, high + 32, low)
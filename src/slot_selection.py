@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from optimal_selection import select_optimal_columns
+from peak_selection import DAYS_OF_WEEK, DEFAULT_HOURS, FIRST_HOUR, LAST_HOUR, fill_default_days, select_spaced_hours
+
+
+# Дневное время в минутах от полуночи: [6:00, 24:00)
+FIRST_MINUTE = FIRST_HOUR * 60
+DAY_END_MINUTE = (LAST_HOUR + 1) * 60
+DEFAULT_MINUTES = [hour * 60 for hour in DEFAULT_HOURS]
+
+# Сколько часов лучших слотов рассматривает жадный алгоритм (как top_n=6 для часов)
+TOP_HOURS = 6
+
+
+def slot_starts(bin_minutes=15):
+    # Начала слотов в минутах от полуночи, ширина слота должна делить час
+    if bin_minutes < 1 or 60 % bin_minutes:
+        raise ValueError(f'Ширина слота должна делить 60 минут, получено {bin_minutes}')
+    return np.arange(FIRST_MINUTE, DAY_END_MINUTE, bin_minutes)
+
+
+def build_day_slot_matrix(df, bin_minutes=15, value_column='screen_time'):
+    # Матрица 7 x n_slots (день недели x слот) из исходных записей с точным временем
+    # Вторая матрица отмечает слоты, в которых есть хотя бы одна запись
+    starts = slot_starts(bin_minutes)
+    minutes = (df['date'].dt.hour * 60 + df['date'].dt.minute).to_numpy()
+    day_codes = pd.Categorical(df['day_name'], categories=DAYS_OF_WEEK).codes.astype(np.int64)
+    values = df[value_column].to_numpy(dtype=float)
+
+    valid = (day_codes >= 0) & (minutes >= FIRST_MINUTE) & (minutes < DAY_END_MINUTE) & ~np.isnan(values)
+    flat_index = day_codes[valid] * len(starts) + (minutes[valid] - FIRST_MINUTE) // bin_minutes
+    size = len(DAYS_OF_WEEK) * len(starts)
+
+    activity = np.bincount(flat_index, weights=values[valid], minlength=size)
+    present = np.bincount(flat_index, minlength=size) > 0
+    return activity.reshape(len(DAYS_OF_WEEK), -1), present.reshape(len(DAYS_OF_WEEK), -1)
+
+
+def window_scores(values, bin_minutes=15, window_minutes=60):
+    # Сумма по окну window_minutes, начинающемуся в каждом слоте (окно обрезается концом дня)
+    # Считается через накопленные суммы, поэтому время не зависит от ширины окна
+    if window_minutes < bin_minutes or window_minutes % bin_minutes:
+        raise ValueError(f'Окно должно быть кратно ширине слота {bin_minutes} мин, получено {window_minutes}')
+    width = window_minutes // bin_minutes
+    values = np.asarray(values, dtype=float)
+    if width == 1:
+        return values.copy()
+
+    slot_count = values.shape[-1]
+    cumulative = np.zeros(values.shape[:-1] + (slot_count + 1,))
+    np.cumsum(values, axis=-1, out=cumulative[..., 1:])
+    ends = np.minimum(np.arange(slot_count) + width, slot_count)
+    return cumulative[..., ends] - cumulative[..., :slot_count]
+
+
+def select_peak_slots(activity, present, bin_minutes=15, num_peaks=3, window_minutes=60,
+                      min_gap_minutes=180, solver='greedy'):
+    # Время уведомлений в минутах для каждой строки (..., 7, n_slots) -> (..., 7, max(k, 3))
+    # Слот оценивается по активности в окне window_minutes после него, интервал - не менее
+    # min_gap_minutes; при bin_minutes=window_minutes=60 совпадает с выбором по часам
+    starts = slot_starts(bin_minutes)
+    scores = window_scores(activity, bin_minutes, window_minutes)
+    window_present = window_scores(present, bin_minutes, window_minutes) > 0
+
+    if solver == 'optimal':
+        # Разные слоты отстоят хотя бы на один, поэтому нулевой интервал равен одному слоту
+        min_gap_slots = max(1, -(-min_gap_minutes // bin_minutes))
+        selected = starts[select_optimal_columns(scores, num_peaks, min_gap_slots)]
+    elif solver == 'greedy':
+        selected, _ = select_spaced_hours(
+            scores, window_present, num_peaks, top_n=TOP_HOURS * 60 // bin_minutes,
+            min_gap=min_gap_minutes, default_hours=DEFAULT_MINUTES, hours=starts
+        )
+    else:
+        raise ValueError(f"Неизвестный алгоритм выбора часов: {solver}, доступны: greedy, optimal")
+
+    return fill_default_days(selected, present, DEFAULT_MINUTES)
+
+
+def slot_coverage(activity, times, bin_minutes=15, window_minutes=60):
+    # Доля активности в окнах window_minutes после выбранного времени (формат calculate_coverage)
+    activity = np.asarray(activity, dtype=float)
+    starts = slot_starts(bin_minutes)
+    times = np.asarray(times)[..., None]
+    covered = ((times >= 0) & (starts >= times) & (starts < times + window_minutes)).any(axis=-2)
+
+    day_totals = activity.sum(axis=1)
+    day_covered = np.where(covered, activity, 0.0).sum(axis=1)
+    total_activity = day_totals.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily = np.where(day_totals > 0, day_covered / day_totals * 100, 0)
+
+    return {
+        'overall_coverage': float(day_covered.sum() / total_activity * 100) if total_activity > 0 else 0.0,
+        'daily_coverage': {day: float(daily[day_index]) for day_index, day in enumerate(DAYS_OF_WEEK)},
+        'total_activity': float(total_activity),
+        'covered_activity': float(day_covered.sum())
+    }
+
+
+def minutes_to_schedule(times):
+    # Массив (7, k) с пустыми местами = -1 в словарь {'monday': [минуты], ...}
+    return {
+        day.lower(): [int(minute) for minute in times[day_index] if minute >= 0]
+        for day_index, day in enumerate(DAYS_OF_WEEK)
+    }
+
+
+def format_minutes(minute):
+    # 1125 -> '18:45'
+    return f'{minute // 60:02d}:{minute % 60:02d}'
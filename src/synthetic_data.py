@@ -0,0 +1,97 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from peak_selection import DAYS_OF_WEEK
+
+
+# Категории из исходных данных, дальше добавляются синтетические
+BASE_CATEGORIES = ['Utilities', 'Entertainment', 'Social', 'Productivity']
+
+# Относительная активность по часам суток (0-23): ночью мало, пики днем и вечером
+HOUR_PROFILE = np.array([
+    1, 1, 1, 1, 1, 2, 4, 6, 7, 6, 5, 5,
+    7, 6, 5, 5, 6, 7, 8, 9, 9, 8, 5, 3,
+], dtype=float)
+
+# Количество строк, которое генерируется и записывается за один раз
+GENERATE_CHUNK_SIZE = 100_000
+
+
+def category_names(category_count):
+    # Названия категорий: сначала исходные, затем Category5, Category6, ...
+    names = BASE_CATEGORIES[:category_count]
+    names += [f'Category{i + 1}' for i in range(len(names), category_count)]
+    return names
+
+
+def generate_screen_time_csv(file_path, rows, users=100, categories=4, days=90,
+                             start_date='2024-01-01', seed=42, chunk_size=GENERATE_CHUNK_SIZE):
+    # Запись синтетических данных в формате processed_screen_time_data.csv
+    # user_id;date;category;screen_time;day_of_week;day_name (десятичная запятая)
+    # Данные генерируются блоками, поэтому память не зависит от количества строк
+    rng = np.random.default_rng(seed)
+    names = np.array(category_names(categories))
+    day_names = np.array(DAYS_OF_WEEK)
+    start = np.datetime64(start_date, 'm')
+
+    # У каждого дня недели свой немного смещенный профиль активности по часам
+    day_profiles = HOUR_PROFILE * rng.uniform(0.7, 1.3, size=(len(DAYS_OF_WEEK), 24))
+    day_profiles /= day_profiles.sum(axis=1, keepdims=True)
+
+    # Накопленные профили всех дней в одном возрастающем массиве: профиль дня d сдвинут на d,
+    # поэтому час находится одним поиском без матрицы строк x 24
+    day_cdf = (np.cumsum(day_profiles, axis=1) + np.arange(len(DAYS_OF_WEEK))[:, None]).ravel()
+
+    with open(file_path, 'w', encoding='utf-8', newline='') as file:
+        file.write('user_id;date;category;screen_time;day_of_week;day_name\n')
+
+        for chunk_start in range(0, rows, chunk_size):
+            chunk_rows = min(chunk_size, rows - chunk_start)
+
+            # Строки идут по возрастанию даты, каждый блок занимает свою часть периода
+            first_day = chunk_start * days // rows
+            last_day = max((chunk_start + chunk_rows) * days // rows, first_day + 1)
+            day_offset = np.sort(rng.integers(first_day, last_day, size=chunk_rows))
+            dates = start + day_offset.astype('timedelta64[D]')
+            day_index = (dates.astype('datetime64[D]').view('int64') - 4) % 7
+
+            # Час выбирается по профилю дня недели, минута - равномерно
+            hour_position = np.searchsorted(day_cdf, day_index + rng.random(chunk_rows))
+            hours = (hour_position - day_index * 24).clip(max=23)
+            minutes = rng.integers(0, 60, size=chunk_rows)
+            dates = dates + (hours * 60 + minutes).astype('timedelta64[m]')
+
+            order = np.argsort(dates, kind='stable')
+            dates, day_index = dates[order], day_index[order]
+
+            chunk = pd.DataFrame({
+                'user_id': rng.integers(1000, 1000 + users, size=chunk_rows),
+                'date': pd.DatetimeIndex(dates).strftime('%Y-%m-%d %H:%M'),
+                'category': names[rng.integers(0, len(names), size=chunk_rows)],
+                'screen_time': np.round(rng.gamma(2.0, 12.0, size=chunk_rows), 2),
+                'day_of_week': day_index + 1,
+                'day_name': day_names[day_index],
+            })
+            chunk.to_csv(file, sep=';', decimal=',', header=False, index=False)
+
+    return file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генерация синтетических данных экранного времени')
+    parser.add_argument('output', help='Путь к CSV файлу')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate_screen_time_csv(args.output, args.rows, args.users, args.categories, args.days, seed=args.seed)
+    print(f"Сгенерировано {args.rows} строк: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from activity_analyzer import ActivityAnalyzer
+from data_processor import DataProcessor
+from synthetic_data import generate_screen_time_csv
+
+
+def reference_stability(df, hourly_activity):
+    # Исходный расчет: отдельный отбор строк для каждой пары (день, час)
+    df = df.copy()
+    df['week'] = df['date'].dt.isocalendar().week
+    df['year'] = df['date'].dt.isocalendar().year
+
+    stability_scores = {}
+    for day in hourly_activity['day_name'].unique():
+        for hour in range(6, 24):
+            hour_data = df[(df['day_name'] == day) & (df['hour'] == hour)]
+            if len(hour_data) > 0:
+                weekly_activity = hour_data.groupby(['year', 'week'])['screen_time'].sum()
+                if len(weekly_activity) > 1 and weekly_activity.mean() > 0:
+                    cv = weekly_activity.std() / weekly_activity.mean()
+                    stability = max(0, 1 - min(cv, 1.0))
+                else:
+                    stability = 0.5
+            else:
+                stability = 0.0
+            stability_scores[(day, hour)] = stability
+    return stability_scores
+
+
+@pytest.mark.parametrize('rows, days', [(20_000, 42), (300, 10)])
+def test_stability_matches_loop(tmp_path, rows, days):
+    # Малый файл дает часы без данных и часы с одной неделей
+    file_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(file_path, rows, users=50, days=days)
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))
+
+    analyzer = ActivityAnalyzer(df, quiet=True)
+    hourly_activity = analyzer.analyze_hourly_activity()
+    stability = analyzer._calculate_activity_stability(hourly_activity)
+    expected = reference_stability(df, hourly_activity)
+
+    assert stability.keys() == expected.keys()
+    keys = sorted(expected)
+    np.testing.assert_allclose([stability[key] for key in keys], [expected[key] for key in keys], atol=1e-12)
+    assert 'week' not in df.columns
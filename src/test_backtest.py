@@ -0,0 +1,58 @@
+import numpy as np
+
+from backtest import ALGORITHMS, WeeklyActivity, make_folds, run_backtest
+from data_processor import DataProcessor
+from synthetic_data import generate_screen_time_csv
+
+
+def weekly_activity(tmp_path, rows=20_000, days=70):
+    file_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(file_path, rows, users=100, days=days)
+    return WeeklyActivity.from_csv(file_path, chunk_size=3_000), file_path
+
+
+def test_windows_match_direct_sums(tmp_path):
+    weekly, file_path = weekly_activity(tmp_path)
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))
+    daytime = df[df['hour'].between(6, 23)]
+
+    assert len(weekly) >= 10
+    whole = weekly.window(0, len(weekly))
+    assert np.isclose(whole['activity'].sum(), daytime['screen_time'].sum())
+    np.testing.assert_allclose(
+        weekly.window(2, 5)['activity'], weekly.activity[2:5].sum(axis=0), atol=1e-9
+    )
+
+
+def test_backtest_folds_and_summary(tmp_path):
+    weekly, _ = weekly_activity(tmp_path)
+    folds = make_folds(weekly, train_weeks=4, test_weeks=1)
+    result = run_backtest(weekly, ['greedy', 'default', 'random'], workers=1, seed=7)
+
+    assert len(result['folds']) == 3 * len(folds)
+    for name, summary in result['summary'].items():
+        assert summary['folds'] == len(folds)
+        assert 0 <= summary['min_coverage'] <= summary['mean_coverage'] <= summary['max_coverage'] <= 100
+
+    # Случайное расписание окна зависит только от seed и номера окна
+    repeated = run_backtest(weekly, ['random'], workers=1, seed=7)
+    random_folds = [record['coverage'] for record in result['folds'] if record['algorithm'] == 'random']
+    assert [record['coverage'] for record in repeated['folds']] == random_folds
+
+
+def test_registered_algorithms_return_valid_hours(tmp_path):
+    weekly, _ = weekly_activity(tmp_path, rows=5_000, days=35)
+    window = weekly.window(0, len(weekly))
+    for name, algorithm in ALGORITHMS.items():
+        hours = np.asarray(algorithm(window, 3, np.random.default_rng(0)))
+        assert hours.shape[0] == 7, name
+        chosen = hours[hours >= 0]
+        assert ((chosen >= 6) & (chosen <= 23)).all(), name
+
+
+def test_default_algorithm_follows_num_peaks(tmp_path):
+    weekly, _ = weekly_activity(tmp_path, rows=2_000, days=14)
+    window = weekly.window(0, len(weekly))
+    default = ALGORITHMS['default']
+    assert default(window, 2, None).tolist() == [[9, 14]] * 7
+    assert default(window, 4, None).tolist() == [[9, 14, 19, -1]] * 7
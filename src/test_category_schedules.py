@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from category_schedules import (
+    REDUCE_EVERY, CategoryActivityCube, build_category_schedules, category_peak_hours, write_user_category_schedules
+)
+from schedule_writer import iter_user_schedules
+
+
+def sample_frame(rows=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 14 * 24, rows), unit='h')
+    df = pd.DataFrame({
+        'user_id': rng.integers(1, 50, rows),
+        'date': dates,
+        'category': pd.Categorical(rng.choice(['Social', 'Games', 'Video'], rows)),
+        'screen_time': rng.random(rows) * 30,
+        'day_name': dates.day_name(),
+    })
+    df['hour'] = df['date'].dt.hour
+    return df
+
+
+def chunked_cube(df, chunk_count, by_user=False):
+    cube = CategoryActivityCube(by_user)
+    for chunk in np.array_split(np.arange(len(df)), chunk_count):
+        cube.add_chunk(df.iloc[chunk].copy())
+    return cube
+
+
+def test_parts_reduced_while_streaming():
+    cube = chunked_cube(sample_frame(), REDUCE_EVERY * 2 + 1)
+    assert len(cube._cell_parts) < REDUCE_EVERY
+    cube.reduce()
+    assert (len(cube._cell_parts), len(cube._stats_parts), len(cube._user_parts)) == (1, 1, 1)
+
+
+def test_chunked_cube_matches_single_frame():
+    df = sample_frame()
+    whole = CategoryActivityCube.from_frame(df)
+    chunked = chunked_cube(df, 20)
+
+    assert category_peak_hours(chunked) == category_peak_hours(whole)
+    assert chunked.category_summary() == whole.category_summary()
+
+
+def test_category_matches_filtered_frame():
+    # Активность категории совпадает с группировкой отфильтрованной таблицы
+    df = sample_frame()
+    cube = CategoryActivityCube.from_frame(df)
+    summary = cube.category_summary()
+    games = df[df['category'] == 'Games']
+    assert summary['Games']['records'] == len(games)
+    assert summary['Games']['users'] == games['user_id'].nunique()
+
+    for codes, _, activity, _ in cube.iter_group_batches():
+        position = codes.tolist().index(cube.categories.index('Games'))
+        daytime = games[games['hour'].between(6, 23)]
+        assert np.isclose(activity[position].sum(), daytime['screen_time'].sum())
+
+    schedules = build_category_schedules(cube)
+    assert set(schedules.categories) == {'Social', 'Games', 'Video'}
+
+
+def test_user_category_schedules(tmp_path):
+    df = sample_frame()
+    cube = CategoryActivityCube.from_frame(df, by_user=True)
+    output_path = str(tmp_path / 'user_categories.jsonl')
+    written = write_user_category_schedules(cube, output_path)
+
+    rows = list(iter_user_schedules(output_path))
+    assert written == len(rows) == len(df.groupby(['user_id', 'category'], observed=True))
+    assert {row['category'] for row in rows} == {'Social', 'Games', 'Video'}
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from cli import DEFAULTS, parse_args
+from synthetic_data import generate_screen_time_csv
+
+
+def write_config(tmp_path, **settings):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(settings), encoding='utf-8')
+    return str(config_path)
+
+
+def test_flags_override_config_and_defaults(tmp_path):
+    config_path = write_config(tmp_path, data='data.csv', solver='optimal', num_peaks=2)
+
+    args = parse_args(['analyze', '--config', config_path, '--num-peaks', '4'])
+    assert args.num_peaks == 4
+    assert args.solver == 'optimal'
+    # Относительный путь из файла настроек считается от папки этого файла
+    assert args.data == str(tmp_path / 'data.csv')
+    assert args.output_dir == DEFAULTS['output_dir']
+
+
+@pytest.mark.parametrize('settings', [{'unknown_key': 1}, {'num_peaks': 7}])
+def test_invalid_config_rejected(tmp_path, settings):
+    with pytest.raises(SystemExit):
+        parse_args(['analyze', '--config', write_config(tmp_path, **settings)])
+
+
+@pytest.mark.parametrize('argv', [
+    ['analyze', '--random-trials', '0'],
+    ['analyze', '--num-peaks', '5'],
+    ['ingest', '--num-peaks', '2'],
+])
+def test_invalid_flags_rejected(argv):
+    with pytest.raises(SystemExit):
+        parse_args(argv)
+
+
+def test_analyze_writes_json(tmp_path):
+    data_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(data_path, 5_000, users=50, days=14)
+    output_path = tmp_path / 'analysis.json'
+
+    args = parse_args(['analyze', '--data', data_path, '--num-peaks', '2', '--random-trials', '100',
+                       '--seed', '1', '--output', str(output_path)])
+    assert args.handler(args) == 0
+
+    result = json.loads(output_path.read_text(encoding='utf-8'))
+    assert all(len(hours) == 2 for hours in result['peak_hours'].values())
+    assert result['comparison']['random_baseline']['trials'] == 100
+    assert 0 < result['coverage']['overall_coverage'] <= 100
+
+
+def test_backtest_command(tmp_path):
+    data_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(data_path, 8_000, users=50, days=42)
+    output_path = tmp_path / 'backtest.json'
+
+    args = parse_args(['backtest', '--data', data_path, '--algorithms', 'greedy', 'default', '--num-peaks', '2',
+                       '--workers', '1', '--output', str(output_path)])
+    assert args.handler(args) == 0
+    result = json.loads(output_path.read_text(encoding='utf-8'))
+    assert set(result['summary']) == {'greedy', 'default'}
+    assert result['summary']['greedy']['folds'] > 0
+
+    args = parse_args(['backtest', '--data', data_path, '--algorithms', 'unknown'])
+    assert args.handler(args) == 2
+
+
+def test_approximate_schedule_kept_separate(tmp_path):
+    # Приближенное расписание не заменяет точное
+    data_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(data_path, 3_000, users=30, days=14)
+    output_dir = tmp_path / 'out'
+
+    args = parse_args(['schedule', '--data', data_path, '--output-dir', str(output_dir), '--approximate'])
+    assert args.handler(args) == 0
+    assert (output_dir / 'notification_schedule_approximate.json').exists()
+    assert not (output_dir / 'notification_schedule.json').exists()
+
+
+def test_query_missing_index(tmp_path, caplog):
+    args = parse_args(['query', '--output-dir', str(tmp_path), '--day', 'monday', '--hour', '9'])
+    assert args.handler(args) == 1
+    assert 'Индекс не найден' in caplog.text
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from coverage import CoverageEvaluator, schedule_to_array
+from peak_selection import DAYS_OF_WEEK, HOURS
+
+
+def hourly_activity(seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [(day, hour, rng.random() * 100) for day in DAYS_OF_WEEK for hour in HOURS.tolist() if rng.random() > 0.1]
+    return pd.DataFrame(rows, columns=['day_name', 'hour', 'screen_time'])
+
+
+def reference_coverage(activity, peak_hours):
+    # Покрытие по таблице, как в исходном calculate_coverage
+    total_covered = 0
+    daily = {}
+    for day in DAYS_OF_WEEK:
+        day_data = activity[activity['day_name'] == day]
+        covered = day_data[day_data['hour'].isin(peak_hours[day.lower()])]['screen_time'].sum()
+        total = day_data['screen_time'].sum()
+        daily[day] = covered / total * 100 if total > 0 else 0
+        total_covered += covered
+    return total_covered / activity['screen_time'].sum() * 100, daily
+
+
+def test_batch_matches_reference():
+    activity = hourly_activity()
+    evaluator = CoverageEvaluator(activity)
+    rng = np.random.default_rng(1)
+    schedules = [
+        {day.lower(): rng.choice(HOURS, size=rng.integers(1, 5)).tolist() for day in DAYS_OF_WEEK}
+        for _ in range(50)
+    ]
+    result = evaluator.evaluate(np.stack([schedule_to_array(schedule, 4) for schedule in schedules]))
+
+    for position, schedule in enumerate(schedules):
+        overall, daily = reference_coverage(activity, schedule)
+        assert result['overall'][position] == overall
+        assert evaluator.coverage_dict(result, position)['daily_coverage'] == daily
+
+
+def test_repeated_and_night_hours_ignored():
+    evaluator = CoverageEvaluator(hourly_activity())
+    base = {day.lower(): [9, 14] for day in DAYS_OF_WEEK}
+    noisy = {day.lower(): [9, 9, 3, 14] for day in DAYS_OF_WEEK}
+    assert evaluator.evaluate_schedule(noisy) == evaluator.evaluate_schedule(base)
+
+
+def test_from_matrix_matches_frame():
+    activity = hourly_activity(2)
+    from_frame = CoverageEvaluator(activity)
+    from_matrix = CoverageEvaluator.from_matrix(from_frame.activity_matrix)
+    schedule = {day.lower(): [8, 12, 20] for day in DAYS_OF_WEEK}
+    assert np.isclose(from_matrix.evaluate_schedule(schedule)['overall_coverage'],
+                      from_frame.evaluate_schedule(schedule)['overall_coverage'])
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import DataCache, source_fingerprint
+from data_processor import DataProcessor
+
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_screen_time_data.csv')
+
+
+def small_source(tmp_path, rows=200):
+    # Первые rows строк исходного файла
+    with open(DATA_FILE, encoding='utf-8') as file:
+        lines = [next(file) for _ in range(rows + 1)]
+    source_path = tmp_path / 'source.csv'
+    source_path.write_text(''.join(lines), encoding='utf-8')
+    return str(source_path)
+
+
+def test_cache_round_trip(tmp_path):
+    source_path = small_source(tmp_path)
+    processor = DataProcessor(cache_dir=str(tmp_path / 'cache'))
+
+    assert processor.load_data(source_path)
+    assert not processor.cache_hit
+    parsed = processor.df.copy()
+
+    assert processor.load_data(source_path)
+    assert processor.cache_hit
+    pd.testing.assert_frame_equal(processor.df, parsed, check_categorical=False)
+
+
+def test_fingerprint_taken_before_change_invalidates_entry(tmp_path):
+    # Файл изменился после снятия ключа: запись сохраняется со старым ключом и не используется
+    source_path = small_source(tmp_path)
+    cache = DataCache(str(tmp_path / 'cache'))
+    fingerprint = source_fingerprint(source_path)
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(source_path))
+
+    with open(source_path, 'a', encoding='utf-8') as file:
+        file.write('1;2024-01-01 10:00;Social;1,5;1;Monday\n')
+    cache.store(source_path, df, fingerprint)
+
+    assert cache.load(source_path) is None
+
+
+def is_memory_mapped(values):
+    # Массив - представление поверх np.memmap, а не копия
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+def test_store_error_keeps_parsed_frame(tmp_path, monkeypatch):
+    # Ошибка записи кэша не должна ломать загрузку
+    source_path = small_source(tmp_path)
+    processor = DataProcessor(cache_dir=str(tmp_path / 'cache'))
+
+    def fail_store(*args, **kwargs):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(processor.cache, 'store', fail_store)
+    assert processor.load_data(source_path)
+    assert not processor.cache_hit
+    assert len(processor.df) == 200
+
+
+def test_loaded_columns_are_memory_mapped(tmp_path):
+    source_path = small_source(tmp_path)
+    cache = DataCache(str(tmp_path / 'cache'))
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(source_path))
+    cache.store(source_path, df)
+
+    loaded = cache.load(source_path)
+    assert is_memory_mapped(loaded['screen_time'].to_numpy())
+    assert is_memory_mapped(loaded['category'].array.codes)
+
+
+def test_invalid_category_codes_drop_entry(tmp_path):
+    source_path = small_source(tmp_path)
+    cache = DataCache(str(tmp_path / 'cache'))
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(source_path))
+    cache.store(source_path, df)
+
+    codes_path = os.path.join(cache._entry_dir(source_path), 'category.npy')
+    codes = np.load(codes_path)
+    codes[0] = len(df['category'].cat.categories)
+    np.save(codes_path, codes)
+
+    assert cache.load(source_path) is None
+    assert not os.path.exists(cache._entry_dir(source_path))
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from activity_analyzer import ActivityAnalyzer
+from data_processor import CSV_COLUMNS, DataProcessor, source_byte_ranges
+from models import AnalysisMetadata
+from synthetic_data import generate_screen_time_csv
+
+
+@pytest.mark.parametrize('content', ['', ';'.join(CSV_COLUMNS) + '\n'])
+def test_empty_source_gives_empty_frame(tmp_path, content):
+    # Пустой файл и файл из одного заголовка дают пустую таблицу с нужными колонками
+    source_path = tmp_path / 'source.csv'
+    source_path.write_text(content, encoding='utf-8')
+
+    processor = DataProcessor()
+    assert processor.load_data(str(source_path), streaming=True)
+    assert processor.df.empty
+    assert set(CSV_COLUMNS + ['hour', 'is_weekend']) <= set(processor.df.columns)
+    assert str(processor.df['date'].dtype).startswith('datetime64')
+
+
+def test_chunks_keep_all_categories(tmp_path):
+    source_path = tmp_path / 'source.csv'
+    source_path.write_text(
+        ';'.join(CSV_COLUMNS) + '\n'
+        '1;2024-01-01 10:00;Social;1,5;1;Monday\n'
+        '2;2024-01-01 11:00;Games;2,5;1;Monday\n',
+        encoding='utf-8',
+    )
+
+    processor = DataProcessor(chunk_size=1)
+    assert processor.load_data(str(source_path), streaming=True)
+    assert processor.df['category'].tolist() == ['Social', 'Games']
+    assert processor.df['hour'].tolist() == [10, 11]
+    assert processor.df['screen_time'].sum() == 4.0
+
+
+def test_streamed_aggregation_matches_frame(tmp_path):
+    # Потоковые суммы по блокам дают ту же почасовую активность, стабильность и итоги, что и вся таблица
+    file_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(file_path, 20_000, users=80, days=30)
+
+    processor = DataProcessor()
+    assert processor.load_data(file_path, streaming=True)
+    df = processor.preprocess_data()
+    frame_analyzer = ActivityAnalyzer(df, quiet=True)
+
+    streaming = DataProcessor(chunk_size=3_000)
+    assert streaming.aggregate_activity(file_path)
+    assert streaming.df is None
+    aggregate = streaming.aggregate
+    streamed_analyzer = ActivityAnalyzer(None, quiet=True, weekly_activity=aggregate['weekly_activity'])
+
+    expected = frame_analyzer.analyze_hourly_activity()
+    hourly_activity = streamed_analyzer.analyze_hourly_activity()
+    pd.testing.assert_frame_equal(hourly_activity, expected, check_exact=False)
+
+    expected_stability = frame_analyzer._calculate_activity_stability(expected)
+    stability = streamed_analyzer._calculate_activity_stability(hourly_activity)
+    keys = sorted(expected_stability)
+    np.testing.assert_allclose([stability[key] for key in keys], [expected_stability[key] for key in keys])
+
+    metadata = AnalysisMetadata.from_dataframe(df)
+    assert aggregate['total_users'] == metadata.total_users_analyzed
+    assert aggregate['period_days'] == metadata.data_period_days
+    assert aggregate['total_records'] == metadata.total_activity_records
+
+
+@pytest.mark.parametrize('parts', [1, 3, 500])
+def test_byte_ranges_cover_file(tmp_path, parts):
+    # Части файла, разобранные по отдельности, дают те же строки в том же порядке
+    # (частей больше, чем строк, - по одной строке в части)
+    file_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(file_path, 300, users=40, days=10)
+    expected = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))
+
+    byte_ranges = source_byte_ranges(file_path, parts)
+    assert len(byte_ranges) == min(parts, len(expected))
+    processor = DataProcessor(chunk_size=700)
+    df = DataProcessor._concat_chunks(
+        chunk for byte_range in byte_ranges for chunk in processor.iter_chunks(file_path, byte_range)
+    )
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dispatcher import NotificationDispatcher, StubSink
+
+
+# Понедельник, 30 секунд после слота 09:00 - слот еще в пределах GRACE_SECONDS
+NOW = datetime(2026, 10, 19, 9, 0, 30)
+SLOT_TIME = datetime(2026, 10, 19, 9, 0)
+
+
+class FixedSource:
+    # Один слот (понедельник 09:00) для трех получателей
+
+    def slots(self):
+        return [(0, 540)]
+
+    def recipients(self, day, minute):
+        return np.array([1, 2, 3])
+
+    def reload(self):
+        return False
+
+
+def make_dispatcher(sink, state_file=None):
+    return NotificationDispatcher(FixedSource(), sink, batch_size=2, clock=lambda: NOW, state_file=state_file)
+
+
+def test_slot_within_grace_sent_once(tmp_path):
+    sink = StubSink()
+    dispatcher = make_dispatcher(sink)
+    assert dispatcher._build_heap(NOW)[0][0] == SLOT_TIME
+
+    asyncio.run(dispatcher.run(max_slots=1))
+    assert sink.sent == 3
+    assert dispatcher.slot_records[0]['lag_seconds'] == 30
+
+    # Повторная сборка кучи (например после замены расписания) не возвращает отправленный слот
+    assert dispatcher._build_heap(NOW)[0][0] == SLOT_TIME + timedelta(days=7)
+
+
+def test_restart_does_not_resend(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    sink = StubSink()
+    asyncio.run(make_dispatcher(sink, state_file).run(max_slots=1))
+    assert sink.sent == 3
+
+    restarted = make_dispatcher(StubSink(), state_file)
+    assert restarted._build_heap(NOW)[0][0] == SLOT_TIME + timedelta(days=7)
+
+
+def test_failed_batches_counted():
+    sink = StubSink(failure_rate=1.0, seed=0)
+    dispatcher = NotificationDispatcher(FixedSource(), sink, batch_size=2, max_retries=1, retry_delay=0)
+    record = asyncio.run(dispatcher.dispatch_slot(0, 540))
+    assert record['failed'] == 3
+    assert record['retries'] == 2
+    assert record['batches'] == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from activity_analyzer import ActivityAnalyzer
+from data_processor import DataProcessor
+from incremental_aggregator import IncrementalActivityAggregator
+from peak_selection import build_day_hour_matrix
+from synthetic_data import generate_screen_time_csv
+
+
+def synthetic_frame(tmp_path, rows=10_000):
+    file_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(file_path, rows, users=100, days=35)
+    return DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))
+
+
+def test_batches_match_full_analysis(tmp_path):
+    df = synthetic_frame(tmp_path)
+    aggregator = IncrementalActivityAggregator()
+    for batch in np.array_split(np.arange(len(df)), 7):
+        aggregator.add_events(df.iloc[batch])
+
+    analyzer = ActivityAnalyzer(df, quiet=True)
+    hourly = analyzer.analyze_hourly_activity()
+    expected, expected_present = build_day_hour_matrix(hourly)
+    np.testing.assert_allclose(aggregator.totals, expected)
+    np.testing.assert_array_equal(aggregator.present, expected_present)
+    assert aggregator.peak_schedule() == analyzer.find_peak_hours_per_day(hourly)
+
+
+def test_decay_halves_previous_week():
+    aggregator = IncrementalActivityAggregator(half_life_weeks=1)
+    aggregator.add_events(pd.DataFrame({'date': ['2024-01-01 10:00'], 'screen_time': ['10,0']}))
+    aggregator.add_events(pd.DataFrame({'date': ['2024-01-08 10:00'], 'screen_time': [4.0]}))
+    # Понедельник 10:00: 10 минут неделю назад с весом 0.5 и 4 минуты сейчас
+    assert np.isclose(aggregator.totals[0, 4], 9.0)
+    first_week, second_week = sorted(aggregator.weekly)
+    assert second_week == first_week + 1
+    assert aggregator.weekly[first_week][0, 4] == 10.0
+
+
+def test_state_round_trip(tmp_path):
+    df = synthetic_frame(tmp_path, rows=2_000)
+    aggregator = IncrementalActivityAggregator(half_life_weeks=2).add_events(df, source='abc')
+    state_path = str(tmp_path / 'state.npz')
+    aggregator.save_state(state_path)
+
+    loaded = IncrementalActivityAggregator.load_state(state_path)
+    np.testing.assert_array_equal(loaded.totals, aggregator.totals)
+    assert loaded.has_source('abc')
+    assert loaded.events_seen == aggregator.events_seen
+    assert loaded.peak_schedule() == aggregator.peak_schedule()
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from instrumentation import PipelineMetrics
+
+
+def test_stages_hooks_and_json(tmp_path):
+    events = []
+
+    def hook(event, payload):
+        events.append((event, payload['name'] if event == 'stage' else None))
+
+    metrics = PipelineMetrics(hooks=[hook])
+
+    with metrics.stage('load', rows=10) as stage:
+        stage['rows'] = 12
+    with pytest.raises(RuntimeError):
+        with metrics.stage('broken'):
+            raise RuntimeError('ошибка этапа')
+    metrics.count('cache_hits')
+    metrics.count('cache_hits', 2)
+    record = metrics.finish()
+
+    assert [stage['name'] for stage in record['stages']] == ['load', 'broken']
+    assert record['stages'][0]['rows'] == 12
+    assert record['counters'] == {'cache_hits': 3}
+    assert events == [('stage', 'load'), ('stage', 'broken'), ('run', None)]
+
+    file_path = tmp_path / 'metrics.json'
+    metrics.save_json(str(file_path))
+    assert json.loads(file_path.read_text(encoding='utf-8'))['counters'] == {'cache_hits': 3}
+
+
+def test_trace_memory_reports_peak():
+    metrics = PipelineMetrics(trace_memory=True)
+    with metrics.stage('allocate'):
+        data = bytearray(4 * 2 ** 20)
+    del data
+    assert metrics.stages[0]['peak_mb'] >= 3.9
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from optimal_selection import compare_with_greedy, select_optimal_columns, select_optimal_hours
+from peak_selection import FIRST_HOUR, HOURS, spaced_hour_combinations
+
+
+def brute_force(scores, num_peaks, min_gap):
+    # Лучший набор часов перебором всех наборов с нужным интервалом
+    hour_sets = spaced_hour_combinations(num_peaks, min_gap)
+    totals = scores[..., hour_sets - FIRST_HOUR].sum(axis=-1)
+    return totals.max(axis=-1)
+
+
+@pytest.mark.parametrize('num_peaks, min_gap', [(1, 3), (2, 1), (3, 3), (4, 2), (4, 5)])
+def test_matches_brute_force(num_peaks, min_gap):
+    scores = np.random.default_rng(num_peaks * 10 + min_gap).random((200, len(HOURS)))
+    selected = select_optimal_hours(scores, num_peaks, min_gap)
+
+    assert (np.diff(selected, axis=-1) >= min_gap).all()
+    chosen_total = np.take_along_axis(scores, selected - FIRST_HOUR, axis=-1).sum(axis=-1)
+    np.testing.assert_allclose(chosen_total, brute_force(scores, num_peaks, min_gap))
+
+
+def test_zero_gap_rejected():
+    # При нулевом интервале лучший час выбирался бы несколько раз
+    scores = np.zeros(len(HOURS))
+    scores[3] = 100.0
+    with pytest.raises(ValueError, match='не меньше 1'):
+        select_optimal_hours(scores, 3, min_gap=0)
+    with pytest.raises(ValueError, match='не меньше 1'):
+        select_optimal_columns(scores, 3, min_gap=0)
+
+
+def test_gap_one_gives_distinct_hours():
+    scores = np.zeros(len(HOURS))
+    scores[3] = 100.0
+    selected = select_optimal_hours(scores, 3, min_gap=1)
+    assert len(set(selected.tolist())) == 3
+
+
+def test_infeasible_gap_rejected():
+    with pytest.raises(ValueError):
+        select_optimal_hours(np.zeros(len(HOURS)), 4, min_gap=7)
+
+
+def test_never_worse_than_greedy_without_violations():
+    rng = np.random.default_rng(1)
+    scores = rng.random((500, 7, len(HOURS)))
+    result = compare_with_greedy(scores, np.ones(scores.shape, dtype=bool))
+    assert result['optimal_coverage'] >= result['greedy_coverage'] - 1e-9 or result['greedy_gap_violations']
+    assert result['mean_gain_without_violations'] >= -1e-9
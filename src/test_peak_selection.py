@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from peak_selection import (
+    DAYS_OF_WEEK, DEFAULT_HOURS, HOURS, fill_default_days, select_spaced_hours, selection_to_schedule,
+    spaced_hour_combinations
+)
+
+
+def reference_day(scores, present, num_peaks=3, top_n=6, min_gap=3):
+    # Построчный выбор часов, как в исходном цикле по дням
+    candidates = [(score, hour) for score, hour, has in zip(scores, HOURS.tolist(), present) if has]
+    top_hours = [hour for _, hour in sorted(candidates, key=lambda item: -item[0])[:top_n]]
+
+    selected = []
+    for hour in top_hours:
+        if all(abs(hour - chosen) >= min_gap for chosen in selected):
+            selected.append(hour)
+            if len(selected) >= num_peaks:
+                break
+    for hour in top_hours:
+        if len(selected) < num_peaks and hour not in selected:
+            selected.append(hour)
+    for hour in DEFAULT_HOURS:
+        if len(selected) < num_peaks and hour not in selected:
+            selected.append(hour)
+    return sorted(selected)
+
+
+@pytest.mark.parametrize('num_peaks', [1, 2, 3, 4])
+def test_matches_row_by_row_reference(num_peaks):
+    rng = np.random.default_rng(num_peaks)
+    # Повторы баллов проверяют порядок при равенстве, пропуски - дни с неполными данными
+    scores = rng.integers(0, 20, size=(300, len(HOURS))).astype(float)
+    present = rng.random(scores.shape) > 0.3
+
+    selected, _ = select_spaced_hours(scores, present, num_peaks)
+    for row in range(len(scores)):
+        expected = reference_day(scores[row], present[row], num_peaks)
+        assert [int(hour) for hour in selected[row] if hour >= 0] == expected
+
+
+def test_default_hours_for_empty_days():
+    scores = np.zeros((len(DAYS_OF_WEEK), len(HOURS)))
+    present = np.zeros(scores.shape, dtype=bool)
+    present[0, 9 - HOURS[0]] = True
+    selected, _ = select_spaced_hours(scores, present)
+
+    # Единственный час с данными - 9, остальное добирается временем по умолчанию
+    schedule = selection_to_schedule(selected, present)
+    assert schedule['monday'] == [9, 14, 19]
+    assert schedule['sunday'] == DEFAULT_HOURS
+
+    filled = fill_default_days(selected[:, :1], present)
+    assert filled.shape == (len(DAYS_OF_WEEK), len(DEFAULT_HOURS))
+    assert filled[1].tolist() == DEFAULT_HOURS
+    assert filled[0].tolist() == [selected[0, 0], -1, -1]
+
+
+def test_spaced_combinations():
+    hour_sets = spaced_hour_combinations(3, min_gap=3)
+    assert (np.diff(hour_sets, axis=1) >= 3).all()
+    assert len(spaced_hour_combinations(3)) == 816
+    assert spaced_hour_combinations(1).shape == (len(HOURS), 1)
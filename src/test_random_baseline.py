@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from peak_selection import HOURS
+from random_baseline import monte_carlo_baseline, random_schedule_coverage
+
+
+def activity():
+    return np.random.default_rng(0).random((7, len(HOURS)))
+
+
+@pytest.mark.parametrize('trials', [0, -5])
+def test_trials_must_be_positive(trials):
+    with pytest.raises(ValueError, match='не меньше 1'):
+        monte_carlo_baseline(activity(), trials)
+
+
+def test_single_trial_has_zero_margin():
+    stats = monte_carlo_baseline(activity(), trials=1, seed=1)
+    assert stats['std'] == 0.0
+    assert stats['confidence_interval'] == (stats['mean'], stats['mean'])
+
+
+def test_seed_reproducible():
+    first = random_schedule_coverage(activity(), trials=5_000, seed=3)
+    second = random_schedule_coverage(activity(), trials=5_000, seed=3)
+    np.testing.assert_array_equal(first, second)
+    assert ((first >= 0) & (first <= 100)).all()
+
+
+def test_spaced_sets_respect_gap():
+    # Вся активность в соседних часах 9 и 10: при интервале 3 оба часа не покрываются никогда
+    matrix = np.zeros((7, len(HOURS)))
+    matrix[:, 9 - HOURS[0]] = 1.0
+    matrix[:, 10 - HOURS[0]] = 1.0
+    coverage = random_schedule_coverage(matrix, trials=2_000, num_peaks=3, min_gap=3, seed=0)
+    assert coverage.max() <= 50.0 + 1e-9
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import socket
+
+import numpy as np
+import pytest
+
+from schedule_index import (
+    ScheduleIndex, build_index_arrays, merge_index_files, serve, slot_number, write_index
+)
+
+
+def sample_times():
+    # Три пользователя, у каждого свои часы в понедельник, остальные дни пустые
+    times = np.full((3, 7, 4), -1)
+    times[0, 0, :3] = [9, 14, 19]
+    times[1, 0, :2] = [9, 20]
+    times[2, 0, :1] = [14]
+    return np.array([30, 10, 20]), times
+
+
+def test_recipients_sorted_by_user(tmp_path):
+    user_ids, times = sample_times()
+    file_path = str(tmp_path / 'index.npy')
+    write_index(file_path, *build_index_arrays(user_ids, times))
+
+    index = ScheduleIndex(file_path)
+    assert index.recipients('monday', 9).tolist() == [10, 30]
+    assert index.recipients(0, 14).tolist() == [20, 30]
+    assert index.recipients('tuesday', 9).tolist() == []
+    assert index.slot_sizes().sum() == 6
+
+
+def test_merge_matches_single_index(tmp_path):
+    user_ids, times = sample_times()
+    part_paths = []
+    for part in range(3):
+        part_path = str(tmp_path / f'part-{part}.npy')
+        write_index(part_path, *build_index_arrays(user_ids[part:part + 1], times[part:part + 1]))
+        part_paths.append(part_path)
+
+    merged_path = str(tmp_path / 'merged.npy')
+    merge_index_files(part_paths, merged_path)
+    offsets, entries = build_index_arrays(user_ids, times)
+    np.testing.assert_array_equal(np.load(merged_path), np.concatenate([offsets, entries]))
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')]
+
+
+def test_reload_picks_up_replaced_file(tmp_path):
+    user_ids, times = sample_times()
+    file_path = str(tmp_path / 'index.npy')
+    write_index(file_path, *build_index_arrays(user_ids[:1], times[:1]))
+    index = ScheduleIndex(file_path)
+    assert index.recipients('monday', 9).tolist() == [30]
+
+    write_index(file_path, *build_index_arrays(user_ids, times))
+    assert index.reload()
+    assert index.recipients('monday', 9).tolist() == [10, 30]
+
+
+def test_invalid_slot_rejected():
+    with pytest.raises(ValueError):
+        slot_number('monday', 24)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    return head.split(b' ', 2)[1].decode(), json.loads(body)
+
+
+def test_server_answers_503_when_index_missing(tmp_path):
+    user_ids, times = sample_times()
+    file_path = str(tmp_path / 'index.npy')
+    write_index(file_path, *build_index_arrays(user_ids, times))
+    port = free_port()
+
+    async def scenario():
+        server = asyncio.create_task(serve(file_path, port=port))
+        for _ in range(100):
+            try:
+                status, body = await fetch(port, '/recipients?day=monday&hour=9')
+                break
+            except OSError:
+                await asyncio.sleep(0.01)
+        assert status == '200'
+        assert body['user_ids'] == [10, 30]
+
+        os.remove(file_path)
+        status, body = await fetch(port, '/recipients?day=monday&hour=9')
+        assert status == '503'
+        assert 'Индекс недоступен' in body['error']
+        server.cancel()
+
+    asyncio.run(scenario())
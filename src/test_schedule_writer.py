@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from models import validate_user_schedules
+from schedule_writer import ScheduleWriter, iter_user_schedules, validate_schedule_arrays
+
+
+def week(*day_times):
+    # Массив (1, 7, 4): первый день задан, остальные дни - 9, 14, 19
+    times = np.full((1, 7, 4), -1)
+    times[0, :, :3] = [9, 14, 19]
+    times[0, 0, :len(day_times)] = day_times
+    return times
+
+
+def write_and_read(tmp_path, times, counts=None, trusted=False):
+    file_path = str(tmp_path / 'schedules.jsonl')
+    with ScheduleWriter(file_path) as writer:
+        writer.write_arrays(np.array([1]), times, counts, trusted=trusted)
+    return list(iter_user_schedules(file_path))
+
+
+def test_write_arrays_round_trip(tmp_path):
+    rows = write_and_read(tmp_path, week(7, 12, 18, 22))
+    assert rows[0]['schedule']['monday'] == {'times': [7, 12, 18, 22], 'count': 4}
+    assert rows[0]['schedule']['sunday'] == {'times': [9, 14, 19], 'count': 3}
+    validate_user_schedules(rows)
+
+
+def test_duplicate_hours_rejected(tmp_path):
+    with pytest.raises(ValueError, match='без повторов'):
+        write_and_read(tmp_path, week(9, 9, 19))
+
+
+def test_unsorted_hours_rejected(tmp_path):
+    with pytest.raises(ValueError, match='по возрастанию'):
+        write_and_read(tmp_path, week(19, 9, 14))
+
+
+def test_gap_before_hour_rejected():
+    times = week()
+    times[0, 0] = [9, 14, -1, 20]
+    with pytest.raises(ValueError, match='по возрастанию'):
+        validate_schedule_arrays(times, (times >= 0).sum(axis=-1))
+
+
+def test_mismatched_count_rejected(tmp_path):
+    times = week(9, 14, 19)
+    counts = (times >= 0).sum(axis=-1)
+    counts[0, 0] = 2
+    with pytest.raises(ValueError, match='не совпадает'):
+        write_and_read(tmp_path, times, counts)
+
+
+def test_repeated_hour_keeps_mask_when_trusted(tmp_path):
+    # Без проверки повтор не должен превращаться в другой час (9 + 9 -> 10)
+    rows = write_and_read(tmp_path, week(9, 9, 19), trusted=True)
+    assert rows[0]['schedule']['monday']['times'] == [9, 19]
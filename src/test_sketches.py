@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from data_processor import DataProcessor
+from peak_selection import DAYS_OF_WEEK, HOURS
+from sketches import ActivitySketch, HyperLogLog, estimate_peak_hours, sketch_files
+from synthetic_data import generate_screen_time_csv
+
+
+def synthetic_file(tmp_path, name='data.csv', rows=20_000, seed=42):
+    file_path = str(tmp_path / name)
+    generate_screen_time_csv(file_path, rows, users=300, days=28, seed=seed)
+    return file_path
+
+
+def exact_activity(file_path):
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))
+    df = df[df['hour'].between(HOURS[0], HOURS[-1])]
+    activity = np.zeros((len(DAYS_OF_WEEK), len(HOURS)))
+    day_index = df['day_of_week'].to_numpy() - 1
+    np.add.at(activity, (day_index, df['hour'].to_numpy() - HOURS[0]), df['screen_time'].to_numpy())
+    return activity, df
+
+
+def test_large_sample_is_exact(tmp_path):
+    # Выборка больше числа записей в ячейке: оценка точная, ошибка нулевая
+    file_path = synthetic_file(tmp_path)
+    sketch = ActivitySketch.from_csv(file_path, sample_size=100_000, seed=0)
+    activity, standard_error, present = sketch.estimate()
+
+    expected, _ = exact_activity(file_path)
+    np.testing.assert_allclose(activity, expected)
+    assert (standard_error == 0).all()
+    assert present.all()
+    assert sketch.records == 20_000
+
+
+def test_small_sample_within_bounds(tmp_path):
+    file_path = synthetic_file(tmp_path)
+    sketch = ActivitySketch.from_csv(file_path, sample_size=64, seed=0)
+    activity, standard_error, _ = sketch.estimate()
+    expected, _ = exact_activity(file_path)
+
+    assert len(sketch.sample_cells) <= 64 * len(DAYS_OF_WEEK) * len(HOURS)
+    # Почти все ячейки должны попасть в пять стандартных ошибок
+    inside = np.abs(activity - expected) <= 5 * standard_error + 1e-9
+    assert inside.mean() > 0.95
+
+
+def test_merge_equals_single_pass(tmp_path):
+    first = synthetic_file(tmp_path, 'first.csv', seed=1)
+    second = synthetic_file(tmp_path, 'second.csv', seed=2)
+
+    merged = sketch_files([first, second], sample_size=100_000, seed=0, workers=1)
+    first_activity, _ = exact_activity(first)
+    second_activity, _ = exact_activity(second)
+    np.testing.assert_allclose(merged.estimate()[0], first_activity + second_activity)
+    assert merged.records == 40_000
+    assert len(merged.sources) == 2
+
+
+def test_repeated_source_rejected(tmp_path):
+    file_path = synthetic_file(tmp_path)
+    sketch = ActivitySketch.from_csv(file_path, sample_size=16, seed=0)
+    with pytest.raises(ValueError, match='уже учтены'):
+        sketch.merge(ActivitySketch.from_csv(file_path, sample_size=16, seed=1))
+
+
+def test_state_round_trip(tmp_path):
+    file_path = synthetic_file(tmp_path)
+    sketch = ActivitySketch.from_csv(file_path, sample_size=32, seed=0)
+    state_path = str(tmp_path / 'sketch.npz')
+    sketch.save_state(state_path)
+
+    loaded = ActivitySketch.load_state(state_path)
+    for left, right in zip(sketch.estimate(), loaded.estimate()):
+        np.testing.assert_array_equal(left, right)
+    assert loaded.sources == sketch.sources
+    assert loaded.period_days() == sketch.period_days()
+    assert loaded.users.count() == sketch.users.count()
+
+
+def test_hyperloglog_count():
+    counter = HyperLogLog().add(np.arange(50_000))
+    other = HyperLogLog().add(np.arange(25_000, 100_000))
+    assert abs(counter.count() - 50_000) < 50_000 * 4 * counter.relative_error()
+    merged = counter.merge(other).count()
+    assert abs(merged - 100_000) < 100_000 * 4 * counter.relative_error()
+
+
+def test_estimate_peak_hours_exact_sketch(tmp_path):
+    file_path = synthetic_file(tmp_path)
+    sketch = ActivitySketch.from_csv(file_path, sample_size=100_000, seed=0)
+    estimate = estimate_peak_hours(sketch, num_peaks=3, trials=50, seed=0)
+
+    _, df = exact_activity(file_path)
+    assert all(len(hours) == 3 for hours in estimate['peak_hours'].values())
+    assert all(day['stability'] == 1.0 for day in estimate['days'].values())
+    assert estimate['users']['low'] <= df['user_id'].nunique() <= estimate['users']['high']
+    assert estimate['coverage']['low'] == estimate['coverage']['overall_coverage']
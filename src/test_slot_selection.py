@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import pytest
+
+from notification_scheduler import NotificationScheduler
+from peak_selection import HOURS, select_spaced_hours
+from slot_selection import format_minutes, select_peak_slots, slot_coverage, slot_starts, window_scores
+from synthetic_data import generate_screen_time_csv
+
+
+def test_window_scores_match_direct_sums():
+    values = np.random.default_rng(0).random((7, 72))
+    scores = window_scores(values, bin_minutes=15, window_minutes=60)
+    expected = np.array([[row[start:start + 4].sum() for start in range(72)] for row in values])
+    np.testing.assert_allclose(scores, expected)
+
+    with pytest.raises(ValueError):
+        window_scores(values, bin_minutes=15, window_minutes=50)
+
+
+def test_hour_slots_match_hour_selection():
+    # При слоте и окне в 60 минут выбор совпадает с выбором по часам
+    rng = np.random.default_rng(1)
+    activity = rng.random((7, len(HOURS)))
+    present = rng.random(activity.shape) > 0.2
+    present[3] = False
+
+    minutes = select_peak_slots(activity, present, bin_minutes=60, window_minutes=60)
+    hours, _ = select_spaced_hours(activity, present)
+    for day in range(7):
+        if present[day].any():
+            assert (minutes[day] // 60).tolist() == hours[day].tolist()
+        else:
+            assert minutes[day].tolist() == [9 * 60, 14 * 60, 19 * 60]
+
+
+@pytest.mark.parametrize('solver', ['greedy', 'optimal'])
+def test_slots_respect_gap(solver):
+    activity = np.random.default_rng(2).random((7, 72))
+    present = np.ones(activity.shape, dtype=bool)
+    minutes = select_peak_slots(activity, present, 15, 3, 60, min_gap_minutes=120, solver=solver)
+    assert (minutes % 15 == 0).all()
+    assert (np.diff(minutes, axis=1) >= 120).all()
+
+
+def test_slot_coverage_counts_window():
+    activity = np.zeros((7, 72))
+    activity[:, 12:16] = 1.0
+    activity[:, 40] = 2.0
+    times = np.full((7, 1), 9 * 60)
+    coverage = slot_coverage(activity, times, bin_minutes=15, window_minutes=60)
+    assert np.isclose(coverage['overall_coverage'], 4 / 6 * 100)
+    assert slot_starts(15)[12] == 9 * 60
+    assert format_minutes(1125) == '18:45'
+
+
+def test_streaming_slot_schedule_matches_frame(tmp_path):
+    # Потоковый режим собирает слоты по блокам без исходной таблицы и дает то же расписание
+    data_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(data_path, 10_000, users=60, days=21)
+
+    schedules = []
+    for streaming in (False, True):
+        output_dir = tmp_path / f'out-{streaming}'
+        scheduler = NotificationScheduler(streaming=streaming, quiet=True, data_file=data_path,
+                                          output_dir=str(output_dir))
+        scheduler.data_processor.chunk_size = 1_500
+        assert scheduler.run_slot_analysis(15) is not None
+        assert (scheduler.df is None) == streaming
+
+        schedule = json.loads((output_dir / 'notification_schedule_minutes.json').read_text(encoding='utf-8'))
+        del schedule['analysis_metadata']['analysis_date']
+        schedules.append(schedule)
+
+    assert schedules[0] == schedules[1]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from data_processor import DataProcessor
+from synthetic_data import category_names, generate_screen_time_csv
+
+
+def test_generated_file_parses(tmp_path):
+    file_path = str(tmp_path / 'synthetic.csv')
+    generate_screen_time_csv(file_path, 5_000, users=50, categories=6, days=14, chunk_size=1_200)
+
+    processor = DataProcessor()
+    assert processor.load_data(file_path, streaming=True)
+    df = processor.df
+    assert len(df) == 5_000
+    assert df['user_id'].between(1000, 1049).all()
+    assert set(df['category'].cat.categories) <= set(category_names(6))
+    assert df['date'].is_monotonic_increasing
+    assert (df['date'].dt.dayofweek + 1 == df['day_of_week']).all()
+    assert (df['date'].dt.day_name() == df['day_name'].astype(str)).all()
+
+
+def test_hours_follow_profile(tmp_path):
+    # Ночью активность заметно ниже, чем вечером
+    file_path = str(tmp_path / 'synthetic.csv')
+    generate_screen_time_csv(file_path, 20_000, chunk_size=3_000)
+    hours = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(file_path))['hour']
+    counts = np.bincount(hours, minlength=24)
+    assert counts[19] > 3 * counts[2]
+    assert counts.sum() == 20_000
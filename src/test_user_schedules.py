@@ -0,0 +1,64 @@
+import os
+
+from data_processor import DataProcessor
+from optimal_selection import select_schedule_hours
+from schedule_index import ScheduleIndex
+from schedule_writer import iter_user_schedules
+from synthetic_data import generate_screen_time_csv
+from user_schedules import build_user_activity, generate_user_schedules
+
+
+def test_shards_match_direct_selection(tmp_path):
+    source_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(source_path, 8_000, users=120, days=21)
+    output_dir = str(tmp_path / 'schedules')
+
+    summary = generate_user_schedules(source_path, output_dir, workers=2, shard_count=3, chunk_size=1_500)
+    assert summary['users'] == 120
+    # Временные файлы разбиения и части индекса удалены
+    assert not [name for name in os.listdir(output_dir) if name.startswith('.')]
+
+    rows = {row['user_id']: row for path in summary['files'] for row in iter_user_schedules(path)}
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(source_path))
+    df = df[df['hour'].between(6, 23)]
+    user_ids, activity, present = build_user_activity(df)
+    times = select_schedule_hours(activity, present, 3, 'greedy')
+
+    for user_id, user_times in zip(user_ids.tolist(), times):
+        assert rows[user_id]['schedule']['monday']['times'] == [int(hour) for hour in user_times[0] if hour >= 0]
+
+    # Индекс согласован с файлами расписаний
+    index = ScheduleIndex(summary['index'])
+    expected = sorted(user_id for user_id, row in rows.items() if 9 in row['schedule']['friday']['times'])
+    assert index.recipients('friday', 9).tolist() == expected
+    assert index.slot_sizes().sum() == sum(
+        row['schedule'][day]['count'] for row in rows.values() for day in row['schedule']
+    )
+
+
+def test_num_peaks_applied(tmp_path):
+    # Дни с данными получают num_peaks часов, дни без данных - время по умолчанию
+    source_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(source_path, 3_000, users=30, days=14)
+    summary = generate_user_schedules(source_path, str(tmp_path / 'out'), workers=1, shard_count=2, num_peaks=2)
+    rows = {row['user_id']: row for path in summary['files'] for row in iter_user_schedules(path)}
+
+    df = DataProcessor()._concat_chunks(DataProcessor().iter_chunks(source_path))
+    user_ids, _, present = build_user_activity(df[df['hour'].between(6, 23)])
+    for user_id, user_present in zip(user_ids.tolist(), present):
+        expected = 2 if user_present[0].any() else 3
+        assert rows[user_id]['schedule']['monday']['count'] == expected
+
+
+def test_stale_shards_removed(tmp_path):
+    # Файлы шардов прошлого запуска с другим числом шардов или сжатием не остаются в папке
+    source_path = str(tmp_path / 'data.csv')
+    generate_screen_time_csv(source_path, 2_000, users=40, days=7)
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    for name in ('user_schedules-00007.jsonl', 'user_schedules-00000.jsonl.gz'):
+        (output_dir / name).write_text('stale\n', encoding='utf-8')
+
+    summary = generate_user_schedules(source_path, str(output_dir), workers=1, shard_count=2)
+    shard_names = sorted(name for name in os.listdir(output_dir) if name.startswith('user_schedules-'))
+    assert shard_names == sorted(os.path.basename(path) for path in summary['files'])
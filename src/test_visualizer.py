@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+
+from peak_selection import DAYS_OF_WEEK, HOURS
+from visualizer import render_reports
+
+
+def test_report_names_stay_in_output_dir(tmp_path):
+    activity = np.random.default_rng(0).random((len(DAYS_OF_WEEK), len(HOURS)))
+    present = np.ones(activity.shape, dtype=bool)
+    peak_hours = {day.lower(): [9, 14, 19] for day in DAYS_OF_WEEK}
+    labels = ['Social', '../outside', 'Фото и видео', 'a/b', 'a b']
+    reports = {label: (activity, present, peak_hours) for label in labels}
+
+    output_dir = tmp_path / 'reports'
+    paths = render_reports(reports, str(output_dir), dpi=20, workers=1)
+
+    assert len(paths) == len(set(paths)) == len(labels)
+    assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(path) for path in paths)
+    assert 'Фото_и_видео.png' in os.listdir(output_dir)
+    assert not (tmp_path / 'outside.png').exists()
@@ -0,0 +1,182 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from data_processor import CHUNK_SIZE, DataProcessor, source_byte_ranges
+from peak_selection import DAYS_OF_WEEK, FIRST_HOUR, HOURS, LAST_HOUR
+from optimal_selection import select_schedule_hours
+from schedule_index import INDEX_FILE_NAME, build_index_arrays, merge_index_files, write_index
+from schedule_writer import ScheduleWriter
+
+
+# Сколько шардов приходится на один процесс (для равномерной загрузки)
+SHARDS_PER_WORKER = 4
+
+# Имя файла с частью расписаний одного шарда
+SHARD_FILE_NAME = 'user_schedules-{shard:05d}.jsonl'
+# Файлы шардов прошлых запусков (в том числе сжатые), удаляются перед записью новых
+SHARD_FILE_PATTERN = 'user_schedules-*.jsonl*'
+
+# Частичные файлы обратного индекса (день, час) -> user_id по шардам
+INDEX_PART_FILE_NAME = '.index-part-{shard:05d}.npy'
+
+
+# Строки одного шарда из одной части файла во временном файле:
+# пользователь, ячейка день x час, экранное время
+PARTITION_DTYPE = np.dtype([('user_id', '<i8'), ('cell', '<i2'), ('screen_time', '<f8')])
+PARTITION_FILE_NAME = '.partition-{part:05d}-{shard:05d}.bin'
+
+
+def generate_user_schedules(source_path, output_dir, workers=None, shard_count=None,
+                            num_peaks=3, chunk_size=CHUNK_SIZE, cache_dir=None, compress=False,
+                            solver='greedy'):
+    # Персональные расписания для всех пользователей
+    # Исходный файл разбирается один раз: CSV делится на части по строкам, каждая часть разбирается
+    # в своем процессе, и ее строки раскладываются на шарды по user_id во временные файлы;
+    # затем каждый шард обрабатывается в отдельном процессе и пишется в свой файл
+    # С cache_dir данные уже разобраны (memory map) и делятся на шарды в родительском процессе
+    # solver: 'greedy' - как find_peak_hours_per_day, 'optimal' - точный выбор часов
+    workers = workers or os.cpu_count() or 1
+    shard_count = shard_count or workers * SHARDS_PER_WORKER
+    os.makedirs(output_dir, exist_ok=True)
+    for stale_path in glob.glob(os.path.join(output_dir, SHARD_FILE_PATTERN)):
+        os.remove(stale_path)
+
+    byte_ranges = [None] if cache_dir else source_byte_ranges(source_path, workers)
+    partition_paths = [
+        [os.path.join(output_dir, PARTITION_FILE_NAME.format(part=part, shard=shard)) for shard in range(shard_count)]
+        for part in range(len(byte_ranges))
+    ]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if cache_dir:
+                _partition_chunks(_iter_cached(source_path, cache_dir), partition_paths[0])
+            else:
+                list(executor.map(
+                    _partition_range, repeat(source_path), byte_ranges, partition_paths, repeat(chunk_size)
+                ))
+
+            # Шард собирает свои строки из всех частей в порядке следования в файле
+            shard_args = [
+                ([paths[shard] for paths in partition_paths], output_dir, shard, num_peaks, compress, solver)
+                for shard in range(shard_count)
+            ]
+
+            # Родительский процесс получает только краткую сводку по каждому шарду
+            shard_results = list(executor.map(_generate_shard, *zip(*shard_args)))
+    finally:
+        for part_paths in partition_paths:
+            for partition_path in part_paths:
+                if os.path.exists(partition_path):
+                    os.remove(partition_path)
+
+    # Собираем общий индекс из частей шардов и публикуем его атомарно
+    index_parts = [result['index_path'] for result in shard_results if result['index_path']]
+    index_path = os.path.join(output_dir, INDEX_FILE_NAME)
+    merge_index_files(index_parts, index_path)
+    for part_path in index_parts:
+        os.remove(part_path)
+
+    return {
+        'shards': shard_count,
+        'index': index_path,
+        'users': sum(result['users'] for result in shard_results),
+        'files': [result['path'] for result in shard_results if result['path']],
+    }
+
+
+def build_user_activity(df):
+    # Матрицы активности день x час для каждого пользователя
+    # Возвращает (user_ids, activity[n_users, 7, 18], present[n_users, 7, 18])
+    day_index = pd.Categorical(df['day_name'], categories=DAYS_OF_WEEK).codes.astype(np.int64)
+    cells = day_index * len(HOURS) + df['hour'].to_numpy() - FIRST_HOUR
+    return _user_activity(df['user_id'].to_numpy(), cells, df['screen_time'].to_numpy(dtype=float))
+
+
+def _user_activity(user_ids, cells, values):
+    # То же по массивам: user_id, номер ячейки день x час и экранное время каждой строки
+    user_ids, user_index = np.unique(user_ids, return_inverse=True)
+    cells_per_user = len(DAYS_OF_WEEK) * len(HOURS)
+    flat_index = user_index * cells_per_user + cells
+    size = len(user_ids) * cells_per_user
+    shape = (len(user_ids), len(DAYS_OF_WEEK), len(HOURS))
+
+    activity = np.bincount(flat_index, weights=values, minlength=size)
+    present = np.bincount(flat_index, minlength=size) > 0
+
+    return user_ids, activity.reshape(shape), present.reshape(shape)
+
+
+def _partition_range(source_path, byte_range, partition_paths, chunk_size):
+    # Разбор одной части CSV в процессе-обработчике
+    _partition_chunks(DataProcessor(chunk_size=chunk_size).iter_chunks(source_path, byte_range), partition_paths)
+
+
+def _partition_chunks(chunks, partition_paths):
+    # Один проход по блокам: дневные строки каждого шарда дописываются в его временный файл
+    shard_count = len(partition_paths)
+    files = [open(partition_path, 'wb') for partition_path in partition_paths]
+    try:
+        for chunk in chunks:
+            day_index = pd.Categorical(chunk['day_name'], categories=DAYS_OF_WEEK).codes.astype(np.int64)
+            hours = chunk['hour'].to_numpy()
+            valid = (day_index >= 0) & (hours >= FIRST_HOUR) & (hours <= LAST_HOUR)
+
+            rows = np.empty(int(valid.sum()), dtype=PARTITION_DTYPE)
+            rows['user_id'] = chunk['user_id'].to_numpy()[valid]
+            rows['cell'] = day_index[valid] * len(HOURS) + hours[valid] - FIRST_HOUR
+            rows['screen_time'] = chunk['screen_time'].to_numpy(dtype=float)[valid]
+
+            # Сортировка по шарду, чтобы каждый файл получил один непрерывный кусок
+            shards = rows['user_id'] % shard_count
+            order = np.argsort(shards, kind='stable')
+            bounds = np.searchsorted(shards[order], np.arange(shard_count + 1))
+            rows = rows[order]
+            for shard, file in enumerate(files):
+                if bounds[shard + 1] > bounds[shard]:
+                    rows[bounds[shard]:bounds[shard + 1]].tofile(file)
+    finally:
+        for file in files:
+            file.close()
+
+
+def _generate_shard(partition_paths, output_dir, shard, num_peaks, compress, solver):
+    # Обработка одного шарда: чтение своих строк из всех частей и запись расписаний
+    rows = np.concatenate(
+        [np.empty(0, dtype=PARTITION_DTYPE)] + [np.fromfile(path, dtype=PARTITION_DTYPE) for path in partition_paths]
+    )
+    if len(rows) == 0:
+        return {'shard': shard, 'users': 0, 'path': None, 'index_path': None}
+
+    output_path = os.path.join(output_dir, SHARD_FILE_NAME.format(shard=shard))
+    if compress:
+        output_path += '.gz'
+
+    # Выбор часов сразу для всех пользователей шарда
+    user_ids, activity, present = _user_activity(rows['user_id'], rows['cell'].astype(np.int64), rows['screen_time'])
+    times = select_schedule_hours(activity, present, num_peaks, solver)
+
+    # Пишем во временный файл, чтобы неполный результат не попал в выходную папку
+    temp_path = os.path.join(output_dir, '.tmp-' + os.path.basename(output_path))
+    with ScheduleWriter(temp_path) as writer:
+        writer.write_arrays(user_ids, times)
+        users = writer.written
+    os.replace(temp_path, output_path)
+
+    # Частичный индекс шарда для быстрого поиска получателей по слоту
+    index_path = os.path.join(output_dir, INDEX_PART_FILE_NAME.format(shard=shard))
+    write_index(index_path, *build_index_arrays(user_ids, times))
+
+    return {'shard': shard, 'users': users, 'path': output_path, 'index_path': index_path}
+
+
+def _iter_cached(source_path, cache_dir):
+    # Обработанные данные из кэша одним блоком (memory map)
+    processor = DataProcessor(cache_dir=cache_dir)
+    if not processor.load_data(source_path):
+        raise RuntimeError(f'Не удалось загрузить данные для персональных расписаний: {source_path}')
+    yield processor.df
@@ -1,15 +1,38 @@
-import matplotlib.pyplot as plt
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from peak_selection import DAYS_OF_WEEK, HOURS, build_day_hour_matrix
 # import pandas as pd
-# import os
+
+
+logger = logging.getLogger(__name__)
+
+# Разрешение и формат пакетных отчетов (основной график сохраняется в 300 dpi)
+REPORT_DPI = 100
+REPORT_FORMAT = 'png'
+
+# Сколько частей пакета приходится на один процесс
+CHUNKS_PER_WORKER = 4
+
+# Отрисовщик текущего процесса, переиспользуется между частями пакета
+_process_renderer = None
 
 
 class Visualizer:
     def __init__(self):
+        import matplotlib.pyplot as plt
         plt.style.use('default')
         self.colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8']
 
-    def create_simple_analysis_plot(self, hourly_activity, peak_hours, save_path=None):
+    def create_simple_analysis_plot(self, hourly_activity, peak_hours, save_path=None, dpi=300, fmt=None):
         # Создание графика активности по дням недели
+        import matplotlib.pyplot as plt
 
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
@@ -55,8 +78,126 @@ class Visualizer:
         plt.subplots_adjust(top=0.93)
 
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            plt.savefig(save_path, dpi=dpi, format=fmt, bbox_inches='tight')
             plt.close()
-            print(f"График сохранен: {save_path}")
+            logger.info(f"График сохранен: {save_path}")
         else:
-            plt.show()
\ No newline at end of file
+            plt.show()
+
+    def render_reports(self, reports, output_dir, dpi=REPORT_DPI, fmt=REPORT_FORMAT, workers=None):
+        # Пакет отчетов (по сегментам или категориям) в отдельных процессах
+        return render_reports(reports, output_dir, dpi, fmt, workers)
+
+
+class ReportRenderer:
+    # Быстрая отрисовка однотипных отчетов: фигура, оси и линии создаются один раз,
+    # для каждого отчета обновляются только данные. Рисует через Agg без pyplot
+
+    def __init__(self, dpi=REPORT_DPI, fmt=REPORT_FORMAT):
+        self.dpi = dpi
+        self.fmt = fmt
+        self.figure = Figure(figsize=(20, 10))
+        FigureCanvasAgg(self.figure)
+
+        self.axes = self.figure.subplots(2, 4).flatten()
+        self.activity_lines = []
+        self.notification_lines = []
+        for ax, day in zip(self.axes, DAYS_OF_WEEK):
+            activity_line, = ax.plot([], [], marker='o', linewidth=3, markersize=8, color='blue',
+                                     label='Активность')
+            notification_line, = ax.plot([], [], 'ro', markersize=12, label='Время уведомлений')
+            self.activity_lines.append(activity_line)
+            self.notification_lines.append(notification_line)
+
+            ax.set_title(day, fontsize=14, fontweight='bold')
+            ax.set_xlabel('Час дня')
+            ax.set_ylabel('Активность (минуты)')
+            ax.grid(True, alpha=0.3)
+            ax.set_xlim(6, 23)
+            # Фиксированное место легенды: поиск лучшего места при каждой отрисовке дорогой
+            ax.legend(loc='upper left')
+
+        self.axes[-1].set_visible(False)
+        self.title = self.figure.suptitle('Анализ активности и выбор времени уведомлений',
+                                          fontsize=16, fontweight='bold')
+        # Разметка считается один раз вместо bbox_inches='tight' при каждом сохранении
+        self.figure.tight_layout()
+        self.figure.subplots_adjust(top=0.93)
+
+    def render(self, hourly_activity, peak_hours, save_path, title=None):
+        activity_matrix, present = build_day_hour_matrix(hourly_activity)
+        return self.render_matrix(activity_matrix, present, peak_hours, save_path, title)
+
+    def render_matrix(self, activity_matrix, present, peak_hours, save_path, title=None):
+        # Отчет по матрице 7x18 (день x час) и расписанию {'monday': [...], ...}
+        for day_index, day in enumerate(DAYS_OF_WEEK):
+            day_present = present[day_index]
+            self.activity_lines[day_index].set_data(HOURS[day_present], activity_matrix[day_index, day_present])
+
+            # Время уведомлений отмечается только для часов с данными
+            notification_hours = [
+                hour for hour in peak_hours.get(day.lower(), []) if day_present[hour - HOURS[0]]
+            ]
+            notification_values = [activity_matrix[day_index, hour - HOURS[0]] for hour in notification_hours]
+            self.notification_lines[day_index].set_data(notification_hours, notification_values)
+
+            ax = self.axes[day_index]
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+        if title is not None:
+            self.title.set_text(title)
+        self.figure.savefig(save_path, dpi=self.dpi, format=self.fmt)
+        return save_path
+
+
+def render_reports(reports, output_dir, dpi=REPORT_DPI, fmt=REPORT_FORMAT, workers=None):
+    # reports - словарь {имя: (activity_matrix, present, peak_hours)} или {имя: (hourly_activity, peak_hours)}
+    # Каждый процесс рисует свою часть пакета одним ReportRenderer
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    file_names = set()
+    for name, report in reports.items():
+        if len(report) == 2:
+            activity_matrix, present = build_day_hour_matrix(report[0])
+            report = (activity_matrix, present, report[1])
+        file_name = _report_file_name(name, fmt, file_names)
+        jobs.append((os.path.join(output_dir, file_name), name) + tuple(report))
+
+    workers = workers or os.cpu_count() or 1
+    chunk_count = min(len(jobs), workers * CHUNKS_PER_WORKER)
+    if workers == 1 or chunk_count <= 1:
+        paths = _render_chunk(jobs, dpi, fmt)
+    else:
+        chunks = [jobs[position::chunk_count] for position in range(chunk_count)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            paths = [path for chunk_paths in executor.map(_render_chunk, chunks, [dpi] * len(chunks),
+                                                          [fmt] * len(chunks)) for path in chunk_paths]
+
+    logger.info(f"Отчетов сохранено: {len(paths)} в {output_dir}")
+    return sorted(paths)
+
+
+def _report_file_name(name, fmt, used):
+    # Имя файла из подписи отчета: только буквы, цифры, '-' и '_', чтобы '/' или '..' не выводили
+    # за пределы папки; совпавшие после замены имена получают номер
+    slug = re.sub(r'[^\w-]+', '_', str(name)).strip('_') or 'report'
+    file_name = f'{slug}.{fmt}'
+    number = 2
+    while file_name in used:
+        file_name = f'{slug}-{number}.{fmt}'
+        number += 1
+    used.add(file_name)
+    return file_name
+
+
+def _render_chunk(jobs, dpi, fmt):
+    global _process_renderer
+    if _process_renderer is None or (_process_renderer.dpi, _process_renderer.fmt) != (dpi, fmt):
+        _process_renderer = ReportRenderer(dpi, fmt)
+
+    return [
+        _process_renderer.render_matrix(np.asarray(activity_matrix), np.asarray(present, dtype=bool),
+                                        peak_hours, save_path, title=name)
+        for save_path, name, activity_matrix, present, peak_hours in jobs
+    ]